@@ -0,0 +1,69 @@
+from functools import lru_cache
+from typing import Iterable, Sequence
+import base58
+from consts import ROUTER_ADDRESS, SUNPUMP_ADDRESS, token_configs
+
+
+def _hex_to_base58(address: str) -> str:
+    return base58.b58encode_check(bytes.fromhex(address)).decode("utf-8")
+
+
+def _base58_to_hex(address: str) -> str:
+    return base58.b58decode_check(address).hex().lower()
+
+
+class AddressCodec:
+    """
+    Converts TRON addresses between hex ("41...") and base58check ("T..."). A handful of
+    counterparties (router, pairs, SunPump, our makers) make up most rows, so results are kept
+    in a bounded LRU per direction, and well-known addresses are precomputed and never evicted.
+    """
+
+    def __init__(self, max_entries: int = 65_536, known_addresses: Iterable[str] = ()):
+        self._known_base58: dict[str, str] = {}
+        self._known_hex: dict[str, str] = {}
+        for address in known_addresses:
+            hex_address = _base58_to_hex(address)
+            self._known_base58[hex_address] = address
+            self._known_hex[address] = hex_address
+        self._from_hex_cached = lru_cache(maxsize=max_entries)(_hex_to_base58)
+        self._to_hex_cached = lru_cache(maxsize=max_entries)(_base58_to_hex)
+
+    def from_hex(self, address: str) -> str:
+        known = self._known_base58.get(address)
+        return known if known is not None else self._from_hex_cached(address)
+
+    def to_hex(self, address: str) -> str:
+        known = self._known_hex.get(address)
+        return known if known is not None else self._to_hex_cached(address)
+
+    def from_hex_many(self, addresses: Sequence[str]) -> list[str]:
+        """Converts a whole column, encoding each distinct address once."""
+        converted = {address: self.from_hex(address) for address in set(addresses)}
+        return [converted[address] for address in addresses]
+
+    def to_hex_many(self, addresses: Sequence[str]) -> list[str]:
+        """Converts a whole column, decoding each distinct address once."""
+        converted = {address: self.to_hex(address) for address in set(addresses)}
+        return [converted[address] for address in addresses]
+
+    def to_binary_many(self, addresses: Sequence[str]) -> list[bytes]:
+        """Converts a whole column to raw 21-byte addresses; an empty address becomes all zeros."""
+        converted = {address: bytes.fromhex(self.to_hex(address)) if address else bytes(21) for address in set(addresses)}
+        return [converted[address] for address in addresses]
+
+    def from_binary(self, address: bytes) -> str:
+        """base58 of a raw address, as read back from a FixedString(21) column (all zeros if empty)."""
+        return self.from_hex(address.hex()) if address.strip(b"\0") else ""
+
+    def cache_info(self) -> dict:
+        return {"from_hex": self._from_hex_cached.cache_info(), "to_hex": self._to_hex_cached.cache_info()}
+
+
+KNOWN_ADDRESSES = [
+    ROUTER_ADDRESS,
+    SUNPUMP_ADDRESS,
+    *[address for config in token_configs.values() for address in (config.address, config.pair)],
+]
+
+address_codec = AddressCodec(known_addresses=KNOWN_ADDRESSES)
@@ -0,0 +1,125 @@
+"""
+Fast-path decoding for TronGrid pages. With msgspec installed, pages are decoded against the typed
+shapes below, so only the fields the crawlers keep are materialized and `raw_data_hex`, `signature`
+and contract call `data` are skipped. Results are still plain dicts, so parsers need no changes.
+"""
+import json
+from typing import Any, Dict, List, Optional, TypedDict
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover - optional dependency
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+class ContractValue(TypedDict, total=False):
+    amount: int
+    call_value: int
+    balance: int
+    owner_address: str
+    to_address: str
+    contract_address: str
+
+
+class ContractParameter(TypedDict, total=False):
+    value: ContractValue
+
+
+class Contract(TypedDict, total=False):
+    type: str
+    parameter: ContractParameter
+
+
+class RawData(TypedDict, total=False):
+    contract: List[Contract]
+
+
+class TxResult(TypedDict, total=False):
+    contractRet: str
+    fee: int
+
+
+class InternalTxData(TypedDict, total=False):
+    call_value: Dict[str, int]
+    rejected: bool
+
+
+class AccountTx(TypedDict, total=False):
+    """A row of /v1/accounts/{address}/transactions: either a normal or an internal transaction."""
+
+    # Normal transaction
+    txID: str
+    blockNumber: int
+    block_timestamp: int
+    ret: List[TxResult]
+    raw_data: RawData
+    # Internal transaction
+    tx_id: str
+    internal_tx_id: str
+    from_address: str
+    to_address: str
+    data: InternalTxData
+
+
+class TokenInfo(TypedDict, total=False):
+    address: str
+
+
+# `from` is a keyword, hence the functional syntax
+Trc20Transfer = TypedDict(
+    "Trc20Transfer",
+    {
+        "transaction_id": str,
+        "token_info": TokenInfo,
+        "block_timestamp": int,
+        "from": str,
+        "to": str,
+        "type": str,
+        "value": str,
+    },
+    total=False,
+)
+
+
+class AccountTxPage(TypedDict, total=False):
+    data: List[AccountTx]
+    meta: Dict[str, Any]
+
+
+class Trc20TransferPage(TypedDict, total=False):
+    data: List[Trc20Transfer]
+    meta: Dict[str, Any]
+
+
+ACCOUNT_TX_PAGE = "account_tx_page"
+TRC20_TRANSFER_PAGE = "trc20_transfer_page"
+
+_decoders = {}
+if msgspec is not None:
+    _decoders = {
+        ACCOUNT_TX_PAGE: msgspec.json.Decoder(AccountTxPage),
+        TRC20_TRANSFER_PAGE: msgspec.json.Decoder(Trc20TransferPage),
+    }
+
+
+def decode_json(content: bytes) -> Any:
+    """Decodes a payload in full, with orjson when available."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def decode_page(content: bytes, shape: Optional[str] = None) -> Dict[str, Any]:
+    """Decodes a TronGrid page, keeping only the fields of `shape` when a typed decoder is available."""
+    decoder = _decoders.get(shape)
+    if decoder is not None:
+        try:
+            return decoder.decode(content)
+        except msgspec.ValidationError:
+            pass  # TronGrid sent a shape we didn't expect, keep everything rather than drop the page
+    return decode_json(content)
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import time
+from typing import Iterable, List, Optional
+import httpx
+from settings import settings, PoolMemberConfig
+from adapter.rate_limiter import RateLimiter
+from adapter.resilience import CircuitBreaker
+
+BASE_URL = "https://api.trongrid.io"  # Default member when TRONGRID_POOL is not set
+
+EWMA_ALPHA = 0.2
+
+
+class PoolMember:
+    """One (endpoint, API key) pair with its own quota, circuit breaker and health statistics."""
+
+    def __init__(self, config: PoolMemberConfig):
+        self.base_url = config.base_url.rstrip("/")
+        self.paths = config.paths
+        self.headers = {"accept": "application/json"}
+        if config.api_key:
+            self.headers["TRON-PRO-API-KEY"] = config.api_key
+        # Created on first use in each event loop, see `_get_client`
+        self.client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Quotas are per key, so every member limits itself independently and throughput scales with the pool;
+        # the rate is shared with other processes using the same key, the in-flight window is per process
+        member_id = hashlib.sha256(f"{self.base_url}|{config.api_key or ''}".encode()).hexdigest()[:16]
+        self.rate_limiter = RateLimiter(
+            rate=config.rps or settings.trongrid.rps,
+            max_in_flight=config.max_in_flight or settings.trongrid.max_in_flight,
+            latency_target=settings.trongrid.latency_target,
+            shared_key=f"trongrid_rate:{member_id}" if settings.trongrid.shared_rate_limit else None,
+            processes=settings.trongrid.processes,
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=settings.trongrid.breaker_threshold,
+            reset_timeout=settings.trongrid.breaker_reset_timeout,
+        )
+        self.latency_ewma: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+
+    def __repr__(self):
+        return f"PoolMember({self.base_url}, latency={self.latency_ewma}, error_rate={self.error_rate:.2f})"
+
+    def supports(self, path: str) -> bool:
+        return any(path.startswith(prefix) for prefix in self.paths)
+
+    def score(self) -> float:
+        """Expected cost of sending the next request here; lower is better."""
+        # Unmeasured members score as fast, so new or recovered members get traffic and a measurement
+        latency = self.latency_ewma if self.latency_ewma is not None else 0.0
+        load = (self.in_flight + 1) / max(1.0, self.rate_limiter.concurrency.limit)
+        return (latency + 0.01) * (1 + load) / max(0.05, 1 - self.error_rate)
+
+    def record(self, latency: float, failed: bool):
+        self.requests += 1
+        self.errors += int(failed)
+        if self.latency_ewma is None:
+            self.latency_ewma = latency
+        else:
+            self.latency_ewma += EWMA_ALPHA * (latency - self.latency_ewma)
+        self.error_rate += EWMA_ALPHA * (float(failed) - self.error_rate)
+
+    async def send(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends one attempt through this member's limiter and updates its health. Transport errors propagate."""
+        client = await self._get_client()
+        await self.rate_limiter.acquire()
+        self.in_flight += 1
+        started_at = time.monotonic()
+        res = None
+        try:
+            res = await client.request(method, url, **kwargs)
+            return res
+        finally:
+            latency = time.monotonic() - started_at
+            self.in_flight -= 1
+            failed = res is None or res.status_code == 429 or res.status_code >= 500
+            self.record(latency, failed)
+            # Timeouts and connection errors count as overload for the concurrency window
+            await self.rate_limiter.release(latency, throttled=res is None or res.status_code == 429)
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the loop that opened them; each Celery tick runs a new loop
+        loop = asyncio.get_running_loop()
+        if self.client is not None and self._client_loop is not loop:
+            # Normally closed at the end of the previous loop (see `aclose`); if not, release its
+            # connection pool now rather than leak it. Its sockets belong to a finished loop, so
+            # closing them may fail; the pool is dropped either way.
+            stale, self.client = self.client, None
+            try:
+                await stale.aclose()
+            except Exception as e:
+                print(f"Error closing stale TronGrid client for {self.base_url}: {e!r}")
+        if self.client is None:
+            self.client = httpx.AsyncClient(base_url=self.base_url, timeout=10.0, headers=self.headers)
+            self._client_loop = loop
+        return self.client
+
+    async def aclose(self):
+        """Closes the connection pool; the next request opens a new one, so this is safe at the end of every tick."""
+        client, self.client = self.client, None
+        if client is not None:
+            await client.aclose()
+
+
+class EndpointPool:
+    """Routes each request to the healthiest, least-loaded member that serves its path."""
+
+    def __init__(self, members: List[PoolMember]):
+        if not members:
+            raise ValueError("EndpointPool needs at least one member")
+        self.members = members
+
+    @classmethod
+    def from_settings(cls) -> "EndpointPool":
+        configs = settings.trongrid.pool or [
+            PoolMemberConfig(base_url=BASE_URL, api_key=settings.keys.trongrid_api_key)
+        ]
+        return cls([PoolMember(config) for config in configs])
+
+    def pick(self, path: str, avoid: Iterable[PoolMember] = ()) -> Optional[PoolMember]:
+        """Returns the best member for `path` whose circuit allows a request, or None if all are open."""
+        candidates = [m for m in self.members if m.supports(path)]
+        avoid = set(avoid)
+        # Prefer members we have not just failed on, but fall back to them rather than give up
+        preferred = [m for m in candidates if m not in avoid] or candidates
+        for member in sorted(preferred, key=PoolMember.score):
+            if member.circuit_breaker.allow():
+                return member
+        return None
+
+    async def aclose(self):
+        for member in self.members:
+            await member.aclose()
@@ -0,0 +1,178 @@
+import asyncio
+import time
+from typing import Optional
+from redis_client import get_async_redis_client
+
+
+class TokenBucket:
+    """Limits the sustained request rate to `rate` per second, allowing bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        # asyncio primitives are bound to the loop they first wait on, and Celery ticks run a fresh loop each time
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self) -> float:
+        """Takes a token, going into debt if none is left, and returns how long to wait before using it."""
+        self._refill()
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    async def acquire(self):
+        # Reservations are made in lock order, so tokens are handed out in FIFO order; the wait
+        # happens after the lock is released, so a waiter never holds up the ones queued behind it
+        async with self._get_lock():
+            wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+# Same refill-and-reserve step as `TokenBucket.reserve`, on a bucket shared through Redis.
+# Uses the server clock, so every process agrees on elapsed time; returns the wait as a string
+# because Redis truncates Lua numbers to integers.
+RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+if tokens < 0 then
+    return tostring(-tokens / rate)
+end
+return '0'
+"""
+
+
+class SharedTokenBucket:
+    """
+    Token bucket kept in Redis under `key`, so every process using the same API key (e.g. Celery
+    prefork workers) draws from one budget of `rate` per second. If Redis is unreachable, falls
+    back to a local bucket with an equal share of the rate per process.
+    """
+
+    def __init__(self, key: str, rate: float, capacity: Optional[float] = None, processes: int = 1):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.fallback = TokenBucket(rate / max(1, processes), self.capacity / max(1, processes))
+        self._redis_failed_at: Optional[float] = None
+
+    async def acquire(self):
+        # After a Redis error, stay on the local bucket for a while instead of paying a failed round trip per request
+        if self._redis_failed_at is None or time.monotonic() - self._redis_failed_at > 30:
+            try:
+                wait = float(
+                    await get_async_redis_client().eval(RESERVE_SCRIPT, 1, self.key, self.rate, self.capacity)
+                )
+                self._redis_failed_at = None
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                return
+            except Exception as e:
+                if self._redis_failed_at is None:
+                    print(f"Shared rate limit {self.key} unavailable, limiting locally: {e}")
+                self._redis_failed_at = time.monotonic()
+        await self.fallback.acquire()
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Caps in-flight requests with an AIMD window: the limit grows by roughly one per window of
+    successful requests and is halved when the server throttles us or latency exceeds the target.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: Optional[int] = None,
+        latency_target: float = 2.0,
+        backoff: float = 0.5,
+    ):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.limit = float(initial_limit or max_limit)
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.in_flight = 0
+        self._decreased_at = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_condition(self) -> asyncio.Condition:
+        loop = asyncio.get_running_loop()
+        if self._condition is None or self._loop is not loop:
+            self._condition = asyncio.Condition()
+            self._loop = loop
+            self.in_flight = 0  # Requests from a previous loop can no longer release their slots
+        return self._condition
+
+    async def acquire(self):
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: float, throttled: bool = False):
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = time.monotonic()
+            if throttled or latency > self.latency_target:
+                # Decrease at most once per round trip, otherwise one burst of 429s collapses the window to the floor
+                if now - self._decreased_at >= max(latency, 0.1):
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+                    self._decreased_at = now
+            else:
+                self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            condition.notify_all()
+
+
+class RateLimiter:
+    """
+    Combines a requests-per-second token bucket with an adaptive in-flight limit. With `shared_key`,
+    the rate is shared through Redis by every process using that key.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        max_in_flight: int,
+        latency_target: float = 2.0,
+        shared_key: Optional[str] = None,
+        processes: int = 1,
+    ):
+        self.bucket = SharedTokenBucket(shared_key, rate, processes=processes) if shared_key else TokenBucket(rate)
+        self.concurrency = AdaptiveConcurrencyLimiter(max_in_flight, latency_target=latency_target)
+
+    async def acquire(self):
+        await self.concurrency.acquire()
+        try:
+            await self.bucket.acquire()
+        except BaseException:
+            await self.concurrency.release(0.0)
+            raise
+
+    async def release(self, latency: float, throttled: bool = False):
+        await self.concurrency.release(latency, throttled)
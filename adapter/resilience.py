@@ -0,0 +1,95 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Optional
+import httpx
+
+
+class TronGridError(Exception):
+    """Raised when a TronGrid request fails after retries."""
+
+
+class TronGridHTTPError(TronGridError):
+    def __init__(self, response: httpx.Response):
+        self.response = response
+        self.status_code = response.status_code
+        super().__init__(f"TronGrid responded {response.status_code} for {response.request.method} {response.request.url}")
+
+
+class CircuitOpenError(TronGridError):
+    """Raised without touching the network while an endpoint's circuit breaker is open."""
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter for throttled and failed requests, honoring `Retry-After`."""
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 10.0):
+        if max_attempts < 1:
+            raise ValueError("RetryPolicy needs at least one attempt")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def should_retry(self, status_code: int) -> bool:
+        return status_code in self.RETRY_STATUSES
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = self._parse_retry_after(retry_after)
+        if delay is not None:
+            return min(self.max_delay, delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    @staticmethod
+    def _parse_retry_after(retry_after: Optional[str]) -> Optional[float]:
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class CircuitBreaker:
+    """
+    Fails fast after `failure_threshold` consecutive failures, then lets a single probe
+    through once `reset_timeout` seconds have passed.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        now = time.monotonic()
+        if now - self.opened_at >= self.reset_timeout:
+            # Also re-probes when a half-open probe ended without a verdict (e.g. it was throttled)
+            self.state = self.HALF_OPEN
+            self.opened_at = now
+            return True
+        # Either still open, or a half-open probe is already in flight
+        return False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    """
+    Two-tier cache for TronGrid responses that do not change once confirmed: a bounded in-process
+    LRU in front of a sqlite file that survives restarts. Entries are grouped by namespace, each
+    with its own TTL in seconds (None means never expire). Disk reads and writes run on worker
+    threads, so they never block the event loop.
+    """
+
+    def __init__(self, ttls: Dict[str, Optional[float]], path: Optional[Path] = None, max_entries: int = 10_000):
+        self.ttls = ttls
+        self.max_entries = max_entries
+        self.memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.counters: Dict[str, Dict[str, int]] = defaultdict(lambda: {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        self.db: Optional[sqlite3.Connection] = None
+        # The connection is shared by the worker threads that run disk reads and writes
+        self._db_lock = threading.Lock()
+        if path:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS response_cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    expires_at REAL,
+                    value TEXT NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+                """
+            )
+
+    async def get(self, namespace: str, key: str) -> Optional[Any]:
+        now = time.time()
+        counters = self.counters[namespace]
+
+        entry = self.memory.get((namespace, key))
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > now:
+                self.memory.move_to_end((namespace, key))
+                counters["memory_hits"] += 1
+                return value
+            del self.memory[(namespace, key)]
+
+        if self.db is not None:
+            # sqlite blocks on disk I/O, so the disk tier runs off the event loop
+            entry = await asyncio.to_thread(self._read, namespace, key, now)
+            if entry is not None:
+                expires_at, value = entry
+                self._remember(namespace, key, expires_at, value)
+                counters["disk_hits"] += 1
+                return value
+
+        counters["misses"] += 1
+        return None
+
+    async def set(self, namespace: str, key: str, value: Any):
+        ttl = self.ttls.get(namespace)
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._remember(namespace, key, expires_at, value)
+        if self.db is not None:
+            await asyncio.to_thread(self._write, namespace, key, expires_at, value)
+
+    def _read(self, namespace: str, key: str, now: float) -> Optional[tuple]:
+        """(expires_at, value) from the disk tier if present and unexpired; expired entries are deleted."""
+        with self._db_lock:
+            row = self.db.execute(
+                "SELECT expires_at, value FROM response_cache WHERE namespace = ? AND key = ?", (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            expires_at, raw_value = row
+            if expires_at is None or expires_at > now:
+                return expires_at, json.loads(raw_value)
+            self.db.execute("DELETE FROM response_cache WHERE namespace = ? AND key = ?", (namespace, key))
+            return None
+
+    def _write(self, namespace: str, key: str, expires_at: Optional[float], value: Any):
+        with self._db_lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO response_cache (namespace, key, expires_at, value) VALUES (?, ?, ?, ?)",
+                (namespace, key, expires_at, json.dumps(value)),
+            )
+
+    def _remember(self, namespace: str, key: str, expires_at: Optional[float], value: Any):
+        self.memory[(namespace, key)] = (expires_at, value)
+        self.memory.move_to_end((namespace, key))
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def prune(self):
+        """Drops expired entries from the disk tier."""
+        if self.db is not None:
+            with self._db_lock:
+                self.db.execute("DELETE FROM response_cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Hit/miss counters per namespace, with the overall hit ratio."""
+        result = {}
+        for namespace, counters in self.counters.items():
+            lookups = sum(counters.values())
+            hits = counters["memory_hits"] + counters["disk_hits"]
+            result[namespace] = {**counters, "hit_ratio": hits / lookups if lookups else 0.0}
+        return result
+
+    def close(self):
+        if self.db is not None:
+            with self._db_lock:
+                self.db.close()
+            self.db = None
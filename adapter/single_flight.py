@@ -0,0 +1,43 @@
+import asyncio
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key, so later callers await the first call's result."""
+
+    def __init__(self):
+        self.in_flight: Dict[Hashable, asyncio.Future] = {}
+        self.deduplicated = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.deduplicated += 1
+            # Shielded so one waiter being cancelled doesn't cancel the call for everyone else
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(fn())
+        future.add_done_callback(_consume_exception)
+        self.in_flight[key] = future
+        try:
+            return await asyncio.shield(future)
+        finally:
+            if self.in_flight.get(key) is future:
+                del self.in_flight[key]
+
+
+def _consume_exception(future: asyncio.Future):
+    # Avoid "exception was never retrieved" when every waiter was cancelled before the call failed
+    if not future.cancelled():
+        future.exception()
+
+
+def coalesced(method):
+    """Routes an async method through `self.single_flight`, keyed by method name and positional arguments."""
+
+    @functools.wraps(method)
+    async def wrapper(self, *args):
+        return await self.single_flight.do((method.__name__, *args), lambda: method(self, *args))
+
+    return wrapper
@@ -1,89 +1,211 @@
+import asyncio
 import httpx
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+from urllib.parse import urlsplit
 from settings import settings
-
-BASE_URL = "https://api.trongrid.io"  # Replace with your RPC endpoint if needed
+from adapter.decoding import ACCOUNT_TX_PAGE, TRC20_TRANSFER_PAGE, decode_json, decode_page
+from adapter.endpoint_pool import EndpointPool, PoolMember
+from adapter.response_cache import ResponseCache
+from adapter.single_flight import SingleFlight, coalesced
+from adapter.resilience import CircuitOpenError, RetryPolicy, TronGridError, TronGridHTTPError
+
+# TTLs in seconds per cached lookup; None never expires
+CACHE_TTLS = {
+    "tx_info": None,  # Solidified transactions are immutable
+    "tx_events": 24 * 3600,
+    "exchanges": 10 * 60,
+}
 
 class TronGridClient:
     def __init__(self):
-        self.client = httpx.AsyncClient(base_url=BASE_URL, timeout=10.0, headers= {
-        'accept': 'application/json',
-        'TRON-PRO-API-KEY': settings.keys.trongrid_api_key,
-      })
-
+        # Every crawler shares `tron_grid_client`, and so the quotas of every pooled key
+        self.pool = EndpointPool.from_settings()
+        self.retry_policy = RetryPolicy(max_attempts=settings.trongrid.max_attempts)
+        self.single_flight = SingleFlight()
+        self.cache = ResponseCache(
+            CACHE_TTLS,
+            path=Path(settings.cache.path) if settings.cache.path else None,
+            max_entries=settings.cache.max_entries,
+        )
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """Sends a rate-limited request, retrying throttled and failed responses. Raises TronGridError on failure."""
+        path = urlsplit(url).path
+        failed_members: List[PoolMember] = []
+        for attempt in range(self.retry_policy.max_attempts):
+            member = self.pool.pick(path, avoid=failed_members)
+            if member is None:
+                raise CircuitOpenError(f"No TronGrid endpoint available for {method} {url}, all circuits open")
+
+            is_last_attempt = attempt + 1 >= self.retry_policy.max_attempts
+            try:
+                res = await member.send(method, url, **kwargs)
+            except httpx.TransportError as e:
+                member.circuit_breaker.record_failure()
+                if is_last_attempt:
+                    raise TronGridError(f"{method} {member.base_url}{url} failed: {e!r}") from e
+                failed_members.append(member)
+                await asyncio.sleep(self.retry_policy.backoff(attempt))
+                continue
+
+            if res.is_success:
+                member.circuit_breaker.record_success()
+                return res
+            if not self.retry_policy.should_retry(res.status_code):
+                # A 4xx other than 429 is our fault, not a sign the endpoint is degraded
+                member.circuit_breaker.record_success()
+                raise TronGridHTTPError(res)
+
+            if res.status_code >= 500:
+                member.circuit_breaker.record_failure()
+            if is_last_attempt:
+                raise TronGridHTTPError(res)
+            failed_members.append(member)
+            await asyncio.sleep(self.retry_policy.backoff(attempt, res.headers.get("Retry-After")))
+
+    @staticmethod
+    def _relative_link(link: str) -> str:
+        """Strips the member's base URL from a `meta.links.next` link, so any member can serve the next page."""
+        parts = urlsplit(link)
+        return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+    @coalesced
     async def get_trx_balance(self, address: str) -> Optional[int]:
-        res = await self.client.post("/walletsolidity/getaccount", json={"address": address, "visible": True})
+        res = await self._request("POST", "/walletsolidity/getaccount", json={"address": address, "visible": True})
         return res.json().get("balance")
 
     async def broadcast_tx(self, signed_tx: Dict[str, Any]) -> Dict[str, Any]:
-        res = await self.client.post("/wallet/broadcasttransaction", json=signed_tx)
+        res = await self._request("POST", "/wallet/broadcasttransaction", json=signed_tx)
         return {**res.json(), "transaction": signed_tx}
 
+    @coalesced
     async def account_info(self, address: str) -> List[Dict[str, Any]]:
-        res = await self.client.get(f"/v1/accounts/{address}")
+        res = await self._request("GET", f"/v1/accounts/{address}")
         return res.json().get("data", [])
 
     async def account_transactions(self, address: str) -> Dict[str, Any]:
-        res = await self.client.get(f"/v1/accounts/{address}/transactions")
+        res = await self._request("GET", f"/v1/accounts/{address}/transactions")
         return res.json()
 
-    async def contract_events(self, address: str, event_name: str, min_block_ts: int) -> List[Dict[str, Any]]:
-        path = f"/v1/contracts/{address}/events?event_name={event_name}&order_by=block_timestamp%2Cdesc&min_block_timestamp={min_block_ts}&limit=200"
-        return await self.recursive_get([], path)
+    async def contract_events(
+        self, address: str, event_name: str, min_block_ts: int, max_pages: Optional[int] = None, max_rows: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        return await self.collect_pages(self._contract_events_path(address, event_name, min_block_ts), max_pages, max_rows)
+
+    def iter_contract_events(
+        self, address: str, event_name: str, min_block_ts: int, max_pages: Optional[int] = None, max_rows: Optional[int] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Streams contract events page by page instead of collecting the whole history."""
+        return self.iter_pages(self._contract_events_path(address, event_name, min_block_ts), max_pages, max_rows)
+
+    @staticmethod
+    def _contract_events_path(address: str, event_name: str, min_block_ts: int) -> str:
+        return f"/v1/contracts/{address}/events?event_name={event_name}&order_by=block_timestamp%2Cdesc&min_block_timestamp={min_block_ts}&limit=200"
 
     async def get_trc10(self, address: str) -> Dict[str, Any]:
-        res = await self.client.post("/wallet/getassetissuebyaccount", json={"address": address, "visible": True})
+        res = await self._request("POST", "/wallet/getassetissuebyaccount", json={"address": address, "visible": True})
         return res.json()
 
     async def get_link(self, link: str) -> httpx.Response:
-        return await self.client.get(link)
-
-    async def recursive_get(self, current: List[Dict[str, Any]], link: str) -> List[Dict[str, Any]]:
-        res = await self.get_link(link)
-        data = res.json()
-        next_data = current + data.get("data", [])
-
-        next_link = data.get("meta", {}).get("links", {}).get("next")
-        if next_link:
-            return await self.recursive_get(next_data, next_link[len(BASE_URL):])  # Remove RPC base URL
-        return next_data
+        return await self._request("GET", link)
 
     async def get_list_exchanges(self) -> Dict[str, Any]:
-        res = await self.client.get("/walletsolidity/listexchanges?visible=true")
-        return res.json()
+        cached = await self.cache.get("exchanges", "all")
+        if cached is not None:
+            return cached
+        res = await self._request("GET", "/walletsolidity/listexchanges?visible=true")
+        data = res.json()
+        await self.cache.set("exchanges", "all", data)
+        return data
 
+    @coalesced
     async def get_tx_info(self, tx_id: str) -> Dict[str, Any]:
-        res = await self.client.post("/walletsolidity/gettransactionbyid", json={"value": tx_id})
-        return res.json()
+        cached = await self.cache.get("tx_info", tx_id)
+        if cached is not None:
+            return cached
+        res = await self._request("POST", "/walletsolidity/gettransactionbyid", json={"value": tx_id})
+        data = res.json()
+        if data:  # Unconfirmed transactions come back as {} and must be asked for again later
+            await self.cache.set("tx_info", tx_id, data)
+        return data
 
     async def get_pending_tx(self, tx_id: str) -> Dict[str, Any]:
-        res = await self.client.post("/wallet/gettransactionfrompending", json={"value": tx_id})
+        res = await self._request("POST", "/wallet/gettransactionfrompending", json={"value": tx_id})
         return res.json()
 
-    async def get_from_txs(self, account: str, min_ts: int) -> List[Dict[str, Any]]:
+    async def iter_pages(
+        self, path: str, max_pages: Optional[int] = None, max_rows: Optional[int] = None, shape: Optional[str] = None
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Yields the `data` of each page, following TronGrid's `meta.links.next` fingerprint cursor.
+        `shape` selects a typed decoder from `adapter.decoding` that keeps only the fields we parse.
+        """
+        link = path
+        pages = rows = 0
+        while link:
+            res = await self.get_link(link)
+            data = decode_page(res.content, shape) if settings.trongrid.fast_decode else decode_json(res.content)
+            page = data.get("data", [])
+            if max_rows is not None and rows + len(page) > max_rows:
+                page = page[:max_rows - rows]
+            yield page
+
+            pages += 1
+            rows += len(page)
+            if (max_pages is not None and pages >= max_pages) or (max_rows is not None and rows >= max_rows):
+                return
+
+            next_link = data.get("meta", {}).get("links", {}).get("next")
+            link = self._relative_link(next_link) if next_link else None
+
+    async def collect_pages(
+        self, path: str, max_pages: Optional[int] = None, max_rows: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Collects every page into a single list."""
+        rows = []
+        async for page in self.iter_pages(path, max_pages, max_rows):
+            rows.extend(page)
+        return rows
+
+    async def get_from_txs(self, account: str, min_ts: int) -> AsyncIterator[List[Dict[str, Any]]]:
         path = f"/v1/accounts/{account}/transactions?only_from=true&min_timestamp={min_ts}&limit=200&order_by=block_timestamp,asc"
-        res = await self.client.get(path)
-        return res.json().get("data", [])
-    
-    async def get_to_txs(self, account: str, min_ts: int) -> List[Dict[str, Any]]:
+        async for page in self.iter_pages(path, shape=ACCOUNT_TX_PAGE):
+            yield page
+
+    async def get_to_txs(self, account: str, min_ts: int) -> AsyncIterator[List[Dict[str, Any]]]:
         path = f"/v1/accounts/{account}/transactions?only_to=true&min_timestamp={min_ts}&limit=200&order_by=block_timestamp,asc"
-        res = await self.client.get(path)
-        return res.json().get("data", [])
-    
-    async def get_trc20_txs(self, account: str, min_ts: int) -> List[Dict[str, Any]]:
+        async for page in self.iter_pages(path, shape=ACCOUNT_TX_PAGE):
+            yield page
+
+    async def get_trc20_txs(self, account: str, min_ts: int) -> AsyncIterator[List[Dict[str, Any]]]:
         path = f"/v1/accounts/{account}/transactions/trc20?min_timestamp={min_ts}&limit=200&order_by=block_timestamp,asc"
-        res = await self.client.get(path)
-        return res.json().get("data", [])
-    
+        async for page in self.iter_pages(path, shape=TRC20_TRANSFER_PAGE):
+            yield page
+
     async def estimate_energy(self, data: Dict[str, Any]) -> Dict[str, Any]:
         path = "/wallet/estimateenergy"
-        res = await self.client.post(path, json={**data, "visible": True})
+        res = await self._request("POST", path, json={**data, "visible": True})
         return res.json()
 
     async def get_events_by_tx_id(self, tx_id: str) -> List[Dict[str, Any]]:
+        cached = await self.cache.get("tx_events", tx_id)
+        if cached is not None:
+            return cached
         path = f"/v1/transactions/{tx_id}/events"
-        res = await self.client.get(path)
-        return res.json().get("data", [])
+        res = await self._request("GET", path)
+        data = res.json().get("data", [])
+        if data:
+            await self.cache.set("tx_events", tx_id, data)
+        return data
+
+    async def close_connections(self):
+        """Closes the pooled HTTP connections of the running loop; call at the end of each Celery tick."""
+        await self.pool.aclose()
+
+    async def aclose(self):
+        await self.pool.aclose()
+        self.cache.close()
 
 # Initialize a client instance
 tron_grid_client = TronGridClient()
\ No newline at end of file
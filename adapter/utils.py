@@ -1,10 +1,10 @@
-import base58
+from adapter.address_codec import address_codec
 
 class TronUtils:
     @staticmethod
     def from_hex_address(address: str):
-        return base58.b58encode_check(bytes.fromhex(address)).decode("utf-8")
+        return address_codec.from_hex(address)
 
     @staticmethod
     def to_hex_address(address: str):
-        return base58.b58decode_check(address).hex().lower()
+        return address_codec.to_hex(address)
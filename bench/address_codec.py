@@ -0,0 +1,52 @@
+"""Address codec benchmark; run from the repository root with `python -m bench.address_codec`."""
+import random
+import sys
+import timeit
+import base58
+from adapter.address_codec import AddressCodec, KNOWN_ADDRESSES
+
+
+def plain_from_hex(address: str) -> str:
+    """The conversion TronUtils.from_hex_address used to run for every row."""
+    return base58.b58encode_check(bytes.fromhex(address)).decode("utf-8")
+
+
+def make_column(rows: int, distinct: int, seed: int = 7) -> list[str]:
+    """Hex addresses skewed like crawled pages: the known counterparties and a few hundred others."""
+    rng = random.Random(seed)
+    others = ["41" + rng.randbytes(20).hex() for _ in range(distinct)]
+    known = [base58.b58decode_check(address).hex() for address in KNOWN_ADDRESSES]
+    # Half the rows hit a known counterparty, the rest follow a long-tailed distribution
+    weights = [1 / (rank + 1) for rank in range(distinct)]
+    column = rng.choices(others, weights=weights, k=rows // 2) + rng.choices(known, k=rows - rows // 2)
+    rng.shuffle(column)
+    return column
+
+
+def main(rows: int = 100_000, distinct: int = 500, repeat: int = 5):
+    column = make_column(rows, distinct)
+    codec = AddressCodec(known_addresses=KNOWN_ADDRESSES)
+    assert codec.from_hex_many(column) == [plain_from_hex(address) for address in column]
+
+    cases = {
+        "plain base58check": lambda: [plain_from_hex(address) for address in column],
+        "codec.from_hex": lambda: [codec.from_hex(address) for address in column],
+        "codec.from_hex_many": lambda: codec.from_hex_many(column),
+    }
+    print(f"{rows} rows, {distinct} distinct non-constant addresses, best of {repeat}")
+    baseline = None
+    for name, case in cases.items():
+        best = min(timeit.repeat(case, number=1, repeat=repeat))
+        baseline = baseline or best
+        print(f"{name:<22} {best * 1000:9.2f} ms  {rows / best / 1e6:6.2f} M rows/s  x{baseline / best:.1f}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (1, 3):
+        print("Usage: python -m bench.address_codec [<rows> <distinct>]")
+        sys.exit(1)
+
+    if len(sys.argv) == 3:
+        main(int(sys.argv[1]), int(sys.argv[2]))
+    else:
+        main()
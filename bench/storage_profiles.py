@@ -0,0 +1,166 @@
+"""Storage profile benchmark against a live ClickHouse; run from the repository root with `python -m bench.storage_profiles`."""
+import asyncio
+import random
+import sys
+import time
+from clickhouse import ch_client_manager
+from consts import ROUTER_ADDRESS, SUNPUMP_ADDRESS, token_configs
+from adapter.address_codec import address_codec
+from entities.address_columns import encode_columns
+from entities.from_transaction import FromTransactionRepo
+from entities.storage_profile import STORAGE_PROFILES, ddl_parameters
+from entities.trc20_transfer import Trc20TransferRepo
+from entities.types import NormalTransactionType
+from report_engine import TABLE_PASSES, TablePass, report_parameters
+
+START_MS = 1_704_067_200_000  # 2024-01-01
+SPAN_MS = 90 * 24 * 3600 * 1000
+INSERT_CHUNK = 100_000
+
+
+def make_accounts(count: int, rng: random.Random) -> list[str]:
+    return address_codec.from_hex_many(["41" + rng.randbytes(20).hex() for _ in range(count)])
+
+
+def make_from_transactions(rows: int, accounts: list[str], rng: random.Random) -> list[list]:
+    """Synthetic from_transaction columns: maker accounts trading mostly with the router, pairs and SunPump."""
+    token = next(iter(token_configs.values()))
+    counterparties = [ROUTER_ADDRESS, SUNPUMP_ADDRESS, token.pair, token.address, *rng.sample(accounts, 20)]
+    types = [t.value for t in NormalTransactionType if t != NormalTransactionType.TRANSFER_ASSET_CONTRACT]
+    timestamps = [START_MS + rng.randrange(SPAN_MS) // 3000 * 3000 for _ in range(rows)]
+    internal = [rng.random() < 0.2 for _ in range(rows)]
+    return [
+        ["SUCCESS" if rng.random() < 0.97 else "REVERT" for _ in range(rows)],
+        [rng.randbytes(32).hex() for _ in range(rows)],
+        ["" if not is_internal else rng.randbytes(32).hex() for is_internal in internal],
+        [rng.choice((0, 345_000, 1_100_000, 13_844_850)) for _ in range(rows)],
+        [int(rng.lognormvariate(16, 2)) for _ in range(rows)],
+        [(ts - START_MS) // 3000 + 57_000_000 for ts in timestamps],
+        timestamps,
+        [rng.choice(accounts) for _ in range(rows)],
+        rng.choices(counterparties, weights=[40, 20, 10, 5, *[1] * 20], k=rows),
+        [NormalTransactionType.INTERNAL.value if is_internal else rng.choice(types) for is_internal in internal],
+    ]
+
+
+def make_trc20_transfers(rows: int, accounts: list[str], rng: random.Random) -> list[list]:
+    """Synthetic trc20_transfer columns: tracked accounts swapping the configured tokens against their pairs."""
+    tokens = list(token_configs.values())
+    picked = [rng.choice(tokens) for _ in range(rows)]
+    keys = [rng.choice(accounts) for _ in range(rows)]
+    sells = [rng.random() < 0.5 for _ in range(rows)]
+    return [
+        [rng.randbytes(32).hex() for _ in range(rows)],
+        [token.address for token in picked],
+        [START_MS + rng.randrange(SPAN_MS) // 3000 * 3000 for _ in range(rows)],
+        keys,
+        [key if sell else token.pair for key, token, sell in zip(keys, picked, sells)],
+        [token.pair if sell else key for key, token, sell in zip(keys, picked, sells)],
+        [str(int(rng.lognormvariate(40, 3))) for _ in range(rows)],
+    ]
+
+
+async def load_table(repo, table: str, profile: str, columns: list[list]):
+    async with ch_client_manager.borrow() as client:
+        await client.command(f"DROP TABLE IF EXISTS {table}")
+        await client.command(repo.DDL.format(table=table, **ddl_parameters(profile)))
+        data = encode_columns(repo.COLUMNS, columns, repo.ADDRESS_COLUMNS)
+        for start in range(0, len(columns[0]), INSERT_CHUNK):
+            chunk = [column[start:start + INSERT_CHUNK] for column in data]
+            await client.insert(
+                table, chunk, column_names=repo.COLUMNS, column_oriented=True,
+                settings={"max_partitions_per_insert_block": 0},
+            )
+        # Compare fully merged tables
+        await client.command(f"OPTIMIZE TABLE {table} FINAL")
+
+
+async def table_size(table: str) -> tuple[int, int, int]:
+    """(bytes on disk, compressed data bytes, uncompressed data bytes) of the active parts."""
+    async with ch_client_manager.borrow() as client:
+        result = await client.query(
+            """
+            SELECT sum(bytes_on_disk), sum(data_compressed_bytes), sum(data_uncompressed_bytes)
+            FROM system.parts
+            WHERE active AND database = currentDatabase() AND table = %(table)s
+            """,
+            parameters={"table": table},
+        )
+    return tuple(int(value) for value in result.result_rows[0])
+
+
+async def column_sizes(table: str) -> dict[str, int]:
+    async with ch_client_manager.borrow() as client:
+        result = await client.query(
+            """
+            SELECT name, data_compressed_bytes
+            FROM system.columns
+            WHERE database = currentDatabase() AND table = %(table)s
+            ORDER BY position
+            """,
+            parameters={"table": table},
+        )
+    return {name: int(size) for name, size in result.result_rows}
+
+
+async def best_time(query: str, parameters: dict, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with ch_client_manager.borrow() as client:
+            started = time.perf_counter()
+            await client.query(query, parameters=parameters, settings={"use_query_cache": 0})
+            best = min(best, time.perf_counter() - started)
+    return best
+
+
+async def main(rows: int = 1_000_000, accounts_count: int = 200, repeat: int = 5, keep: bool = False):
+    rng = random.Random(7)
+    accounts = make_accounts(accounts_count, rng)
+    token = next(iter(token_configs))
+    tracked = rng.sample(accounts, 10)
+    parameters = report_parameters(token, tracked, START_MS + SPAN_MS)
+    tables = [
+        (FromTransactionRepo, TABLE_PASSES[0], make_from_transactions(rows, accounts, rng)),
+        (Trc20TransferRepo, TABLE_PASSES[2], make_trc20_transfers(rows, accounts, rng)),
+    ]
+    print(f"{rows} rows per table, {accounts_count} accounts, report over {len(tracked)}, best of {repeat}")
+    try:
+        for repo, table_pass, columns in tables:
+            print(f"\n{repo.TABLE}")
+            print(f"{'profile':<10} {'on disk':>10} {'compressed':>11} {'ratio':>6} {'report':>9} {'full scan':>10}")
+            per_column = {}
+            for profile in STORAGE_PROFILES:
+                table = f"bench_{repo.TABLE}_{profile}"
+                await load_table(repo, table, profile, columns)
+                on_disk, compressed, uncompressed = await table_size(table)
+                per_column[profile] = await column_sizes(table)
+                report = await best_time(TablePass(table, table_pass.where, table_pass.metrics).compile(), parameters, repeat)
+                scan = await best_time(f"SELECT count(), sum(block_timestamp), uniq(tx_id) FROM {table}", {}, repeat)
+                print(
+                    f"{profile:<10} {on_disk / 2**20:8.1f}MB {compressed / 2**20:9.1f}MB {uncompressed / max(compressed, 1):6.1f}"
+                    f" {report * 1000:7.1f}ms {scan * 1000:8.1f}ms"
+                )
+            print("compressed bytes per column: " + ", ".join(
+                f"{name} {' -> '.join(f'{sizes[name] / 2**20:.1f}MB' for sizes in per_column.values())}"
+                for name in repo.COLUMNS
+            ))
+    finally:
+        if not keep:
+            async with ch_client_manager.borrow() as client:
+                for repo, _, _ in tables:
+                    for profile in STORAGE_PROFILES:
+                        await client.command(f"DROP TABLE IF EXISTS bench_{repo.TABLE}_{profile}")
+        await ch_client_manager.close()
+
+
+if __name__ == "__main__":
+    keep = "--keep" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != "--keep"]
+    if len(args) not in (0, 2):
+        print("Usage: python -m bench.storage_profiles [<rows> <accounts>] [--keep]")
+        sys.exit(1)
+
+    if args:
+        asyncio.run(main(int(args[0]), int(args[1]), keep=keep))
+    else:
+        asyncio.run(main(keep=keep))
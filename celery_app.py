@@ -5,4 +5,12 @@ celery_app = Celery(
     "tasks",
     broker=settings.redis.url,
     backend=settings.redis.url,
+    # Modules defining tasks, so every worker registers all of them regardless of how it was started
+    include=[
+        "celery_jobs.crawl_from_transactions",
+        "celery_jobs.crawl_to_transactions",
+        "celery_jobs.crawl_trc20_transactions",
+        "celery_jobs.crawl_account_cycle",
+        "celery_jobs.refresh_hourly_activity",
+    ],
 )
\ No newline at end of file
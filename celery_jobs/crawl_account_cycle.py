@@ -0,0 +1,30 @@
+import asyncio
+from adapter.tron_grid_client import tron_grid_client
+from celery_app import celery_app
+from celery.schedules import timedelta
+from settings import settings
+from tasks.account_cycle import AccountCrawlCycle
+from tracked_accounts import tracked_accounts
+
+async def crawl_all_accounts(accounts: list[str]):
+    cycle = AccountCrawlCycle()
+    try:
+        await cycle.run(accounts)
+    finally:
+        # This tick's event loop ends here; the next tick opens its own connections
+        await tron_grid_client.close_connections()
+
+@celery_app.task
+def crawl_account_cycle_task():
+    accounts = tracked_accounts
+    asyncio.run(crawl_all_accounts(accounts))
+
+
+@celery_app.on_after_finalize.connect
+def setup_periodic_tasks(sender, **kwargs):
+    if settings.crawler.mode != "combined":
+        return
+    sender.add_periodic_task(
+        timedelta(seconds=40),  # Run every 40 secs
+        crawl_account_cycle_task.s(),
+    )
@@ -1,13 +1,21 @@
 import asyncio
+from adapter.tron_grid_client import tron_grid_client
 from celery_app import celery_app
 from celery.schedules import timedelta
+from settings import settings
 from tasks.crawl_to_transactions import ToTransactionCrawler
 from tracked_accounts import tracked_accounts
 
 async def crawl_all_to_accounts(accounts: list[str]):
-    crawler = ToTransactionCrawler()
-    tasks = [crawler.crawl_transactions(account) for account in accounts]
-    await asyncio.gather(*tasks)  # Run all accounts concurrently
+    crawler = ToTransactionCrawler(use_insert_buffer=True)  # One insert per tick instead of one per account
+    try:
+        watermarks = await crawler.load_watermarks(accounts)  # One round trip for every account
+        tasks = [crawler.crawl_transactions(account, watermarks.get(account)) for account in accounts]
+        await asyncio.gather(*tasks)  # Run all accounts concurrently
+        await crawler.insert_buffer.flush()
+    finally:
+        # This tick's event loop ends here; the next tick opens its own connections
+        await tron_grid_client.close_connections()
 
 @celery_app.task
 def crawl_to_transactions_task():
@@ -17,6 +25,8 @@ def crawl_to_transactions_task():
 
 @celery_app.on_after_finalize.connect
 def setup_periodic_tasks(sender, **kwargs):
+    if settings.crawler.mode == "combined":
+        return  # Scheduled by celery_jobs.crawl_account_cycle instead
     sender.add_periodic_task(
         timedelta(seconds=40),  # Run every 40 secs
         crawl_to_transactions_task.s(),
@@ -0,0 +1,25 @@
+import asyncio
+import time
+from celery_app import celery_app
+from celery.schedules import timedelta
+from entities.hourly_activity import HourlyActivityRepo
+from settings import settings
+
+@celery_app.task
+def refresh_hourly_activity_task(window: float | None = None):
+    """Recomputes hourly_activity from the deduplicated tables: the months covering the last `window` seconds, or all of it."""
+    since = 0 if window is None else int(time.time() - window)
+    asyncio.run(HourlyActivityRepo.refresh(since))
+
+
+@celery_app.on_after_finalize.connect
+def setup_periodic_tasks(sender, **kwargs):
+    sender.add_periodic_task(
+        timedelta(seconds=settings.hourly_activity.refresh_interval),
+        refresh_hourly_activity_task.s(settings.hourly_activity.refresh_window),
+    )
+    # Duplicates of older rows, e.g. from a backfill, only go away with a full refresh
+    sender.add_periodic_task(
+        timedelta(seconds=settings.hourly_activity.full_refresh_interval),
+        refresh_hourly_activity_task.s(None),
+    )
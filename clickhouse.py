@@ -1,3 +1,7 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
 import clickhouse_connect
 from settings import settings
 
@@ -8,13 +12,146 @@ async def get_async_ch_client():
         database=settings.clickhouse.database,
         username=settings.clickhouse.username,
         password=settings.clickhouse.password,
+        # Each pooled client runs one query at a time, so one executor thread is enough
+        executor_threads=1,
     )
 
 
+class ClickHouseClientManager:
+    """
+    Pool of long-lived async ClickHouse clients. Repos borrow a client per query instead of
+    paying for a new client, session setup and server version probe every time.
+    """
+
+    def __init__(self, pool_size: int, health_check_interval: float):
+        self.pool_size = pool_size
+        self.health_check_interval = health_check_interval
+        # (client, last time it was known healthy), most recently returned last
+        self._idle: list[tuple] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # Prepared column-oriented insert contexts, by (id(client), table, settings)
+        self._insert_contexts: dict[tuple, object] = {}
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Clients run queries on their own threads and survive across loops, but the semaphore doesn't
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.pool_size)
+            self._loop = loop
+        return self._semaphore
+
+    async def _acquire(self):
+        while self._idle:
+            client, checked_at = self._idle.pop()
+            if time.monotonic() - checked_at < self.health_check_interval or await client.ping():
+                return client
+            await self._close_client(client)
+        return await get_async_ch_client()
+
+    @asynccontextmanager
+    async def borrow(self):
+        """Borrows a client for the duration of the block, waiting if all `pool_size` clients are busy."""
+        async with self._get_semaphore():
+            client = await self._acquire()
+            healthy = True
+            try:
+                yield client
+            except Exception:
+                # A failed query may mean a dead connection; ping before handing this client out again
+                healthy = False
+                raise
+            finally:
+                checked_at = time.monotonic() if healthy else 0.0
+                if len(self._idle) < self.pool_size:
+                    self._idle.append((client, checked_at))
+                else:
+                    await self._close_client(client)
+
+    async def insert_columns(
+        self,
+        client,
+        table: str,
+        column_names: list[str],
+        data: list,
+        insert_settings: dict | None = None,
+        dedup_token: str | None = None,
+    ):
+        """
+        Column-oriented insert through a prepared context that is kept per client and table, so the
+        column types are only looked up the first time. A context is dropped when an insert through
+        it fails, e.g. because migrations.py rebuilt the table with other column types in another
+        process, so the retry prepares it again. With `dedup_token`, ClickHouse ignores a retry of a
+        block it already stored (needs `non_replicated_deduplication_window` on the table).
+        """
+        key = (id(client), table, tuple(sorted((insert_settings or {}).items())))
+        context = self._insert_contexts.get(key)
+        if context is None:
+            context = await client.create_insert_context(
+                table, column_names, column_oriented=True, settings=insert_settings
+            )
+            self._insert_contexts[key] = context
+        context.settings = dict(insert_settings or {})
+        if dedup_token:
+            context.settings["insert_deduplication_token"] = dedup_token
+            # A deduplicated retry must not reach the materialized views a second time either
+            context.settings["deduplicate_blocks_in_dependent_materialized_views"] = 1
+        context.data = data
+        try:
+            return await client.insert(context=context)
+        except Exception:
+            self._insert_contexts.pop(key, None)
+            raise
+        finally:
+            # Don't keep the batch alive through the cached context
+            context.data = None
+
+    def clear_insert_contexts(self, table: str):
+        """Forgets the prepared insert contexts of `table`, e.g. after its schema changed."""
+        for key in [key for key in self._insert_contexts if key[1] == table]:
+            del self._insert_contexts[key]
+
+    async def health_check(self) -> bool:
+        """Pings the server through a pooled client."""
+        try:
+            async with self.borrow() as client:
+                return await client.ping()
+        except Exception as e:
+            print(f"ClickHouse health check failed: {e}")
+            return False
+
+    async def close(self):
+        """Closes every pooled client; call once no queries are running."""
+        idle, self._idle = self._idle, []
+        for client, _ in idle:
+            await self._close_client(client)
+
+    async def _close_client(self, client):
+        for key in [key for key in self._insert_contexts if key[0] == id(client)]:
+            del self._insert_contexts[key]
+        try:
+            await client.close()
+        except Exception as e:
+            print(f"Error closing ClickHouse client: {e}")
+
+
+ch_client_manager = ClickHouseClientManager(
+    pool_size=settings.clickhouse.pool_size,
+    health_check_interval=settings.clickhouse.health_check_interval,
+)
+
+_sync_client = None
+
+
 def get_sync_ch_client():
-    return clickhouse_connect.get_client(
-        host=settings.clickhouse.host,
-        database=settings.clickhouse.database,
-        username=settings.clickhouse.username,
-        password=settings.clickhouse.password,
-    )
+    """Returns the process-wide sync client; it is thread-safe as long as it doesn't use a session."""
+    global _sync_client
+    if _sync_client is None:
+        _sync_client = clickhouse_connect.get_client(
+            host=settings.clickhouse.host,
+            database=settings.clickhouse.database,
+            username=settings.clickhouse.username,
+            password=settings.clickhouse.password,
+            autogenerate_session_id=False,
+        )
+    return _sync_client
@@ -0,0 +1,56 @@
+from typing import Sequence
+from adapter.address_codec import address_codec
+from settings import settings
+
+# With CLICKHOUSE_BINARY_ADDRESSES, address columns hold the raw 21 bytes (0x41 + 20) instead of base58 text
+BINARY_ADDRESSES = settings.clickhouse.binary_addresses
+ADDRESS_TYPE = "FixedString(21)" if BINARY_ADDRESSES else "String"
+
+# SQL converting an address column between the two forms, used when migrations.py copies rows across.
+# base58Decode keeps the 4-byte checksum, which the binary form drops and the base58 form recomputes.
+TO_BINARY_SQL = "toFixedString(substring(base58Decode({column}), 1, 21), 21)"
+TO_BASE58_SQL = (
+    "if({column} = toFixedString('', 21), '', "
+    "base58Encode(concat({column}, substring(SHA256(SHA256({column})), 1, 4))))"
+)
+
+
+def address_param(name: str) -> str:
+    """SQL for a single address query parameter, bound with `bind_address`."""
+    return f"toFixedString(unhex(%({name})s), 21)" if BINARY_ADDRESSES else f"%({name})s"
+
+
+def address_set_param(name: str) -> str:
+    """SQL for the right-hand side of `IN` over an address list parameter, bound with `bind_addresses`."""
+    return f"(SELECT toFixedString(unhex(arrayJoin(%({name})s)), 21))" if BINARY_ADDRESSES else f"%({name})s"
+
+
+def bind_address(address: str) -> str:
+    return address_codec.to_hex(address) if BINARY_ADDRESSES else address
+
+
+def bind_addresses(addresses: Sequence[str]) -> list[str]:
+    return address_codec.to_hex_many(addresses) if BINARY_ADDRESSES else list(addresses)
+
+
+def decode_address(value: str | bytes) -> str:
+    """base58 address from a query result, whichever form the column stores."""
+    return address_codec.from_binary(value) if isinstance(value, bytes) else value
+
+
+def encode_columns(column_names: Sequence[str], data: Sequence[Sequence], address_columns: Sequence[str]) -> list:
+    """Column-oriented insert data with the address columns converted to the stored form."""
+    if not BINARY_ADDRESSES:
+        return list(data)
+    return [
+        address_codec.to_binary_many(column) if name in address_columns else column
+        for name, column in zip(column_names, data)
+    ]
+
+
+def encode_rows(column_names: Sequence[str], rows: Sequence[Sequence], address_columns: Sequence[str]) -> list:
+    """Row-oriented insert data with the address columns converted to the stored form."""
+    if not BINARY_ADDRESSES or not rows:
+        return list(rows)
+    columns = encode_columns(column_names, list(zip(*rows)), address_columns)
+    return [list(row) for row in zip(*columns)]
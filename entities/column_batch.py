@@ -0,0 +1,85 @@
+import hashlib
+from array import array
+from itertools import compress
+from typing import Iterable, Iterator, Sequence
+
+
+class ColumnBatch:
+    """
+    Rows for one table held column by column, in the table's `COLUMNS` order: an `array('Q')`
+    for each UInt64 column and a plain list for everything else. Parsers append straight into
+    the columns, so the ingest path builds no per-row model or row list before the insert.
+    """
+
+    def __init__(self, column_names: Sequence[str], uint64_columns: Iterable[str] = ()):
+        uint64_columns = set(uint64_columns)
+        self.column_names = list(column_names)
+        self.columns = {name: array("Q") if name in uint64_columns else [] for name in self.column_names}
+        # Same objects as `columns`, in insert order
+        self._data = [self.columns[name] for name in self.column_names]
+
+    def __len__(self) -> int:
+        return len(self._data[0]) if self._data else 0
+
+    def append(self, row: Sequence):
+        """Appends one row given in `COLUMNS` order; a bad value leaves the batch unchanged."""
+        size = len(self)
+        try:
+            for column, value in zip(self._data, row, strict=True):
+                column.append(value)
+        except Exception:
+            for column in self._data:
+                del column[size:]
+            raise
+
+    def extend_columns(self, columns: Sequence[Sequence]):
+        """Appends whole columns given in `COLUMNS` order; a bad value leaves the batch unchanged."""
+        size = len(self)
+        try:
+            for column, values in zip(self._data, columns, strict=True):
+                column.extend(values)
+        except Exception:
+            for column in self._data:
+                del column[size:]
+            raise
+
+    def filter(self, keep: Sequence[bool]) -> "ColumnBatch":
+        """A new batch holding the rows whose `keep` flag is set."""
+        uint64_columns = [name for name, column in self.columns.items() if isinstance(column, array)]
+        filtered = ColumnBatch(self.column_names, uint64_columns)
+        for column, values in zip(filtered._data, self._data):
+            column.extend(compress(values, keep))
+        return filtered
+
+    def extend(self, other: "ColumnBatch"):
+        for column, other_column in zip(self._data, other._data):
+            column.extend(other_column)
+
+    def clear(self):
+        for column in self._data:
+            del column[:]
+
+    def data(self) -> list:
+        """The columns in `COLUMNS` order, as taken by a column-oriented insert."""
+        return self._data
+
+    def keys(self, names: Sequence[str]) -> Iterator[tuple]:
+        """Yields the values of columns `names` for each row, e.g. a table's dedup key."""
+        return zip(*[self.columns[name] for name in names])
+
+    def fingerprint(self, names: Sequence[str]) -> str:
+        """Hash of the rows' `names` columns, used as the insert deduplication token of this batch."""
+        digest = hashlib.blake2b(digest_size=16)
+        for key in self.keys(names):
+            digest.update("\x1f".join(map(str, key)).encode())
+            digest.update(b"\x1e")
+        return digest.hexdigest()
+
+    def estimated_bytes(self) -> int:
+        size = 0
+        for column in self._data:
+            if isinstance(column, array):
+                size += column.itemsize * len(column)
+            else:
+                size += sum(len(value) if isinstance(value, str) else 8 for value in column)
+        return size
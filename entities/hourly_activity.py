@@ -0,0 +1,152 @@
+from datetime import datetime, timezone
+from clickhouse import ch_client_manager
+from entities.address_columns import ADDRESS_TYPE
+
+# toStartOfHour of a millisecond block_timestamp
+HOUR_EXPR = "toStartOfHour(toDateTime(intDiv(block_timestamp, 1000)))"
+
+# One SELECT per ingest table, as (view name, source table, select); both the views and `rebuild` use them
+SOURCES = [
+    (
+        "hourly_activity_from_mv",
+        "from_transaction",
+        f"""
+        SELECT
+            `from` AS account,
+            `to` AS counterparty,
+            'out' AS direction,
+            {HOUR_EXPR} AS hour,
+            sum(if(status = 'SUCCESS', value, 0)) AS volume,
+            sum(total_fee) AS fee,
+            count() AS tx_count
+        FROM {{source}}
+        GROUP BY account, counterparty, direction, hour
+        """,
+    ),
+    (
+        "hourly_activity_to_mv",
+        "to_transaction",
+        f"""
+        SELECT
+            `to` AS account,
+            `from` AS counterparty,
+            'in' AS direction,
+            {HOUR_EXPR} AS hour,
+            sum(if(status = 'SUCCESS', value, 0)) AS volume,
+            sum(total_fee) AS fee,
+            count() AS tx_count
+        FROM {{source}}
+        GROUP BY account, counterparty, direction, hour
+        """,
+    ),
+]
+
+
+class HourlyActivityRepo:
+    """
+    Hourly TRX volume (successful transfers only), fees and counts per tracked account and
+    counterparty, kept up to date by materialized views on from_transaction ('out') and
+    to_transaction ('in'). Charts read a few rows per hour from here instead of re-aggregating
+    the raw history on every refresh.
+
+    The views sum every inserted block, so a duplicate that reaches an ingest table is counted
+    twice here until `refresh` recomputes its month from the deduplicated tables; celery_jobs/
+    refresh_hourly_activity.py does so for recent months on a schedule.
+    """
+
+    TABLE = "hourly_activity"
+    DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            account {address},
+            counterparty {address},
+            direction LowCardinality(String),
+            hour DateTime,
+            volume SimpleAggregateFunction(sum, UInt64),
+            fee SimpleAggregateFunction(sum, UInt64),
+            tx_count SimpleAggregateFunction(sum, UInt64)
+        ) ENGINE = AggregatingMergeTree()
+        PARTITION BY toYYYYMM(hour)
+        ORDER BY (counterparty, account, direction, hour)
+        """
+
+    @classmethod
+    async def create_table(cls, table: str | None = None):
+        """Creates the hourly_activity table if it doesn't exist."""
+        async with ch_client_manager.borrow() as client:
+            await client.command(cls.DDL.format(table=table or cls.TABLE, address=ADDRESS_TYPE))
+
+    @classmethod
+    async def create_views(cls, source_table: str | None = None):
+        """Creates the materialized views that feed new ingest rows into the table (those of `source_table` only, if given)."""
+        async with ch_client_manager.borrow() as client:
+            for view, source, select in SOURCES:
+                if source_table in (None, source):
+                    await client.command(
+                        f"CREATE MATERIALIZED VIEW IF NOT EXISTS {view} TO {cls.TABLE} AS {select.format(source=source)}"
+                    )
+
+    @classmethod
+    async def drop_views(cls, source_table: str | None = None):
+        async with ch_client_manager.borrow() as client:
+            for view, source, _ in SOURCES:
+                if source_table in (None, source):
+                    await client.command(f"DROP VIEW IF EXISTS {view}")
+
+    @classmethod
+    async def rebuild(cls):
+        """
+        Recomputes the table from the deduplicated (FINAL) ingest tables, emptying it first; used to
+        backfill a new table, `refresh` updates a live one. Rows ingested while this runs may be
+        counted twice until the next refresh.
+        """
+        async with ch_client_manager.borrow() as client:
+            await client.command(f"TRUNCATE TABLE IF EXISTS {cls.TABLE}")
+            for _, source, select in SOURCES:
+                await client.command(
+                    f"INSERT INTO {cls.TABLE} {select.format(source=f'{source} FINAL')}",
+                    settings={"max_partitions_per_insert_block": 0},
+                )
+
+    @classmethod
+    async def refresh(cls, since: int = 0):
+        """
+        Recomputes every month from `since` (unix seconds) on from the deduplicated (FINAL) ingest
+        tables in a scratch table, then swaps each month's partition in at once, so charts never
+        see a partial month. Rows inserted while this runs may be missing until the next refresh.
+        """
+        scratch = f"{cls.TABLE}__refresh"
+        month_start = datetime.fromtimestamp(since, timezone.utc).replace(day=1, hour=0, minute=0, second=0)
+        from_ms = int(month_start.timestamp()) * 1000
+        async with ch_client_manager.borrow() as client:
+            await client.command(f"DROP TABLE IF EXISTS {scratch}")
+            await client.command(cls.DDL.format(table=scratch, address=ADDRESS_TYPE))
+            try:
+                for _, source, select in SOURCES:
+                    await client.command(
+                        f"INSERT INTO {scratch} {select.format(source=f'{source} FINAL WHERE block_timestamp >= {from_ms}')}",
+                        settings={"max_partitions_per_insert_block": 0},
+                    )
+                # Months in either table, so a month left without rows is emptied too
+                result = await client.query(
+                    """
+                    SELECT DISTINCT partition_id FROM system.parts
+                    WHERE active AND database = currentDatabase() AND table IN (%(table)s, %(scratch)s)
+                    AND partition_id >= %(first_month)s
+                    ORDER BY partition_id
+                    """,
+                    parameters={"table": cls.TABLE, "scratch": scratch, "first_month": month_start.strftime("%Y%m")},
+                )
+                for (partition_id,) in result.result_rows:
+                    await client.command(f"ALTER TABLE {cls.TABLE} REPLACE PARTITION ID '{partition_id}' FROM {scratch}")
+            finally:
+                await client.command(f"DROP TABLE IF EXISTS {scratch}")
+
+    @classmethod
+    async def recreate(cls):
+        """Drops the views and the table, then creates and backfills them with the current schema."""
+        await cls.drop_views()
+        async with ch_client_manager.borrow() as client:
+            await client.command(f"DROP TABLE IF EXISTS {cls.TABLE}")
+        await cls.create_table()
+        await cls.create_views()
+        await cls.rebuild()
@@ -0,0 +1,72 @@
+from clickhouse import ch_client_manager
+from entities.address_columns import address_param, bind_address, decode_address, encode_columns, encode_rows
+from entities.column_batch import ColumnBatch
+
+
+class IngestRepo:
+    """
+    Insert path shared by the tables the crawlers fill. Subclasses set `TABLE`, `COLUMNS`,
+    `UINT64_COLUMNS`, `ADDRESS_COLUMNS` (stored as `ADDRESS_TYPE`, see entities/address_columns.py)
+    and `DEDUP_KEY` (the columns that identify a record; ReplacingMergeTree collapses rows sharing
+    them), which starts with the crawled account's column.
+    """
+
+    TABLE: str
+    COLUMNS: list[str]
+    UINT64_COLUMNS: tuple[str, ...]
+    ADDRESS_COLUMNS: tuple[str, ...]
+    DEDUP_KEY: tuple[str, ...]
+
+    @classmethod
+    def new_batch(cls) -> ColumnBatch:
+        """An empty column batch for this table."""
+        return ColumnBatch(cls.COLUMNS, cls.UINT64_COLUMNS)
+
+    @classmethod
+    async def insert_columns(cls, batch: ColumnBatch, insert_settings: dict | None = None):
+        """Inserts a column batch through the table's prepared insert context."""
+        if not len(batch):
+            return
+        async with ch_client_manager.borrow() as client:
+            await ch_client_manager.insert_columns(
+                client,
+                cls.TABLE,
+                cls.COLUMNS,
+                encode_columns(cls.COLUMNS, batch.data(), cls.ADDRESS_COLUMNS),
+                insert_settings,
+                dedup_token=batch.fingerprint(cls.DEDUP_KEY),
+            )
+
+    @classmethod
+    async def insert_rows(cls, rows: list[list], insert_settings: dict | None = None):
+        """Inserts pre-built rows, in `COLUMNS` order."""
+        async with ch_client_manager.borrow() as client:
+            await client.insert(
+                cls.TABLE,
+                encode_rows(cls.COLUMNS, rows, cls.ADDRESS_COLUMNS),
+                column_names=cls.COLUMNS,
+                settings=insert_settings,
+            )
+
+    @classmethod
+    async def get_keys_at(cls, account: str, block_timestamp: int) -> set[tuple]:
+        """`DEDUP_KEY` of every stored row of `account` at exactly `block_timestamp`, as in `ColumnBatch.keys`."""
+        account_column = cls.DEDUP_KEY[0]
+        columns = ", ".join(f"`{column}`" for column in cls.DEDUP_KEY)
+        query = f"""
+        SELECT DISTINCT {columns}
+        FROM {cls.TABLE}
+        WHERE `{account_column}` = {address_param('account')} AND block_timestamp = %(block_timestamp)s
+        """
+        async with ch_client_manager.borrow() as client:
+            result = await client.query(
+                query, parameters={"account": bind_address(account), "block_timestamp": block_timestamp}
+            )
+        address_positions = [i for i, column in enumerate(cls.DEDUP_KEY) if column in cls.ADDRESS_COLUMNS]
+        keys = set()
+        for row in result.result_rows:
+            row = list(row)
+            for i in address_positions:
+                row[i] = decode_address(row[i])
+            keys.add(tuple(row))
+        return keys
@@ -0,0 +1,156 @@
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from clickhouse import ch_client_manager
+from entities.column_batch import ColumnBatch
+
+# Buckets ending at least this long before a report runs are persisted; rows stored later that
+# fall into one of them invalidate it (see `ReportInvalidationRepo`)
+SETTLE_MS = 3600 * 1000
+# Allowance for the crawler hosts' clocks running behind ClickHouse's, which dates the bucket scans
+CLOCK_SLACK_MS = 5 * 60 * 1000
+
+
+class ReportBucketRepo:
+    """
+    Per-bucket partial sums of the spending report metrics, keyed by token, the tracked accounts
+    (as a fingerprint) and the bucket size. A row's `bucket` is the end of its bucket, in ms;
+    the sums cover rows with block_timestamp in (bucket - bucket_ms, bucket]. `computed_at` is
+    when the scan behind the sums started, so rows stored since invalidate them.
+    """
+
+    TABLE = "report_bucket"
+    COLUMNS = ["token", "accounts_key", "bucket_ms", "bucket", "metric", "value", "computed_at"]
+    DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            token String,
+            accounts_key String,
+            bucket_ms UInt64,
+            bucket UInt64,
+            metric LowCardinality(String),
+            value Decimal(76, 0),
+            computed_at DateTime DEFAULT now()
+        ) ENGINE = ReplacingMergeTree(computed_at)
+        ORDER BY (token, accounts_key, bucket_ms, bucket, metric)
+        """
+
+    @classmethod
+    async def create_table(cls, table: str | None = None):
+        """Creates the report_bucket table if it doesn't exist."""
+        async with ch_client_manager.borrow() as client:
+            await client.command(cls.DDL.format(table=table or cls.TABLE))
+
+    @classmethod
+    async def get_buckets(cls, token: str, accounts_key: str, bucket_ms: int) -> dict[int, dict[str, Decimal]]:
+        """
+        Stored buckets for the key, as {bucket: {metric: value}}, up to the first one invalidated
+        by rows stored after it was computed; the caller recomputes from there on.
+        """
+        query = f"""
+        SELECT bucket, metric, value, toUnixTimestamp(computed_at)
+        FROM {cls.TABLE} FINAL
+        WHERE token = %(token)s AND accounts_key = %(accounts_key)s AND bucket_ms = %(bucket_ms)s
+        ORDER BY bucket
+        """
+        async with ch_client_manager.borrow() as client:
+            result = await client.query(
+                query, parameters={"token": token, "accounts_key": accounts_key, "bucket_ms": bucket_ms}
+            )
+        buckets: dict[int, dict[str, Decimal]] = {}
+        computed_at: dict[int, int] = {}
+        for bucket, metric, value, computed_s in result.result_rows:
+            buckets.setdefault(int(bucket), {})[metric] = value
+            computed_at[int(bucket)] = min(int(computed_s) * 1000, computed_at.get(int(bucket), int(computed_s) * 1000))
+        if not buckets:
+            return buckets
+
+        invalidations = await ReportInvalidationRepo.get_since(min(computed_at.values()))
+        return valid_prefix(buckets, computed_at, invalidations)
+
+    @classmethod
+    async def insert_buckets(cls, token: str, accounts_key: str, bucket_ms: int, buckets: dict[int, dict], computed_at: float):
+        """Stores bucket sums from a scan started at `computed_at` (unix seconds)."""
+        # Rounded down, so an invalidation recorded in the same second as the scan started still counts
+        computed = datetime.fromtimestamp(int(computed_at), timezone.utc)
+        rows = [
+            [token, accounts_key, bucket_ms, bucket, metric, value, computed]
+            for bucket, metrics in buckets.items()
+            for metric, value in metrics.items()
+        ]
+        if not rows:
+            return
+        async with ch_client_manager.borrow() as client:
+            await client.insert(cls.TABLE, rows, column_names=cls.COLUMNS)
+
+
+def valid_prefix(
+    buckets: dict[int, dict], computed_at: dict[int, int], invalidations: list[tuple[int, int]]
+) -> dict[int, dict]:
+    """
+    The buckets before the first one invalidated, i.e. ending at or after an invalidation's
+    from_timestamp and computed (in ms) no later than it was recorded.
+    """
+    for bucket in sorted(buckets):
+        # A row at block_timestamp ts belongs to the bucket ending at or after ts
+        if any(from_ts <= bucket and at_ms >= computed_at[bucket] for from_ts, at_ms in invalidations):
+            return {b: metrics for b, metrics in buckets.items() if b < bucket}
+    return buckets
+
+
+class ReportInvalidationRepo:
+    """
+    Times at which rows old enough to fall into persisted report buckets were stored. A stored
+    bucket ending at or after `from_timestamp` and computed before `invalidated_at` is stale.
+    """
+
+    TABLE = "report_invalidation"
+    DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            from_timestamp UInt64,
+            invalidated_at DateTime64(3) DEFAULT now64(3)
+        ) ENGINE = MergeTree()
+        ORDER BY invalidated_at
+        """
+
+    @classmethod
+    async def create_table(cls, table: str | None = None):
+        """Creates the report_invalidation table if it doesn't exist."""
+        async with ch_client_manager.borrow() as client:
+            await client.command(cls.DDL.format(table=table or cls.TABLE))
+
+    @classmethod
+    async def record_batch(cls, batch: ColumnBatch):
+        """Records a batch if it reaches back into buckets that may be persisted; see `record_invalidation`."""
+        if not len(batch):
+            return
+        from_ts = min(batch.columns["block_timestamp"])
+        if from_ts > time.time() * 1000 - SETTLE_MS + CLOCK_SLACK_MS:
+            return
+        async with ch_client_manager.borrow() as client:
+            await client.insert(cls.TABLE, [[from_ts]], column_names=["from_timestamp"])
+
+    @classmethod
+    async def get_since(cls, since_ms: int) -> list[tuple[int, int]]:
+        """(from_timestamp, invalidated_at in ms) of invalidations recorded at or after `since_ms`."""
+        query = f"""
+        SELECT from_timestamp, toUnixTimestamp64Milli(invalidated_at)
+        FROM {cls.TABLE}
+        WHERE invalidated_at >= fromUnixTimestamp64Milli(%(since_ms)s)
+        """
+        async with ch_client_manager.borrow() as client:
+            result = await client.query(query, parameters={"since_ms": since_ms})
+        return [(int(from_ts), int(at_ms)) for from_ts, at_ms in result.result_rows]
+
+
+async def record_invalidation(batch: ColumnBatch):
+    """
+    `ReportInvalidationRepo.record_batch`, logging a failure instead of raising it so ingestion
+    never waits on the report cache. Ingest calls it both before and after each insert: before,
+    so a crash after the insert can't leave persisted buckets stale, and after, so a bucket scan
+    that started while the insert was running is invalidated too. Recording a batch that then
+    fails to land only costs a recompute.
+    """
+    try:
+        await ReportInvalidationRepo.record_batch(batch)
+    except Exception as e:
+        print(f"Error recording report invalidation for {len(batch)} rows: {e}")
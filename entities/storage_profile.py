@@ -0,0 +1,35 @@
+from entities.address_columns import ADDRESS_TYPE
+from settings import settings
+
+# Column types and table settings substituted into the ingest tables' `DDL`, by profile name.
+# "plain" is the original schema; "compact" stores few-valued text as LowCardinality, delta-encodes
+# the per-account monotonic block_timestamp / block_number, ZSTD-compresses the rest and uses
+# smaller granules, since most reads select a few accounts out of the sort key. "plain" is the
+# default; opting an existing deployment into "compact" makes the next migration run rebuild every
+# ingest table by copy-and-swap, see migrations.rebuild_table.
+STORAGE_PROFILES = {
+    "plain": {
+        "label": "String",
+        "timestamp_codec": "",
+        "sequence_codec": "",
+        "compressed_codec": "",
+        "index_granularity": 8192,
+    },
+    "compact": {
+        "label": "LowCardinality(String)",
+        "timestamp_codec": " CODEC(DoubleDelta, ZSTD(1))",
+        "sequence_codec": " CODEC(Delta, ZSTD(1))",
+        "compressed_codec": " CODEC(ZSTD(1))",
+        "index_granularity": 4096,
+    },
+}
+
+
+def ddl_parameters(profile: str | None = None, address_type: str | None = None) -> dict:
+    """`DDL.format` arguments (besides `table`) for `profile` and `address_type`, by default the configured ones."""
+    parameters = dict(STORAGE_PROFILES[profile or settings.clickhouse.storage_profile])
+    address_type = address_type or ADDRESS_TYPE
+    parameters["address"] = address_type
+    # A few token contracts at most
+    parameters["token_address"] = address_type if parameters["label"] == "String" else f"LowCardinality({address_type})"
+    return parameters
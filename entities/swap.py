@@ -1,5 +1,8 @@
 from pydantic import BaseModel
-from clickhouse import get_async_ch_client
+from clickhouse import ch_client_manager
+from entities.address_columns import decode_address
+from entities.ingest_repo import IngestRepo
+from entities.storage_profile import ddl_parameters
 
 class Swap(BaseModel):
     tx_id: str
@@ -33,6 +36,8 @@ class Swap(BaseModel):
         """
         columns = ["tx_id", "token_in", "token_out", "block_timestamp", "from_address", "to_address", "amount_in", "amount_out"]
         data_dict = dict(zip(columns, row))
+        data_dict["from_address"] = decode_address(data_dict["from_address"])
+        data_dict["to_address"] = decode_address(data_dict["to_address"])
 
         # Convert Decimal to string
         data_dict["amount_in"] = str(data_dict["amount_in"])
@@ -40,49 +45,57 @@ class Swap(BaseModel):
 
         return cls(**data_dict)
 
-class SwapRepo:
-    @staticmethod
-    async def create_table():
-        """Creates the swap table if it doesn't exist."""
-        query = """
-        CREATE TABLE IF NOT EXISTS swap (
-            tx_id String,
-            token_in String,
-            token_out String,
-            block_timestamp UInt64,
-            `from` String,
-            `to` String,
-            amount_in Decimal(76, 0),
-            amount_out Decimal(76, 0)
-        ) ENGINE = MergeTree()
-        ORDER BY (block_timestamp, from)
+class SwapRepo(IngestRepo):
+    MODEL = Swap
+    TABLE = "swap"
+    COLUMNS = [
+        "tx_id", "token_in", "token_out", "block_timestamp", "from", "to", "amount_in", "amount_out"
+    ]
+    UINT64_COLUMNS = ("block_timestamp",)
+    ADDRESS_COLUMNS = ("from", "to")
+    # Rows sharing these columns are the same record; ReplacingMergeTree collapses them on merge
+    DEDUP_KEY = ("from", "block_timestamp", "tx_id", "token_in", "token_out", "to")
+    # Latest schema; existing tables are brought to it by migrations.py
+    DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String{compressed_codec},
+            token_in {label},
+            token_out {label},
+            block_timestamp UInt64{timestamp_codec},
+            `from` {address},
+            `to` {address}{compressed_codec},
+            amount_in Decimal(76, 0){compressed_codec},
+            amount_out Decimal(76, 0){compressed_codec},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`from`, block_timestamp, tx_id, token_in, token_out, `to`)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000
         """
-        client = await get_async_ch_client()
-        await client.command(query)
+
+    @classmethod
+    async def create_table(cls, table: str | None = None):
+        """Creates the swap table (or `table`, with the same schema) if it doesn't exist."""
+        async with ch_client_manager.borrow() as client:
+            await client.command(cls.DDL.format(table=table or cls.TABLE, **ddl_parameters()))
 
     @staticmethod
-    async def insert_transactions(swaps: list[Swap]):
+    def to_row(swap: Swap) -> list:
+        """Converts a record into a row in `COLUMNS` order."""
+        return [
+            str(swap.tx_id),
+            str(swap.token_in),
+            str(swap.token_out),
+            int(swap.block_timestamp),
+            str(swap.from_address),
+            str(swap.to_address),
+            str(swap.amount_in),
+            str(swap.amount_out)
+        ]
+
+    @classmethod
+    async def insert_transactions(cls, swaps: list[Swap]):
         """
         Inserts swap transaction records using ClickHouse's `insert` method.
         """
-        client = await get_async_ch_client()
-
-        data = [
-            [
-                str(swap.tx_id),
-                str(swap.token_in),
-                str(swap.token_out),
-                int(swap.block_timestamp),
-                str(swap.from_address),
-                str(swap.to_address),
-                str(swap.amount_in),
-                str(swap.amount_out)
-            ]
-            for swap in swaps
-        ]
-
-        await client.insert(
-            "swap",
-            data,
-            column_names=["tx_id", "token_in", "token_out", "block_timestamp", "from", "to", "amount_in", "amount_out"]
-        )
\ No newline at end of file
+        await cls.insert_rows([cls.to_row(swap) for swap in swaps])
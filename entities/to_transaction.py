@@ -1,6 +1,9 @@
 from pydantic import BaseModel
 from typing import Optional
-from clickhouse import get_async_ch_client
+from clickhouse import ch_client_manager
+from entities.address_columns import address_param, address_set_param, bind_address, bind_addresses, decode_address
+from entities.ingest_repo import IngestRepo
+from entities.storage_profile import ddl_parameters
 from entities.types import NormalTransactionType
 
 class ToTransaction(BaseModel):
@@ -37,6 +40,8 @@ class ToTransaction(BaseModel):
                    "block_number", "block_timestamp", "from_address", "to_address", "type"]
 
         data_dict = dict(zip(columns, row))
+        data_dict["from_address"] = decode_address(data_dict["from_address"])
+        data_dict["to_address"] = decode_address(data_dict["to_address"])
 
         # Convert transaction type from string to Enum if necessary
         if isinstance(data_dict["type"], str):
@@ -44,70 +49,79 @@ class ToTransaction(BaseModel):
 
         return cls(**data_dict)
 
-class ToTransactionRepo:
-    @staticmethod
-    async def create_table():
-        """Creates the to_transaction table if it doesn't exist."""
-        query = """
-        CREATE TABLE IF NOT EXISTS to_transaction (
-            status String,
-            tx_id String,
-            internal_tx_id String DEFAULT '',  -- Added new field
-            value UInt64,
-            total_fee UInt64,
-            block_number UInt64,
-            block_timestamp UInt64,
-            `from` String,
-            `to` String,
-            type String
-        ) ENGINE = MergeTree()
-        ORDER BY (block_timestamp, tx_id);
+class ToTransactionRepo(IngestRepo):
+    MODEL = ToTransaction
+    TABLE = "to_transaction"
+    COLUMNS = [
+        "status", "tx_id", "internal_tx_id", "total_fee", "value",
+        "block_number", "block_timestamp", "from", "to", "type"
+    ]
+    UINT64_COLUMNS = ("total_fee", "value", "block_number", "block_timestamp")
+    ADDRESS_COLUMNS = ("from", "to")
+    # Rows sharing these columns are the same record; ReplacingMergeTree collapses them on merge.
+    # The account comes first for the per-account reads, and block_timestamp follows from tx_id.
+    # Internal transactions of one tx_id stay separate rows, which reports count individually.
+    DEDUP_KEY = ("to", "block_timestamp", "tx_id", "internal_tx_id")
+    # Latest schema; existing tables are brought to it by migrations.py
+    DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            status {label},
+            tx_id String{compressed_codec},
+            internal_tx_id String DEFAULT ''{compressed_codec},
+            value UInt64{compressed_codec},
+            total_fee UInt64{compressed_codec},
+            block_number UInt64{sequence_codec},
+            block_timestamp UInt64{timestamp_codec},
+            `from` {address}{compressed_codec},
+            `to` {address},
+            type {label},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4,
+            PROJECTION by_from (SELECT * ORDER BY `from`, block_timestamp)
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`to`, block_timestamp, tx_id, internal_tx_id)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000, deduplicate_merge_projection_mode = 'rebuild'
         """
-        client = await get_async_ch_client()
-        await client.command(query)
 
-    @staticmethod
-    async def insert_transactions(transactions: list[ToTransaction]):
-        """Inserts transaction records using ClickHouse's `insert` method."""
-        client = await get_async_ch_client()
+    @classmethod
+    async def create_table(cls, table: str | None = None):
+        """Creates the to_transaction table (or `table`, with the same schema) if it doesn't exist."""
+        async with ch_client_manager.borrow() as client:
+            await client.command(cls.DDL.format(table=table or cls.TABLE, **ddl_parameters()))
 
-        data = [
-            [
-                str(tx.status),
-                str(tx.tx_id),
-                str(tx.internal_tx_id or ""),  # Handle None case
-                int(tx.total_fee),
-                int(tx.value),
-                int(tx.block_number),
-                int(tx.block_timestamp),
-                str(tx.from_address),
-                str(tx.to_address),
-                str(tx.type.value)
-            ]
-            for tx in transactions
+    @staticmethod
+    def to_row(tx: ToTransaction) -> list:
+        """Converts a record into a row in `COLUMNS` order."""
+        return [
+            str(tx.status),
+            str(tx.tx_id),
+            str(tx.internal_tx_id or ""),  # Handle None case
+            int(tx.total_fee),
+            int(tx.value),
+            int(tx.block_number),
+            int(tx.block_timestamp),
+            str(tx.from_address),
+            str(tx.to_address),
+            str(tx.type.value)
         ]
 
-        await client.insert(
-            "to_transaction",
-            data,
-            column_names=[
-                "status", "tx_id", "internal_tx_id", "total_fee", "value", 
-                "block_number", "block_timestamp", "from", "to", "type"
-            ]
-        )
+    @classmethod
+    async def insert_transactions(cls, transactions: list[ToTransaction]):
+        """Inserts transaction records using ClickHouse's `insert` method."""
+        await cls.insert_rows([cls.to_row(tx) for tx in transactions])
 
     @staticmethod
     async def get_latest_transaction_by_from(from_address: str) -> ToTransaction | None:
         """Retrieves the latest normal transaction for a given 'from' address."""
-        query = """
+        query = f"""
         SELECT status, tx_id, internal_tx_id, total_fee, value, block_number, block_timestamp, `from`, `to`, type
         FROM to_transaction
-        WHERE from = %(from_address)s
+        WHERE `from` = {address_param('from_address')}
         ORDER BY block_timestamp DESC
         LIMIT 1
         """
-        client = await get_async_ch_client()
-        results = await client.query(query, parameters={"from_address": from_address})
+        async with ch_client_manager.borrow() as client:
+            results = await client.query(query, parameters={"from_address": bind_address(from_address)})
 
         rows = results.result_rows
         if rows and len(rows) > 0:
@@ -117,17 +131,30 @@ class ToTransactionRepo:
     @staticmethod
     async def get_latest_transaction_by_to(to_address: str) -> ToTransaction | None:
         """Retrieves the latest normal transaction for a given 'to' address."""
-        query = """
+        query = f"""
         SELECT status, tx_id, internal_tx_id, total_fee, value, block_number, block_timestamp, `from`, `to`, type
         FROM to_transaction
-        WHERE to = %(to_address)s
+        WHERE `to` = {address_param('to_address')}
         ORDER BY block_timestamp DESC
         LIMIT 1
         """
-        client = await get_async_ch_client()
-        results = await client.query(query, parameters={"to_address": to_address})
+        async with ch_client_manager.borrow() as client:
+            results = await client.query(query, parameters={"to_address": bind_address(to_address)})
 
         rows = results.result_rows
         if rows and len(rows) > 0:
             return ToTransaction.from_clickhouse_tuple(rows[0])
         return None
+
+    @staticmethod
+    async def get_latest_timestamps_by_to(addresses: list[str]) -> dict[str, int]:
+        """Retrieves the latest block_timestamp for each 'to' address in a single query."""
+        query = f"""
+        SELECT `to`, max(block_timestamp)
+        FROM to_transaction
+        WHERE `to` IN {address_set_param('addresses')}
+        GROUP BY `to`
+        """
+        async with ch_client_manager.borrow() as client:
+            results = await client.query(query, parameters={"addresses": bind_addresses(addresses)})
+        return {decode_address(row[0]): int(row[1]) for row in results.result_rows}
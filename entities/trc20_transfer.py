@@ -1,5 +1,8 @@
 from pydantic import BaseModel
-from clickhouse import get_async_ch_client
+from clickhouse import ch_client_manager
+from entities.address_columns import address_param, address_set_param, bind_address, bind_addresses, decode_address
+from entities.ingest_repo import IngestRepo
+from entities.storage_profile import ddl_parameters
 
 
 class Trc20Transfer(BaseModel):
@@ -40,80 +43,96 @@ class Trc20Transfer(BaseModel):
             "value",
         ]
         data_dict = dict(zip(columns, row))
+        for name in ("token_address", "key_address", "from_address", "to_address"):
+            data_dict[name] = decode_address(data_dict[name])
         # Convert Decimal to string
         data_dict["value"] = str(data_dict["value"])
         return cls(**data_dict)
 
 
-class Trc20TransferRepo:
-    @staticmethod
-    async def create_table():
-        """Creates the trc20_transfer table if it doesn't exist."""
-        query = """
-        CREATE TABLE IF NOT EXISTS trc20_transfer (
-            tx_id String,
-            token_address String,
-            block_timestamp UInt64,
-            `key` String,
-            `from` String,
-            `to` String,
-            value Decimal(76, 0)
-        ) ENGINE = MergeTree()
-        ORDER BY (block_timestamp, from);
+class Trc20TransferRepo(IngestRepo):
+    MODEL = Trc20Transfer
+    TABLE = "trc20_transfer"
+    COLUMNS = [
+        "tx_id", "token_address", "block_timestamp", "key", "from", "to", "value"
+    ]
+    UINT64_COLUMNS = ("block_timestamp",)
+    ADDRESS_COLUMNS = ("token_address", "key", "from", "to")
+    # Rows sharing these columns are the same record; ReplacingMergeTree collapses them on merge
+    DEDUP_KEY = ("key", "block_timestamp", "tx_id", "token_address", "from", "to")
+    # Latest schema; existing tables are brought to it by migrations.py
+    DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String{compressed_codec},
+            token_address {token_address},
+            block_timestamp UInt64{timestamp_codec},
+            `key` {address},
+            `from` {address}{compressed_codec},
+            `to` {address}{compressed_codec},
+            value Decimal(76, 0){compressed_codec},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4,
+            PROJECTION by_token (SELECT * ORDER BY token_address, `to`, block_timestamp)
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`key`, block_timestamp, tx_id, token_address, `from`, `to`)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000, deduplicate_merge_projection_mode = 'rebuild'
         """
-        client = await get_async_ch_client()
-        await client.command(query)
+
+    @classmethod
+    async def create_table(cls, table: str | None = None):
+        """Creates the trc20_transfer table (or `table`, with the same schema) if it doesn't exist."""
+        async with ch_client_manager.borrow() as client:
+            await client.command(cls.DDL.format(table=table or cls.TABLE, **ddl_parameters()))
 
     @staticmethod
-    async def insert_transactions(transfers: list[Trc20Transfer]):
+    def to_row(tx: Trc20Transfer) -> list:
+        """Converts a record into a row in `COLUMNS` order."""
+        return [
+            str(tx.tx_id),
+            str(tx.token_address),
+            int(tx.block_timestamp),
+            str(tx.key_address),
+            str(tx.from_address),
+            str(tx.to_address),
+            str(tx.value),
+        ]
+
+    @classmethod
+    async def insert_transactions(cls, transfers: list[Trc20Transfer]):
         """
         Inserts TRC-20 transfer records using ClickHouse's `insert` method.
         """
-        client = await get_async_ch_client()
-
-        data = [
-            [
-                str(tx.tx_id),
-                str(tx.token_address),
-                int(tx.block_timestamp),
-                str(tx.key_address),
-                str(tx.from_address),
-                str(tx.to_address),
-                str(tx.value),
-            ]
-            for tx in transfers
-        ]
-
-        await client.insert(
-            "trc20_transfer",
-            data,
-            column_names=[
-                "tx_id",
-                "token_address",
-                "block_timestamp",
-                "key",
-                "from",
-                "to",
-                "value",
-            ],
-        )
+        await cls.insert_rows([cls.to_row(tx) for tx in transfers])
 
     @staticmethod
     async def get_latest_transfer_by_account(account: str) -> Trc20Transfer | None:
         """
         Retrieves the latest TRC-20 transfer where either 'from' or 'to' matches the account.
         """
-        query = """
+        query = f"""
         SELECT tx_id, token_address, block_timestamp, `key`, `from`, `to`, value
         FROM trc20_transfer
-        WHERE `key` = %(account)s
+        WHERE `key` = {address_param('account')}
         ORDER BY block_timestamp DESC
         LIMIT 1
         """
-        client = await get_async_ch_client()
-        results = await client.query(query, parameters={"account": account})
+        async with ch_client_manager.borrow() as client:
+            results = await client.query(query, parameters={"account": bind_address(account)})
 
         rows = results.result_rows
         if rows and len(rows) > 0:
             return Trc20Transfer.from_clickhouse_tuple(rows[0])
         return None
+
+    @staticmethod
+    async def get_latest_timestamps_by_account(accounts: list[str]) -> dict[str, int]:
+        """Retrieves the latest block_timestamp for each account ('key') in a single query."""
+        query = f"""
+        SELECT `key`, max(block_timestamp)
+        FROM trc20_transfer
+        WHERE `key` IN {address_set_param('accounts')}
+        GROUP BY `key`
+        """
+        async with ch_client_manager.borrow() as client:
+            results = await client.query(query, parameters={"accounts": bind_addresses(accounts)})
+        return {decode_address(row[0]): int(row[1]) for row in results.result_rows}
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from clickhouse import get_async_ch_client
+from clickhouse import ch_client_manager
 from entities.types import ClusterType
 
 
@@ -68,42 +68,40 @@ class WalletRepo:
         ) ENGINE = MergeTree()
         ORDER BY (cluster, address);
         """
-        client = await get_async_ch_client()
-        await client.command(query)
+        async with ch_client_manager.borrow() as client:
+            await client.command(query)
 
     @staticmethod
     async def insert_wallets(wallets: list[Wallet]):
         """
         Inserts wallet records using ClickHouse's `insert` method.
         """
-        client = await get_async_ch_client()
-
         data = [[str(w.address), str(w.cluster)] for w in wallets]
 
-        await client.insert(
-            "wallet",
-            data,
-            column_names=[
-                "address",
-                "cluster",
-            ],
-        )
+        async with ch_client_manager.borrow() as client:
+            await client.insert(
+                "wallet",
+                data,
+                column_names=[
+                    "address",
+                    "cluster",
+                ],
+            )
 
     @staticmethod
     async def get_cluster_accounts(cluster: str):
         """
         Get all wallet addresses of a cluster
         """
-        client = await get_async_ch_client()
-
-        return await client.query(
-            """
-            SELECT address
-            FROM wallet
-            WHERE cluster = %(cluster)s
-            """,
-            {"cluster": cluster},
-        )
+        async with ch_client_manager.borrow() as client:
+            return await client.query(
+                """
+                SELECT address
+                FROM wallet
+                WHERE cluster = %(cluster)s
+                """,
+                {"cluster": cluster},
+            )
 
     @staticmethod
     async def create_cluster_table():
@@ -115,37 +113,35 @@ class WalletRepo:
         ) ENGINE = MergeTree()
         ORDER BY (cluster);
         """
-        client = await get_async_ch_client()
-        await client.command(query)
+        async with ch_client_manager.borrow() as client:
+            await client.command(query)
 
     @staticmethod
     async def insert_clusters(clusters: list[Cluster]):
         """
         Inserts clusters using ClickHouse's `insert` method.
         """
-        client = await get_async_ch_client()
-
         data = [[str(c.type), str(c.cluster)] for c in clusters]
 
-        await client.insert(
-            "cluster",
-            data,
-            column_names=[
-                "type",
+        async with ch_client_manager.borrow() as client:
+            await client.insert(
                 "cluster",
-            ],
-        )
+                data,
+                column_names=[
+                    "type",
+                    "cluster",
+                ],
+            )
 
     @staticmethod
     async def get_all_cluster_names():
         """
         Get all cluster names
         """
-        client = await get_async_ch_client()
-
-        return await client.query(
-            """
-            SELECT cluster
-            FROM cluster
-            """
-        )
+        async with ch_client_manager.borrow() as client:
+            return await client.query(
+                """
+                SELECT cluster
+                FROM cluster
+                """
+            )
@@ -0,0 +1,93 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple
+import numpy as np
+
+
+class HourlySeries(NamedTuple):
+    hours: np.ndarray  # datetime64[s], ascending
+    values: np.ndarray
+    accumulated: np.ndarray
+
+    @classmethod
+    def build(cls, hours: np.ndarray, values: np.ndarray) -> "HourlySeries":
+        return cls(hours, values, np.cumsum(values))
+
+    def merge(self, hours: np.ndarray, values: np.ndarray, since: np.datetime64) -> "HourlySeries":
+        """Keeps the hours before `since` and appends the newly fetched ones, which start at `since`."""
+        keep = self.hours < since
+        return HourlySeries.build(np.concatenate([self.hours[keep], hours]), np.concatenate([self.values[keep], values]))
+
+    def total_before(self, since: np.datetime64) -> float:
+        """Sum of the values of the hours before `since`."""
+        count = np.searchsorted(self.hours, since)
+        return float(self.accumulated[count - 1]) if count else 0.0
+
+
+def align_series(first: HourlySeries, second: HourlySeries):
+    """Hours present in both series, with each series' accumulated values at those hours."""
+    hours, first_index, second_index = np.intersect1d(
+        first.hours, second.hours, assume_unique=True, return_indices=True
+    )
+    return hours, first.accumulated[first_index], second.accumulated[second_index]
+
+
+class HourlySeriesCache:
+    """
+    Hourly volume and gas per token, shared by every callback. Entries live for `ttl` seconds,
+    so callbacks fired by the same interval tick share one fetch, and at most `max_tokens` are
+    kept. A refresh keeps the hours that are already final and only re-queries from the hour
+    that was still open at the previous fetch (minus `settle` seconds for crawler lag).
+
+    `fetch_series(token, min_hour)` returns the (hours, values) arrays of volume and of gas from
+    `min_hour` (unix seconds) onwards, `fetch_totals(token, before_hour)` their sums before it.
+
+    Rows can still land in kept hours, e.g. from a crawler that fell behind or an hourly_activity
+    refresh or rebuild, so each refresh also compares the totals of the kept hours with the
+    database and refetches everything when they differ, or after `full_refetch_every` refreshes.
+    """
+
+    def __init__(
+        self,
+        fetch_series: Callable[[str, int], tuple],
+        fetch_totals: Callable[[str, int], tuple[float, float]],
+        ttl: float,
+        max_tokens: int,
+        settle: float,
+        full_refetch_every: int,
+    ):
+        self.fetch_series = fetch_series
+        self.fetch_totals = fetch_totals
+        self.ttl = ttl
+        self.max_tokens = max_tokens
+        self.settle = settle
+        self.full_refetch_every = full_refetch_every
+        self.entries: OrderedDict = OrderedDict()
+        # Dash may run callbacks concurrently in threads
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> tuple[HourlySeries, HourlySeries]:
+        with self._lock:
+            entry = self.entries.get(token)
+            now = time.time()
+            if entry is None or now - entry["fetched_at"] >= self.ttl:
+                entry = self._refresh(token, entry, now)
+            self.entries[token] = entry
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.max_tokens:
+                self.entries.popitem(last=False)
+            return entry["volume"], entry["gas"]
+
+    def _refresh(self, token: str, entry: dict | None, now: float) -> dict:
+        if entry is not None and entry["refreshes"] < self.full_refetch_every:
+            min_hour = int(entry["fetched_at"] - self.settle) // 3600 * 3600
+            since = np.datetime64(min_hour, "s")
+            cached = (entry["volume"].total_before(since), entry["gas"].total_before(since))
+            if np.allclose(self.fetch_totals(token, min_hour), cached, rtol=1e-9, atol=1e-6):
+                new_volume, new_gas = self.fetch_series(token, min_hour)
+                volume, gas = entry["volume"].merge(*new_volume, since), entry["gas"].merge(*new_gas, since)
+                return {"fetched_at": now, "refreshes": entry["refreshes"] + 1, "volume": volume, "gas": gas}
+
+        new_volume, new_gas = self.fetch_series(token, 0)
+        return {"fetched_at": now, "refreshes": 0, "volume": HourlySeries.build(*new_volume), "gas": HourlySeries.build(*new_gas)}
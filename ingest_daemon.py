@@ -0,0 +1,102 @@
+import asyncio
+import signal
+import time
+from adapter.tron_grid_client import tron_grid_client
+from clickhouse import ch_client_manager
+from settings import settings
+from tasks.insert_buffer import flush_all, flush_due
+from tasks.account_cycle import AccountCrawlCycle
+from tasks.crawl_from_transactions import FromTransactionCrawler
+from tasks.crawl_to_transactions import ToTransactionCrawler
+from tasks.crawl_trc20_transactions import Trc20TransactionCrawler
+from tracked_accounts import tracked_accounts
+
+
+class IngestDaemon:
+    """
+    Long-running alternative to the Celery beat jobs. One event loop, one pooled TronGrid client
+    and one ClickHouse client pool live for the whole process, and crawl cycles run back to back,
+    at most once per `interval_seconds`.
+    """
+
+    def __init__(self, accounts: list[str], interval_seconds: float, mode: str):
+        self.accounts = accounts
+        self.interval_seconds = interval_seconds
+        # Buffered: rows from consecutive cycles are inserted together, on size or age
+        self.crawlers = [
+            FromTransactionCrawler(use_insert_buffer=True),
+            ToTransactionCrawler(use_insert_buffer=True),
+            Trc20TransactionCrawler(use_insert_buffer=True),
+        ]
+        self.cycle = AccountCrawlCycle(self.crawlers) if mode == "combined" else None
+        self.stopping = asyncio.Event()
+
+    def stop(self):
+        print("Shutdown requested, finishing the current cycle")
+        self.stopping.set()
+
+    async def run_cycle(self):
+        if self.cycle is not None:
+            await self.cycle.run(self.accounts)
+            return
+        watermarks = await asyncio.gather(*[crawler.load_watermarks(self.accounts) for crawler in self.crawlers])
+        await asyncio.gather(*[
+            crawler.crawl_transactions(account, crawler_watermarks.get(account))
+            for crawler, crawler_watermarks in zip(self.crawlers, watermarks)
+            for account in self.accounts
+        ])
+
+    async def flush_buffers(self):
+        """Flushes insert buffers that reached their age limit, until shutdown."""
+        while not self.stopping.is_set():
+            try:
+                await flush_due()
+            except Exception as e:
+                print(f"Error flushing insert buffers: {e}")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        if not await ch_client_manager.health_check():
+            print("ClickHouse is not reachable, crawl cycles will fail until it is")
+        flusher = asyncio.create_task(self.flush_buffers())
+        try:
+            while not self.stopping.is_set():
+                started_at = time.monotonic()
+                try:
+                    await self.run_cycle()
+                except Exception as e:
+                    print(f"Error running crawl cycle: {e}")
+
+                # Sleep out the rest of the interval, waking early on shutdown
+                remaining = self.interval_seconds - (time.monotonic() - started_at)
+                if remaining > 0:
+                    try:
+                        await asyncio.wait_for(self.stopping.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+        finally:
+            self.stopping.set()
+            await flusher
+            await flush_all()
+            await tron_grid_client.aclose()
+            await ch_client_manager.close()
+            print("Ingest daemon stopped")
+
+
+async def main():
+    daemon = IngestDaemon(
+        accounts=tracked_accounts,
+        interval_seconds=settings.crawler.interval_seconds,
+        mode=settings.crawler.mode,
+    )
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, daemon.stop)
+    await daemon.run()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
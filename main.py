@@ -1,6 +1,4 @@
-from entities.from_transaction import FromTransactionRepo
-from entities.to_transaction import ToTransactionRepo
-from entities.trc20_transfer import Trc20TransferRepo
+from migrations import apply_migrations
 from celery_jobs.crawl_trc20_transactions import crawl_all_trc20_accounts
 from redis_client import redis_client
 import asyncio
@@ -10,15 +8,13 @@ from adapter.tron_grid_client import tron_grid_client
 
 async def main():
     # redis_client.flushdb()
-    await Trc20TransferRepo.create_table()
-    await FromTransactionRepo.create_table()
-    await ToTransactionRepo.create_table()
+    await apply_migrations()
     return
     accounts = ["TJ2WnwEM2M4ErJQHeMPFMhQLivv1haXhfs"]
     crawler = FromTransactionCrawler()
     # lastest_tx = await NormalTransactionRepo.get_latest_transaction_by_from(accounts[0])
     # print(lastest_tx)
-    res = await tron_grid_client.get_from_txs(account=accounts[0], min_ts=0)
+    res = [tx async for page in tron_grid_client.get_from_txs(account=accounts[0], min_ts=0) for tx in page]
     parsed_txs = [crawler.parse_raw_tx(accounts[0], tx) for tx in res]
     print(len(parsed_txs))
     # await crawl_all_from_accounts(accounts)
@@ -28,7 +24,7 @@ async def main():
     # res = await tron_grid_client.get_tx_info(tx_id)
     # print(res)
     # account = 'TU8K561619KfvQQHAusVE1WuzjCMYi1rdR'
-    # res = await tron_grid_client.get_trc20_txs(account, 0)
+    # res = [tx async for page in tron_grid_client.get_trc20_txs(account, 0) for tx in page]
     # print(res[len(res) - 1])
     return
     raw_tx = {
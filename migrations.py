@@ -0,0 +1,325 @@
+import asyncio
+import sys
+from typing import Awaitable, Callable
+from clickhouse import ch_client_manager
+from entities.address_columns import ADDRESS_TYPE, TO_BASE58_SQL, TO_BINARY_SQL
+from entities.from_transaction import FromTransactionRepo
+from entities.hourly_activity import HourlyActivityRepo
+from entities.report_bucket import ReportBucketRepo, ReportInvalidationRepo
+from entities.swap import SwapRepo
+from entities.to_transaction import ToTransactionRepo
+from entities.storage_profile import ddl_parameters
+from entities.trc20_transfer import Trc20TransferRepo
+from schema_history import V1_DDL, V2_DDL, V7_SWAP_DDL
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+# Tables that migrations can create or rebuild, by name
+REPOS = {repo.TABLE: repo for repo in (FromTransactionRepo, ToTransactionRepo, Trc20TransferRepo, SwapRepo)}
+
+
+class Migration:
+    """
+    One versioned schema step. Steps must be safe to re-run: a failed step is retried on the next apply.
+    Steps build the DDL snapshotted for their version in schema_history.py, not the repos' latest `DDL`.
+    """
+
+    def __init__(self, version: int, name: str, apply: Callable[[], Awaitable[None]]):
+        self.version = version
+        self.name = name
+        self.apply = apply
+
+
+async def _command(query: str, parameters: dict | None = None, settings: dict | None = None):
+    async with ch_client_manager.borrow() as client:
+        return await client.command(query, parameters=parameters, settings=settings)
+
+
+async def _query_rows(query: str, parameters: dict | None = None) -> list:
+    async with ch_client_manager.borrow() as client:
+        result = await client.query(query, parameters=parameters or {})
+    return result.result_rows
+
+
+async def _table_exists(table: str) -> bool:
+    return int(await _command(f"EXISTS TABLE `{table}`")) == 1
+
+
+async def _show_create(table: str) -> str:
+    rows = await _query_rows(f"SHOW CREATE TABLE `{table}`")
+    return rows[0][0]
+
+
+async def _column_types(table: str) -> dict[str, str]:
+    rows = await _query_rows(
+        "SELECT name, type FROM system.columns WHERE database = currentDatabase() AND table = %(table)s ORDER BY position",
+        parameters={"table": table},
+    )
+    return {name: column_type for name, column_type in rows}
+
+
+async def _active_parts(table: str) -> set[str]:
+    rows = await _query_rows(
+        "SELECT name FROM system.parts WHERE active AND database = currentDatabase() AND table = %(table)s",
+        parameters={"table": table},
+    )
+    return {row[0] for row in rows}
+
+
+def _storage_type(column_type: str) -> str:
+    """The stored type without its LowCardinality wrapper, which converts implicitly."""
+    if column_type.startswith("LowCardinality(") and column_type.endswith(")"):
+        return column_type[len("LowCardinality("):-1]
+    return column_type
+
+
+def _conversion(column: str, source_type: str, target_type: str) -> str | None:
+    """SQL converting an address column between its base58 and binary forms, if the two types differ."""
+    source_type, target_type = _storage_type(source_type), _storage_type(target_type)
+    if source_type == "String" and target_type == "FixedString(21)":
+        return TO_BINARY_SQL.format(column=f"`{column}`")
+    if source_type == "FixedString(21)" and target_type == "String":
+        return TO_BASE58_SQL.format(column=f"`{column}`")
+    return None
+
+
+async def _copy_rows(target: str, source: str, expressions: dict[str, str] | None, parts: set[str]):
+    """
+    INSERT SELECT of the rows in `parts` of `source`, over the columns both tables share plus those
+    filled by `expressions`. Address columns stored in different forms (see CLICKHOUSE_BINARY_ADDRESSES)
+    are converted on the way.
+    """
+    if not parts:
+        return
+    expressions = dict(expressions or {})
+    source_types = await _column_types(source)
+    target_types = await _column_types(target)
+    for name, target_type in target_types.items():
+        if name in source_types and name not in expressions:
+            conversion = _conversion(name, source_types[name], target_type)
+            if conversion:
+                expressions[name] = conversion
+    columns = [name for name in target_types if name in source_types or name in expressions]
+    column_list = ", ".join(f"`{name}`" for name in columns)
+    select_list = ", ".join(expressions.get(name, f"`{name}`") for name in columns)
+    await _command(
+        f"INSERT INTO `{target}` ({column_list}) SELECT {select_list} FROM `{source}` WHERE _part IN %(parts)s",
+        parameters={"parts": sorted(parts)},
+        settings={"max_partitions_per_insert_block": 0, "insert_deduplicate": 0},
+    )
+
+
+def _pinned_ddl(ddl: str, profile: str | None = None, address_type: str | None = None) -> str:
+    """`ddl` with everything but `{table}` filled in, for `profile` and `address_type` (by default the configured ones)."""
+    return ddl.format(table="{table}", **ddl_parameters(profile, address_type))
+
+
+async def _target_schema(table: str, ddl: str) -> str:
+    """SHOW CREATE output of `ddl` for `table`, by creating and dropping a scratch copy."""
+    probe_table = f"{table}__probe"
+    await _command(f"DROP TABLE IF EXISTS `{probe_table}`")
+    await _command(ddl.format(table=probe_table))
+    try:
+        return (await _show_create(probe_table)).replace(probe_table, table)
+    finally:
+        await _command(f"DROP TABLE `{probe_table}`")
+
+
+async def _attach_views(table: str):
+    """(Re)creates the hourly_activity views reading `table`, replacing any left on a renamed predecessor."""
+    if not await _table_exists(HourlyActivityRepo.TABLE):
+        return
+    await HourlyActivityRepo.drop_views(table)
+    await HourlyActivityRepo.create_views(table)
+
+
+async def rebuild_table(table: str, ddl: str, expressions: dict[str, str] | None = None) -> bool:
+    """
+    Brings an existing table to `ddl` (a CREATE TABLE with a `{table}` placeholder) by copy-and-swap.
+    Rows are only ever copied into `{table}__new`, never into the live table, so the hourly_activity
+    views count each row once:
+    1. with merges stopped, so parts are only ever added, copy the table's parts, then the parts
+       inserted meanwhile, into `{table}__new`;
+    2. pause writes by renaming the table to `{table}__old` (crawler inserts fail and the insert
+       buffers retry them), drop its views and copy the parts inserted since the last pass;
+    3. rename `{table}__new` to `{table}`, move the views over and drop `{table}__old`.
+    An interrupted rebuild starts over from an empty `{table}__new`, or only finishes step 3 if the
+    swap already happened. `expressions` maps a column to the SQL that fills it from the old table,
+    for type changes. Returns False when the table already has the schema of `ddl`.
+    """
+    new_table, old_table = f"{table}__new", f"{table}__old"
+    if await _table_exists(old_table):
+        if await _table_exists(table):
+            print(f"Finishing interrupted rebuild of {table}")
+            await _attach_views(table)
+            await _command(f"DROP TABLE `{old_table}`")
+        else:
+            print(f"Restarting interrupted rebuild of {table}")
+            await _command(f"RENAME TABLE `{old_table}` TO `{table}`")
+            await _attach_views(table)
+    # Whatever an interrupted run copied is discarded, so a retry never copies a row twice
+    await _command(f"DROP TABLE IF EXISTS `{new_table}`")
+    if not await _table_exists(table):
+        await _command(ddl.format(table=table))
+        return True
+    # An interrupted run may have left merges stopped, which lasts until the server restarts
+    await _command(f"SYSTEM START MERGES `{table}`")
+    if await _show_create(table) == await _target_schema(table, ddl):
+        return False
+
+    await _command(ddl.format(table=new_table))
+    copied: set[str] = set()
+    await _command(f"SYSTEM STOP MERGES `{table}`")
+    try:
+        # The bulk copy, then the parts inserted while it ran, so that the pause below stays short
+        for _ in range(2):
+            parts = await _active_parts(table) - copied
+            print(f"Copying {len(parts)} parts of {table} into {new_table}")
+            await _copy_rows(new_table, table, expressions, parts)
+            copied |= parts
+        await _command(f"RENAME TABLE `{table}` TO `{old_table}`")
+    except Exception:
+        await _command(f"SYSTEM START MERGES `{table}`")
+        raise
+
+    # Writes to the table fail until the rename below
+    await HourlyActivityRepo.drop_views(table)
+    parts = await _active_parts(old_table) - copied
+    print(f"Copying the last {len(parts)} parts of {table} with writes paused")
+    await _copy_rows(new_table, old_table, expressions, parts)
+    await _command(f"RENAME TABLE `{new_table}` TO `{table}`")
+    # Inserts from this process prepare their column types again; other processes do after one failed insert
+    ch_client_manager.clear_insert_contexts(table)
+    # Rows inserted before the views are back reach hourly_activity with its next refresh
+    await _attach_views(table)
+    await _command(f"DROP TABLE `{old_table}`")
+    print(f"Rebuilt {table}")
+    return True
+
+
+async def _create_tables():
+    for table, ddl in V1_DDL.items():
+        await _command(ddl.format(table=table))
+
+
+async def _rekey_tables():
+    # Address-first sort keys, monthly partitions, tx_id bloom filters and by-counterparty projections
+    for table, ddl in V2_DDL.items():
+        await rebuild_table(table, _pinned_ddl(ddl, "plain", "String"))
+
+
+async def _create_hourly_activity():
+    await HourlyActivityRepo.create_table()
+    # Views first, so rows ingested during the backfill aren't missed
+    await HourlyActivityRepo.create_views()
+    await HourlyActivityRepo.rebuild()
+
+
+async def sync_hourly_activity():
+    """Recreates hourly_activity if its address columns don't match the configured storage, refreshes it otherwise."""
+    account_type = (await _column_types(HourlyActivityRepo.TABLE)).get("account")
+    if account_type == ADDRESS_TYPE:
+        await HourlyActivityRepo.refresh()
+    else:
+        await HourlyActivityRepo.recreate()
+
+
+async def _apply_address_storage():
+    # Converts the address columns to the configured form (a no-op with the default String storage).
+    # Pause the crawlers: the views feed hourly_activity with the old form until it is recreated.
+    for table, ddl in V2_DDL.items():
+        await rebuild_table(table, _pinned_ddl(ddl, "plain"))
+    await sync_hourly_activity()
+
+
+async def _apply_storage_profile():
+    # LowCardinality columns, codecs and index granularity of CLICKHOUSE_STORAGE_PROFILE; with the
+    # default "plain" profile the tables already match and nothing is copied
+    rebuilt = [await rebuild_table(table, _pinned_ddl(ddl)) for table, ddl in V2_DDL.items()]
+    if any(rebuilt):
+        await sync_hourly_activity()
+
+
+async def _rekey_swap():
+    # ReplacingMergeTree keyed on the swap's identity, like the other ingest tables
+    await rebuild_table(SwapRepo.TABLE, _pinned_ddl(V7_SWAP_DDL))
+
+
+MIGRATIONS = [
+    Migration(1, "create_tables", _create_tables),
+    Migration(2, "rekey_tables", _rekey_tables),
+    Migration(3, "create_hourly_activity", _create_hourly_activity),
+    Migration(4, "create_report_bucket", ReportBucketRepo.create_table),
+    Migration(5, "address_storage", _apply_address_storage),
+    Migration(6, "storage_profile", _apply_storage_profile),
+    Migration(7, "rekey_swap", _rekey_swap),
+    Migration(8, "create_report_invalidation", ReportInvalidationRepo.create_table),
+]
+
+
+async def _ensure_migrations_table():
+    await _command(
+        f"""
+        CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} (
+            version UInt32,
+            name String,
+            applied_at DateTime DEFAULT now()
+        ) ENGINE = MergeTree()
+        ORDER BY version
+        """
+    )
+
+
+async def applied_versions() -> set[int]:
+    await _ensure_migrations_table()
+    rows = await _query_rows(f"SELECT version FROM {MIGRATIONS_TABLE}")
+    return {row[0] for row in rows}
+
+
+async def apply_migrations():
+    """Applies pending migrations in version order, recording each one once it succeeds."""
+    applied = await applied_versions()
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        if migration.version in applied:
+            continue
+        print(f"Applying migration {migration.version}: {migration.name}")
+        await migration.apply()
+        async with ch_client_manager.borrow() as client:
+            await client.insert(MIGRATIONS_TABLE, [[migration.version, migration.name]], column_names=["version", "name"])
+
+
+async def print_status():
+    applied = await applied_versions()
+    for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+        state = "applied" if migration.version in applied else "pending"
+        print(f"{migration.version:>4}  {migration.name:<30} {state}")
+
+
+async def main(args: list[str]):
+    try:
+        if args[0] == "apply":
+            await apply_migrations()
+        elif args[0] == "status":
+            await print_status()
+        elif args[0] == "rebuild" and args[1] == HourlyActivityRepo.TABLE:
+            await sync_hourly_activity()
+        elif args[0] == "rebuild":
+            # To the repo's latest `DDL`, e.g. after changing the storage settings
+            rebuilt = await rebuild_table(args[1], _pinned_ddl(REPOS[args[1]].DDL))
+            if not rebuilt:
+                print(f"{args[1]} already has the latest schema")
+    finally:
+        await ch_client_manager.close()
+
+
+if __name__ == "__main__":
+    if (
+        len(sys.argv) < 2
+        or sys.argv[1] not in ("apply", "status", "rebuild")
+        or (sys.argv[1] == "rebuild" and (len(sys.argv) != 3 or sys.argv[2] not in (*REPOS, HourlyActivityRepo.TABLE)))
+    ):
+        print("Usage: python migrations.py apply | status | rebuild <table>")
+        print(f"Tables: {', '.join([*REPOS, HourlyActivityRepo.TABLE])}")
+        sys.exit(1)
+
+    asyncio.run(main(sys.argv[1:]))
@@ -1,4 +1,6 @@
+import asyncio
 import redis
+import redis.asyncio
 from settings import settings
 
 redis_client = redis.Redis(
@@ -6,3 +8,19 @@ redis_client = redis.Redis(
     password=settings.redis.password,
     decode_responses=True
 )
+
+_async_clients = {}
+
+
+def get_async_redis_client() -> redis.asyncio.Redis:
+    """Returns an asyncio Redis client for the running loop; its connections can't be shared across loops."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        _async_clients.clear()  # Clients of finished loops are unusable
+        client = _async_clients[loop] = redis.asyncio.Redis(
+            host=settings.redis.host,
+            password=settings.redis.password,
+            decode_responses=True,
+        )
+    return client
@@ -0,0 +1,242 @@
+import asyncio
+import hashlib
+from decimal import Decimal
+from pydantic import BaseModel, Field
+from clickhouse import ch_client_manager
+from consts import token_configs, ROUTER_ADDRESS, SUNPUMP_ADDRESS
+from entities.address_columns import address_param, address_set_param, bind_address, bind_addresses
+from entities.report_bucket import SETTLE_MS, ReportBucketRepo
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+class SpendingReport(BaseModel):
+    """Maker metrics for one token as of `max_timestamp`. Field titles are the CSV labels."""
+
+    token: str
+    symbol: str
+    max_timestamp: int
+    total_gas_used: int = Field(title="Total Gas Used")
+    total_trx_sent: int = Field(title="Total TRX Sent")
+    total_trx_received: int = Field(title="Total TRX Received")
+    total_token_sold: Decimal = Field(title="Total {symbol} Sold")
+    total_token_bought: Decimal = Field(title="Total {symbol} Bought")
+    total_trx_spent_on_buys: int = Field(title="Total TRX Spent on Buys")
+    total_trx_received_on_sells: int = Field(title="Total TRX Received on Sells")
+    total_trx_spent_on_curve: int = Field(title="Total TRX Spent on Curve")
+    total_trx_received_on_curve: int = Field(title="Total TRX Received on Curve")
+
+    @classmethod
+    def metric_fields(cls) -> list[str]:
+        return [name for name, field in cls.model_fields.items() if field.title]
+
+    def rows(self) -> list[tuple[str, int | Decimal]]:
+        """(label, value) per metric, in report order."""
+        return [
+            (type(self).model_fields[name].title.format(symbol=self.symbol.title()), getattr(self, name))
+            for name in self.metric_fields()
+        ]
+
+
+class TablePass:
+    """
+    Every metric read from one table, compiled into a single scan: the shared filter goes in
+    WHERE, and each metric is a conditional aggregate over the rows it lets through.
+    """
+
+    def __init__(self, table: str, where: str, metrics: dict[str, str]):
+        self.table = table
+        self.where = where
+        self.metrics = metrics
+
+    def compile(self, bucket_ms: int | None = None) -> str:
+        """
+        The scan as one SQL query. With `bucket_ms`, metrics are grouped per bucket (keyed by the
+        bucket's end) over block_timestamp in (min_timestamp, max_timestamp] instead.
+        """
+        aggregates = ",\n            ".join(f"{expression} AS {name}" for name, expression in self.metrics.items())
+        if bucket_ms is None:
+            return f"""
+        SELECT
+            {aggregates}
+        FROM {self.table} FINAL
+        WHERE {self.where}
+        AND block_timestamp <= %(max_timestamp)s
+        """
+        return f"""
+        SELECT
+            intDiv(block_timestamp + {bucket_ms - 1}, {bucket_ms}) * {bucket_ms} AS bucket,
+            {aggregates}
+        FROM {self.table} FINAL
+        WHERE {self.where}
+        AND block_timestamp > %(min_timestamp)s
+        AND block_timestamp <= %(max_timestamp)s
+        GROUP BY bucket
+        ORDER BY bucket
+        """
+
+
+# Three scans for the nine metrics of `SpendingReport`
+TABLE_PASSES = [
+    TablePass(
+        "from_transaction",
+        f"`from` IN {address_set_param('addresses')}",
+        {
+            "total_gas_used": "sum(total_fee)",
+            "total_trx_sent": f"sumIf(value, `to` NOT IN {address_set_param('excluded')} AND status = 'SUCCESS')",
+            "total_trx_spent_on_buys": f"sumIf(value, `to` = {address_param('router_address')} AND status = 'SUCCESS')",
+            "total_trx_spent_on_curve": f"sumIf(value, `to` = {address_param('curve')} AND status = 'SUCCESS')",
+        },
+    ),
+    TablePass(
+        "to_transaction",
+        f"`to` IN {address_set_param('addresses')}",
+        {
+            "total_trx_received": (
+                f"sumIf(value, `from` NOT IN {address_set_param('excluded')} AND status = 'SUCCESS'"
+                " AND `type` != 'UnDelegateResourceContract')"
+            ),
+            "total_trx_received_on_sells": f"sumIf(value, `from` = {address_param('router_address')} AND status = 'SUCCESS')",
+            "total_trx_received_on_curve": f"sumIf(value, `from` = {address_param('curve')} AND status = 'SUCCESS')",
+        },
+    ),
+    TablePass(
+        "trc20_transfer",
+        # A transfer is stored once per tracked side; each metric counts the tracked side's copy
+        f"`key` IN {address_set_param('addresses')} AND token_address = {address_param('token')}",
+        {
+            "total_token_sold": f"sumIf(value, `from` = `key` AND `to` = {address_param('pair_address')})",
+            "total_token_bought": f"sumIf(value, `to` = `key` AND `from` = {address_param('pair_address')})",
+        },
+    ),
+]
+
+
+def report_parameters(token: str, accounts: list[str], max_timestamp: int) -> dict:
+    token_config = token_configs[token]
+    return {
+        "addresses": bind_addresses(accounts),
+        "excluded": bind_addresses([ROUTER_ADDRESS, token_config.address, token_config.pair, SUNPUMP_ADDRESS]),
+        "router_address": bind_address(ROUTER_ADDRESS),
+        "curve": bind_address(SUNPUMP_ADDRESS),
+        "pair_address": bind_address(token_config.pair),
+        "token": bind_address(token_config.address),
+        "max_timestamp": max_timestamp,
+    }
+
+
+async def _run_pass(table_pass: TablePass, parameters: dict) -> dict:
+    async with ch_client_manager.borrow() as client:
+        result = await client.query(table_pass.compile(), parameters=parameters)
+    row = result.result_rows[0] if result.result_rows else [0] * len(table_pass.metrics)
+    return dict(zip(table_pass.metrics, row))
+
+
+async def build_spending_report(token: str, accounts: list[str], max_timestamp: int) -> SpendingReport:
+    """Runs the three table scans concurrently and merges them into one report."""
+    parameters = report_parameters(token, accounts, max_timestamp)
+    results = await asyncio.gather(*[_run_pass(table_pass, parameters) for table_pass in TABLE_PASSES])
+    metrics = {name: value for result in results for name, value in result.items()}
+    return SpendingReport(
+        token=token, symbol=token_configs[token].symbol, max_timestamp=max_timestamp, **metrics
+    )
+
+
+class SpendingSeries(BaseModel):
+    """Every `SpendingReport` metric at each cutoff from `start` to `end`, every `step` ms."""
+
+    token: str
+    symbol: str
+    cutoffs: list[int]
+    metrics: dict[str, list[int | Decimal]]
+
+    def reports(self) -> list[SpendingReport]:
+        return [
+            SpendingReport(
+                token=self.token,
+                symbol=self.symbol,
+                max_timestamp=cutoff,
+                **{name: values[i] for name, values in self.metrics.items()},
+            )
+            for i, cutoff in enumerate(self.cutoffs)
+        ]
+
+
+def accounts_key(accounts: list[str]) -> str:
+    """Stable fingerprint of an account set, so stored buckets are only reused for the same accounts."""
+    return hashlib.sha256("\n".join(sorted(set(accounts))).encode()).hexdigest()[:32]
+
+
+def series_bucket_ms(start: int, end: int, step: int) -> int:
+    """Daily buckets when every cutoff falls on a UTC day boundary, hourly otherwise."""
+    if step <= 0 or step % HOUR_MS or start % HOUR_MS or (end - start) % step:
+        raise ValueError("start must be on an hour boundary, step a multiple of one hour, and end start + n * step")
+    return DAY_MS if step % DAY_MS == 0 and start % DAY_MS == 0 else HOUR_MS
+
+
+def cumulative_series(buckets: dict[int, dict], cutoffs: list[int], metric_names: list[str]) -> dict[str, list]:
+    """Each metric summed over the buckets ending at or before each cutoff, for ascending cutoffs."""
+    series: dict[str, list] = {name: [] for name in metric_names}
+    totals = dict.fromkeys(metric_names, 0)
+    ordered = sorted(buckets.items())
+    i = 0
+    for cutoff in cutoffs:
+        while i < len(ordered) and ordered[i][0] <= cutoff:
+            for name, value in ordered[i][1].items():
+                totals[name] += value
+            i += 1
+        for name in metric_names:
+            series[name].append(totals[name])
+    return series
+
+
+async def _run_bucketed_pass(table_pass: TablePass, parameters: dict, bucket_ms: int) -> dict[int, dict]:
+    async with ch_client_manager.borrow() as client:
+        result = await client.query(table_pass.compile(bucket_ms), parameters=parameters)
+    return {int(row[0]): dict(zip(table_pass.metrics, row[1:])) for row in result.result_rows}
+
+
+async def _server_time() -> float:
+    """ClickHouse's clock in unix seconds, which also stamps the invalidations that bucket scans are compared with."""
+    async with ch_client_manager.borrow() as client:
+        return int(await client.command("SELECT toUnixTimestamp64Milli(now64(3))")) / 1000
+
+
+async def build_spending_series(token: str, accounts: list[str], start: int, end: int, step: int) -> SpendingSeries:
+    """
+    Cumulative metrics at every cutoff in [start, end] from per-bucket partial sums. Settled
+    buckets are persisted in `report_bucket`, so later calls only scan the buckets after the
+    last stored one that no late rows have invalidated since.
+    """
+    bucket_ms = series_bucket_ms(start, end, step)
+    key = accounts_key(accounts)
+    metric_names = SpendingReport.metric_fields()
+    buckets = await ReportBucketRepo.get_buckets(token, key, bucket_ms)
+    computed_upto = max(buckets, default=0)
+
+    if computed_upto < end:
+        scanned_at = await _server_time()
+        parameters = {**report_parameters(token, accounts, end), "min_timestamp": computed_upto}
+        results = await asyncio.gather(
+            *[_run_bucketed_pass(table_pass, parameters, bucket_ms) for table_pass in TABLE_PASSES]
+        )
+        fresh: dict[int, dict] = {}
+        for result in results:
+            for bucket, metrics in result.items():
+                fresh.setdefault(bucket, {}).update(metrics)
+
+        settled_upto = min(end, (int(scanned_at * 1000) - SETTLE_MS) // bucket_ms * bucket_ms)
+        if settled_upto > computed_upto:
+            settled = {bucket: metrics for bucket, metrics in fresh.items() if bucket <= settled_upto}
+            # Always store the last settled bucket, even if empty, so it marks how far the store is complete
+            settled.setdefault(settled_upto, {})
+            settled = {
+                bucket: {name: metrics.get(name, 0) for name in metric_names} for bucket, metrics in settled.items()
+            }
+            await ReportBucketRepo.insert_buckets(token, key, bucket_ms, settled, scanned_at)
+        buckets.update(fresh)
+
+    cutoffs = list(range(start, end + 1, step))
+    series = cumulative_series(buckets, cutoffs, metric_names)
+    return SpendingSeries(token=token, symbol=token_configs[token].symbol, cutoffs=cutoffs, metrics=series)
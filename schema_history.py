@@ -0,0 +1,162 @@
+"""
+DDL of the ingest tables as each migration left them, so a migration keeps building the schema
+of its own version however the repos' `DDL` evolves later. `{table}` and the entities/storage_profile.py
+placeholders are filled in by migrations.py. When a repo's `DDL` changes, snapshot it here and add
+the migration that rebuilds to it.
+"""
+
+# Migration 1, create_tables: the tables as they were before versioned migrations
+V1_DDL = {
+    "from_transaction": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            status String,
+            tx_id String,
+            internal_tx_id String DEFAULT '',
+            value UInt64,
+            total_fee UInt64,
+            block_number UInt64,
+            block_timestamp UInt64,
+            `from` String,
+            `to` String,
+            type String
+        ) ENGINE = ReplacingMergeTree()
+        ORDER BY (`from`, block_timestamp, tx_id, internal_tx_id)
+        SETTINGS non_replicated_deduplication_window = 1000
+        """,
+    "to_transaction": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            status String,
+            tx_id String,
+            internal_tx_id String DEFAULT '',
+            value UInt64,
+            total_fee UInt64,
+            block_number UInt64,
+            block_timestamp UInt64,
+            `from` String,
+            `to` String,
+            type String
+        ) ENGINE = ReplacingMergeTree()
+        ORDER BY (`to`, block_timestamp, tx_id, internal_tx_id)
+        SETTINGS non_replicated_deduplication_window = 1000
+        """,
+    "trc20_transfer": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String,
+            token_address String,
+            block_timestamp UInt64,
+            `key` String,
+            `from` String,
+            `to` String,
+            value Decimal(76, 0)
+        ) ENGINE = ReplacingMergeTree()
+        ORDER BY (`key`, block_timestamp, tx_id, token_address, `from`, `to`)
+        SETTINGS non_replicated_deduplication_window = 1000
+        """,
+    "swap": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String,
+            token_in String,
+            token_out String,
+            block_timestamp UInt64,
+            `from` String,
+            `to` String,
+            amount_in Decimal(76, 0),
+            amount_out Decimal(76, 0)
+        ) ENGINE = MergeTree()
+        ORDER BY (block_timestamp, `from`)
+        """,
+}
+
+# Migrations 2 (rekey_tables), 5 (address_storage) and 6 (storage_profile): address-first sort keys,
+# monthly partitions, tx_id bloom filters and by-counterparty projections. Migration 2 builds it with
+# String addresses and the "plain" profile, 5 with the configured address type, 6 with the configured profile.
+V2_DDL = {
+    "from_transaction": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            status {label},
+            tx_id String{compressed_codec},
+            internal_tx_id String DEFAULT ''{compressed_codec},
+            value UInt64{compressed_codec},
+            total_fee UInt64{compressed_codec},
+            block_number UInt64{sequence_codec},
+            block_timestamp UInt64{timestamp_codec},
+            `from` {address},
+            `to` {address}{compressed_codec},
+            type {label},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4,
+            PROJECTION by_to (SELECT * ORDER BY `to`, block_timestamp)
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`from`, block_timestamp, tx_id, internal_tx_id)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000, deduplicate_merge_projection_mode = 'rebuild'
+        """,
+    "to_transaction": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            status {label},
+            tx_id String{compressed_codec},
+            internal_tx_id String DEFAULT ''{compressed_codec},
+            value UInt64{compressed_codec},
+            total_fee UInt64{compressed_codec},
+            block_number UInt64{sequence_codec},
+            block_timestamp UInt64{timestamp_codec},
+            `from` {address}{compressed_codec},
+            `to` {address},
+            type {label},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4,
+            PROJECTION by_from (SELECT * ORDER BY `from`, block_timestamp)
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`to`, block_timestamp, tx_id, internal_tx_id)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000, deduplicate_merge_projection_mode = 'rebuild'
+        """,
+    "trc20_transfer": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String{compressed_codec},
+            token_address {token_address},
+            block_timestamp UInt64{timestamp_codec},
+            `key` {address},
+            `from` {address}{compressed_codec},
+            `to` {address}{compressed_codec},
+            value Decimal(76, 0){compressed_codec},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4,
+            PROJECTION by_token (SELECT * ORDER BY token_address, `to`, block_timestamp)
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`key`, block_timestamp, tx_id, token_address, `from`, `to`)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000, deduplicate_merge_projection_mode = 'rebuild'
+        """,
+    "swap": """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String{compressed_codec},
+            token_in {label},
+            token_out {label},
+            block_timestamp UInt64{timestamp_codec},
+            `from` {address},
+            `to` {address}{compressed_codec},
+            amount_in Decimal(76, 0){compressed_codec},
+            amount_out Decimal(76, 0){compressed_codec},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4
+        ) ENGINE = MergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`from`, block_timestamp)
+        SETTINGS index_granularity = {index_granularity}
+        """,
+}
+
+# Migration 7, rekey_swap: swap as a ReplacingMergeTree keyed on the swap's identity
+V7_SWAP_DDL = """
+        CREATE TABLE IF NOT EXISTS {table} (
+            tx_id String{compressed_codec},
+            token_in {label},
+            token_out {label},
+            block_timestamp UInt64{timestamp_codec},
+            `from` {address},
+            `to` {address}{compressed_codec},
+            amount_in Decimal(76, 0){compressed_codec},
+            amount_out Decimal(76, 0){compressed_codec},
+            INDEX idx_tx_id tx_id TYPE bloom_filter(0.01) GRANULARITY 4
+        ) ENGINE = ReplacingMergeTree()
+        PARTITION BY toYYYYMM(toDateTime(intDiv(block_timestamp, 1000)))
+        ORDER BY (`from`, block_timestamp, tx_id, token_in, token_out, `to`)
+        SETTINGS index_granularity = {index_granularity}, non_replicated_deduplication_window = 1000
+        """
@@ -1,5 +1,6 @@
 from pathlib import Path
-from pydantic import Field
+from typing import List, Optional
+from pydantic import BaseModel, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -12,6 +13,14 @@ class ClickhouseConfig(BaseSettings):
     username: str = Field(..., validation_alias="CLICKHOUSE_USERNAME")
     password: str = Field(..., validation_alias="CLICKHOUSE_PASSWORD")
     database: str = Field(..., validation_alias="CLICKHOUSE_DB")
+    pool_size: int = Field(default=8, validation_alias="CLICKHOUSE_POOL_SIZE")
+    health_check_interval: float = Field(default=60.0, validation_alias="CLICKHOUSE_HEALTH_CHECK_INTERVAL")
+    # Store addresses as raw 21-byte FixedString(21) instead of base58 String; after changing it on existing
+    # tables, run `python migrations.py rebuild <table>` for each ingest table and hourly_activity
+    binary_addresses: bool = Field(default=False, validation_alias="CLICKHOUSE_BINARY_ADDRESSES")
+    # Column types and codecs of the ingest tables, see entities/storage_profile.py; "plain" or "compact".
+    # Switching an existing deployment to "compact" rebuilds every ingest table (`python migrations.py rebuild <table>`)
+    storage_profile: str = Field(default="plain", validation_alias="CLICKHOUSE_STORAGE_PROFILE")
 
     model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
 
@@ -29,10 +38,75 @@ class KeysConfig(BaseSettings):
 
     model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
 
+class PoolMemberConfig(BaseModel):
+    base_url: str
+    api_key: Optional[str] = None
+    rps: Optional[float] = None  # Defaults to TRONGRID_RPS
+    max_in_flight: Optional[int] = None  # Defaults to TRONGRID_MAX_IN_FLIGHT
+    paths: List[str] = ["/"]  # e.g. ["/wallet", "/walletsolidity"] for a full node without the /v1 API
+
+class TronGridConfig(BaseSettings):
+    rps: float = Field(default=15.0, validation_alias="TRONGRID_RPS")
+    max_in_flight: int = Field(default=20, validation_alias="TRONGRID_MAX_IN_FLIGHT")
+    latency_target: float = Field(default=2.0, validation_alias="TRONGRID_LATENCY_TARGET")
+    max_attempts: int = Field(default=4, ge=1, validation_alias="TRONGRID_MAX_ATTEMPTS")
+    breaker_threshold: int = Field(default=5, validation_alias="TRONGRID_BREAKER_THRESHOLD")
+    breaker_reset_timeout: float = Field(default=30.0, validation_alias="TRONGRID_BREAKER_RESET_TIMEOUT")
+    fast_decode: bool = Field(default=True, validation_alias="TRONGRID_FAST_DECODE")
+    # Share each key's rps budget across processes through Redis
+    shared_rate_limit: bool = Field(default=True, validation_alias="TRONGRID_SHARED_RATE_LIMIT")
+    # Processes using the same keys (e.g. Celery worker concurrency); without Redis, each gets rps / processes
+    processes: int = Field(default=1, validation_alias="TRONGRID_PROCESSES")
+    # JSON list of PoolMemberConfig; defaults to api.trongrid.io with TRONGRID_API_KEY
+    pool: List[PoolMemberConfig] = Field(default_factory=list, validation_alias="TRONGRID_POOL")
+
+    model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
+
+class CacheConfig(BaseSettings):
+    # Set to an empty string to keep the in-memory tier only
+    path: str = Field(default=str(PROJECT_ROOT / "data" / "trongrid_cache.sqlite3"), validation_alias="TRONGRID_CACHE_PATH")
+    max_entries: int = Field(default=10_000, validation_alias="TRONGRID_CACHE_MAX_ENTRIES")
+
+    model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
+
+class CrawlerConfig(BaseSettings):
+    max_pages_per_tick: int = Field(default=25, validation_alias="CRAWLER_MAX_PAGES_PER_TICK")
+    interval_seconds: float = Field(default=40.0, validation_alias="CRAWLER_INTERVAL_SECONDS")
+    # "separate" runs one Celery job per crawler, "combined" runs every crawler per account in one cycle
+    mode: str = Field(default="separate", validation_alias="CRAWLER_MODE")
+    # Row keys remembered per table, so rows fetched again by overlapping crawls are dropped before insert
+    dedup_cache_size: int = Field(default=200_000, validation_alias="CRAWLER_DEDUP_CACHE_SIZE")
+
+    model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
+
+class InsertBufferConfig(BaseSettings):
+    max_rows: int = Field(default=50_000, validation_alias="INSERT_BUFFER_MAX_ROWS")
+    max_bytes: int = Field(default=16 * 1024 * 1024, validation_alias="INSERT_BUFFER_MAX_BYTES")
+    max_age: float = Field(default=30.0, validation_alias="INSERT_BUFFER_MAX_AGE")
+    # Rows of failed batches kept for retry; at this many the buffer refuses new rows until ClickHouse is back
+    max_failed_rows: int = Field(default=200_000, validation_alias="INSERT_BUFFER_MAX_FAILED_ROWS")
+    async_insert: bool = Field(default=False, validation_alias="CLICKHOUSE_ASYNC_INSERT")
+
+    model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
+
+class HourlyActivityConfig(BaseSettings):
+    # Recent months are recomputed from the deduplicated ingest tables every `refresh_interval` seconds,
+    # covering at least the last `refresh_window` seconds; all of them every `full_refresh_interval`
+    refresh_interval: float = Field(default=600.0, validation_alias="HOURLY_ACTIVITY_REFRESH_INTERVAL")
+    refresh_window: float = Field(default=86_400.0, validation_alias="HOURLY_ACTIVITY_REFRESH_WINDOW")
+    full_refresh_interval: float = Field(default=86_400.0, validation_alias="HOURLY_ACTIVITY_FULL_REFRESH_INTERVAL")
+
+    model_config = SettingsConfigDict(env_file=dotenv_path, extra="allow")
+
 class Settings(BaseSettings):
     clickhouse: ClickhouseConfig = ClickhouseConfig()
     redis: RedisConfig = RedisConfig()
     keys: KeysConfig = KeysConfig()
+    trongrid: TronGridConfig = TronGridConfig()
+    cache: CacheConfig = CacheConfig()
+    crawler: CrawlerConfig = CrawlerConfig()
+    insert_buffer: InsertBufferConfig = InsertBufferConfig()
+    hourly_activity: HourlyActivityConfig = HourlyActivityConfig()
 
 
 # Instantiate settings
@@ -0,0 +1,101 @@
+import asyncio
+from typing import NamedTuple
+from entities.column_batch import ColumnBatch
+from entities.report_bucket import record_invalidation
+from tasks.base_crawler import BaseTransactionCrawler, CollectResult
+from tasks.crawl_from_transactions import FromTransactionCrawler
+from tasks.crawl_to_transactions import ToTransactionCrawler
+from tasks.crawl_trc20_transactions import Trc20TransactionCrawler
+
+
+class AccountStatus(NamedTuple):
+    """Outcome of one cycle for one account in one table."""
+
+    rows: int
+    # Latest block_timestamp stored (or handed to the insert buffer) this cycle, None if nothing new
+    watermark: int | None
+    # False if the page budget or a fetch error stopped short of the latest transactions
+    complete: bool
+    error: str | None
+
+
+class AccountCrawlCycle:
+    """
+    Runs every crawler for every account in one event loop: per account the from, to and TRC-20
+    fetches run concurrently, sharing `tron_grid_client`'s rate limits, and each table gets a
+    single batched insert per cycle.
+    """
+
+    def __init__(self, crawlers: list[BaseTransactionCrawler] | None = None):
+        self.crawlers = crawlers or [FromTransactionCrawler(), ToTransactionCrawler(), Trc20TransactionCrawler()]
+
+    async def crawl_account(self, account: str, watermarks: list[dict[str, int]]) -> list[CollectResult]:
+        """Collects new transactions for one account, one result per crawler."""
+        return await asyncio.gather(*[
+            crawler.collect_transactions(account, crawler_watermarks.get(account))
+            for crawler, crawler_watermarks in zip(self.crawlers, watermarks)
+        ])
+
+    async def run(self, accounts: list[str]) -> dict[str, dict[str, AccountStatus]]:
+        """
+        Crawls all accounts and stores the results. Returns the status of every account in every
+        table, by table then account; a table whose insert failed reports the error for all of its
+        accounts, without affecting the other tables.
+        """
+        watermarks = await asyncio.gather(*[crawler.load_watermarks(accounts) for crawler in self.crawlers])
+        per_account = await asyncio.gather(*[self.crawl_account(account, watermarks) for account in accounts])
+
+        crawler_results = [[account_results[i] for account_results in per_account] for i in range(len(self.crawlers))]
+        stores = await asyncio.gather(
+            *[
+                self._store(crawler, accounts, [result.batch for result in results])
+                for crawler, results in zip(self.crawlers, crawler_results)
+            ],
+            return_exceptions=True,
+        )
+
+        statuses = {}
+        for crawler, results, stored in zip(self.crawlers, crawler_results, stores):
+            table_error = f"Insert failed: {stored!r}" if isinstance(stored, BaseException) else None
+            table = statuses[crawler.repo.TABLE] = {}
+            for account, result in zip(accounts, results):
+                rows = len(result.batch)
+                table[account] = AccountStatus(
+                    rows=0 if table_error else rows,
+                    watermark=max(result.batch.columns["block_timestamp"]) if rows and not table_error else None,
+                    complete=result.complete and table_error is None,
+                    error=table_error or (repr(result.error) if result.error else None),
+                )
+            self._report(crawler, table, table_error)
+        return statuses
+
+    @staticmethod
+    def _report(crawler: BaseTransactionCrawler, table: dict[str, AccountStatus], table_error: str | None):
+        name = type(crawler).__name__
+        if table_error:
+            print(f"{name}: {table_error}")
+        rows = sum(status.rows for status in table.values())
+        behind = [account for account, status in table.items() if not status.complete]
+        print(f"{name}: {rows} new transactions across {len(table)} accounts, {len(behind)} not caught up")
+
+    @staticmethod
+    async def _store(crawler: BaseTransactionCrawler, accounts: list[str], per_account: list[ColumnBatch]):
+        batch = crawler.repo.new_batch()
+        cursors = {}
+        for account, account_batch in zip(accounts, per_account):
+            if len(account_batch):
+                batch.extend(account_batch)
+                cursors[account] = max(account_batch.columns["block_timestamp"])
+        if not len(batch):
+            return
+        if crawler.insert_buffer is not None:
+            await crawler.insert_buffer.add(batch, crawler.watermarks, cursors)
+            crawler.remember(batch)
+            return
+
+        await record_invalidation(batch)
+        await crawler.repo.insert_columns(batch)
+        await record_invalidation(batch)
+        crawler.remember(batch)
+        # Cursors only move once the whole table batch is stored
+        await crawler.watermarks.advance(cursors)
@@ -1,11 +1,37 @@
 from abc import ABC, abstractmethod
-from redis_client import redis_client
+from collections import deque
+from typing import AsyncIterator, NamedTuple
+from entities.column_batch import ColumnBatch
+from entities.report_bucket import record_invalidation
+from settings import settings
+from tasks.dedup import recent_keys
+from tasks.insert_buffer import insert_buffers
+from tasks.page_parser import ParsedPage, RowError
+from tasks.watermark_store import WatermarkStore
+
+
+class CollectResult(NamedTuple):
+    batch: ColumnBatch
+    # False if the page budget or an error stopped the crawl before the latest transactions
+    complete: bool
+    error: Exception | None
+
 
 class BaseTransactionCrawler(ABC):
     """
     Base class for transaction crawlers. Handles common logic for fetching,
     storing, and caching transactions.
     """
+
+    def __init__(self, max_pages_per_tick: int | None = None, use_insert_buffer: bool = False):
+        # Upper bound on pages fetched per account per tick, so a large backlog is caught up over several ticks
+        self.max_pages_per_tick = max_pages_per_tick or settings.crawler.max_pages_per_tick
+        self.watermarks = WatermarkStore(self.redis_key, self.get_latest_timestamps)
+        # When set, rows go through the table's shared buffer and the caller must flush it (see tasks.insert_buffer)
+        self.insert_buffer = insert_buffers[self.repo.TABLE] if use_insert_buffer else None
+        self.recent_keys = recent_keys[self.repo.TABLE]
+        # Latest rows that failed to parse, as (account, RowError)
+        self.parse_errors: deque[tuple[str, RowError]] = deque(maxlen=1000)
     
     @property
     @abstractmethod
@@ -20,57 +46,157 @@ class BaseTransactionCrawler(ABC):
         pass
 
     @abstractmethod
-    async def _fetch_transactions(self, account: str, min_ts: int) -> list:
-        """Fetch transactions from external source"""
-        pass
-
-    @abstractmethod
-    def parse_raw_tx(self, account: str, raw_tx):
-        """Parse raw transaction into a database entity"""
+    def _fetch_transactions(self, account: str, min_ts: int) -> AsyncIterator[list]:
+        """Stream pages of raw transactions from external source"""
         pass
 
     @abstractmethod
-    async def get_latest_transaction(self, account: str):
-        """Abstract method to be implemented by subclasses to fetch the latest transaction from the DB."""
+    def parse_page(self, account: str, raw_txs: list, min_ts: int = 0) -> ParsedPage:
+        """Parse a page of raw transactions at or after `min_ts` into a column batch, collecting row errors"""
         pass
 
     @abstractmethod
-    async def _insert_transactions(self, transactions: list):
-        """Insert parsed transactions into the database."""
+    async def get_latest_timestamps(self, accounts: list[str]) -> dict[str, int]:
+        """Fetch the latest stored block_timestamp of each account from the DB, in one query."""
         pass
     
+    def parse_raw_tx(self, account: str, raw_tx):
+        """Parse raw transaction into a database entity"""
+        page = self.parse_page(account, [raw_tx])
+        self._report_parse_errors(account, page.errors)
+        if not len(page.batch):
+            return None
+        return self.repo.MODEL.from_clickhouse_tuple(next(zip(*page.batch.data())))
+
+    def _report_parse_errors(self, account: str, errors: list[RowError]):
+        if not errors:
+            return
+        self.parse_errors.extend((account, error) for error in errors)
+        tx_id, e = errors[0]
+        detail = f"Missing key {e}" if isinstance(e, KeyError) else str(e)
+        print(f"{len(errors)} transactions for {account} failed to parse, first {tx_id}: {detail}")
+
     async def _get_account_latest_ts(self, account: str) -> int:
         try:
-            # latest_ts = redis_client.get(f"{self.redis_key}:{account}")
-            # if latest_ts is not None:
-            #     return int(latest_ts)
-            
-            latest_tx = await self.get_latest_transaction(account)
-            if latest_tx:
-                return int(latest_tx.block_timestamp)
+            return (await self.watermarks.load([account]))[account]
         except Exception as e:
             print(f"Error getting latest timestamp for {account}: {e}")
         
         return 0
+
+    async def load_watermarks(self, accounts: list[str]) -> dict[str, int]:
+        """Latest stored timestamps of all accounts in one round trip, for crawling many accounts at once."""
+        try:
+            return await self.watermarks.load(accounts)
+        except Exception as e:
+            print(f"Error getting latest timestamps: {e}")
+        return {}
     
-    async def _store_transactions(self, account: str, transactions: list):
-        if not transactions or len(transactions) == 0:
+    async def _store_transactions(self, account: str, batch: ColumnBatch):
+        if not len(batch):
             return
         
-        await self._insert_transactions(transactions)
-        # latest_ts = max(tx.block_timestamp for tx in transactions)
-        # redis_client.set(f"{self.redis_key}:{account}", latest_ts)
+        cursors = {account: max(batch.columns["block_timestamp"])}
+        if self.insert_buffer is not None:
+            await self.insert_buffer.add(batch, self.watermarks, cursors)
+            # Buffered rows are kept until a flush stores them, so they count as stored from here on
+            self.remember(batch)
+            return
+
+        await record_invalidation(batch)
+        await self.repo.insert_columns(batch)
+        await record_invalidation(batch)
+        self.remember(batch)
+        await self.watermarks.advance(cursors)
+
+    def remember(self, batch: ColumnBatch):
+        """Marks the rows of a stored batch, so later crawls skip them."""
+        self.recent_keys.add_many(batch.keys(self.repo.DEDUP_KEY))
     
-    async def crawl_transactions(self, account: str):
-        print(f"Crawling transactions for account {account}")
+    def _drop_seen(self, batch: ColumnBatch) -> ColumnBatch:
+        """Drops rows repeated within the batch or already stored by a recent crawl."""
+        page_keys = set()
+        keep = []
+        for key in batch.keys(self.repo.DEDUP_KEY):
+            keep.append(key not in page_keys and key not in self.recent_keys)
+            page_keys.add(key)
+        dropped = len(keep) - sum(keep)
+        if not dropped:
+            return batch
+        self.recent_keys.skipped += dropped
+        return batch.filter(keep)
+
+    async def _load_boundary_keys(self, account: str, batch: ColumnBatch, min_ts: int) -> bool:
+        """
+        Adds the stored rows of `account` at exactly `min_ts` to `recent_keys` if the page repeats
+        rows at that timestamp this process doesn't know, e.g. after a restart or when another
+        worker stored them. Returns True once it has queried them.
+        """
+        unknown = any(
+            ts == min_ts and key not in self.recent_keys
+            for ts, key in zip(batch.columns["block_timestamp"], batch.keys(self.repo.DEDUP_KEY))
+        )
+        if not unknown:
+            return False
         try:
+            self.recent_keys.add_many(await self.repo.get_keys_at(account, min_ts))
+        except Exception as e:
+            # Not fatal: the rows are stored again and the ReplacingMergeTree tables collapse them
+            print(f"Error loading stored rows of {account} at {min_ts}: {e}")
+        return True
+
+    async def _iter_parsed_pages(self, account: str, min_ts: int | None = None) -> AsyncIterator[ColumnBatch]:
+        """Yields new transactions as one column batch per page, up to `max_pages_per_tick` pages."""
+        if min_ts is None:
             min_ts = await self._get_account_latest_ts(account)
-            raw_txs = await self._fetch_transactions(account, min_ts + 1)
-            parsed_txs = [self.parse_raw_tx(account, tx) for tx in raw_txs]
-            parsed_txs = [tx for tx in parsed_txs if tx is not None and tx.block_timestamp > min_ts]
-            
-            await self._store_transactions(account, parsed_txs)
-            return parsed_txs
+        # Refetch from the watermark itself: a page budget can stop inside a run of rows sharing one
+        # block_timestamp, and the rest of that run must not be skipped. Rows already stored are
+        # dropped by `_drop_seen`, so they reach neither the hourly_activity views nor the report
+        # invalidations again; the stored rows at the watermark are looked up when this process
+        # doesn't know them.
+        boundary_loaded = not min_ts
+        pages = self._fetch_transactions(account, min_ts)
+        try:
+            page_count = 0
+            async for raw_txs in pages:
+                page = self.parse_page(account, raw_txs, min_ts)
+                self._report_parse_errors(account, page.errors)
+                if not boundary_loaded:
+                    boundary_loaded = await self._load_boundary_keys(account, page.batch, min_ts)
+                yield self._drop_seen(page.batch)
+
+                page_count += 1
+                if page_count >= self.max_pages_per_tick:
+                    break
+        finally:
+            await pages.aclose()
+
+    async def crawl_transactions(self, account: str, min_ts: int | None = None) -> int:
+        print(f"Crawling transactions for account {account}")
+        stored = 0
+        try:
+            async for batch in self._iter_parsed_pages(account, min_ts):
+                # Store page by page so memory stays bounded and progress survives a failure later in the tick
+                await self._store_transactions(account, batch)
+                stored += len(batch)
+        except Exception as e:
+            print(f"Error crawling transactions for {account}: {e}")
+        return stored
+
+    async def collect_transactions(self, account: str, min_ts: int | None = None) -> CollectResult:
+        """
+        Fetches and parses new transactions without storing them, for callers that batch inserts.
+        Callers must advance `self.watermarks` once the batch is stored, or hand both to `self.insert_buffer`.
+        """
+        collected = self.repo.new_batch()
+        pages = 0
+        try:
+            async for batch in self._iter_parsed_pages(account, min_ts):
+                collected.extend(batch)
+                pages += 1
         except Exception as e:
+            # Pages are in ascending order, so what was collected before the failure is still safe to store
             print(f"Error crawling transactions for {account}: {e}")
-        return []
+            return CollectResult(collected, complete=False, error=e)
+        # A full page budget may have stopped short of the latest transactions
+        return CollectResult(collected, complete=pages < self.max_pages_per_tick, error=None)
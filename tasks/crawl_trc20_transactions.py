@@ -1,6 +1,8 @@
-from entities.trc20_transfer import Trc20TransferRepo, Trc20Transfer
+from typing import AsyncIterator
+from entities.trc20_transfer import Trc20TransferRepo
 from adapter.tron_grid_client import tron_grid_client
 from tasks.base_crawler import BaseTransactionCrawler  # Import the base class
+from tasks.page_parser import ParsedPage, parse_trc20_page
 
 class Trc20TransactionCrawler(BaseTransactionCrawler):
     @property
@@ -11,30 +13,11 @@ class Trc20TransactionCrawler(BaseTransactionCrawler):
     def redis_key(self) -> str:
         return "trc20_latest_ts"
 
-    async def get_latest_transaction(self, account: str):
-        return await self.repo.get_latest_transfer_by_account(account)
+    async def get_latest_timestamps(self, accounts: list[str]) -> dict[str, int]:
+        return await self.repo.get_latest_timestamps_by_account(accounts)
 
-    async def _insert_transactions(self, transactions: list[Trc20Transfer]):
-        await self.repo.insert_transactions(transactions)
+    def _fetch_transactions(self, account: str, min_ts: int) -> AsyncIterator[list]:
+        return tron_grid_client.get_trc20_txs(account, min_ts)
 
-    async def _fetch_transactions(self, account: str, min_ts: int) -> list:
-        return await tron_grid_client.get_trc20_txs(account, min_ts)
-
-    def parse_raw_tx(self, account: str, raw_tx) -> Trc20Transfer:
-        if raw_tx.get("type") != "Transfer":
-            return None
-        try:
-            return Trc20Transfer(
-                tx_id=raw_tx["transaction_id"],
-                token_address=raw_tx["token_info"]["address"],
-                block_timestamp=raw_tx["block_timestamp"],
-                from_address=raw_tx["from"],
-                to_address=raw_tx["to"],
-                value=raw_tx["value"],
-                key_address=account
-            )
-        except KeyError as e:
-            print(f"KeyError parsing transaction for {account}: Missing key {e}")
-        except Exception as e:
-            print(f"Error parsing transaction for {account}: {e}")
-        return None  # Return None if parsing fails
+    def parse_page(self, account: str, raw_txs: list, min_ts: int = 0) -> ParsedPage:
+        return parse_trc20_page(self.repo.new_batch(), account, raw_txs, min_ts=min_ts)
@@ -0,0 +1,36 @@
+from collections import OrderedDict
+from typing import Hashable, Iterable
+from entities.from_transaction import FromTransactionRepo
+from entities.to_transaction import ToTransactionRepo
+from entities.trc20_transfer import Trc20TransferRepo
+from settings import settings
+
+
+class RecentKeys:
+    """
+    Bounded LRU of row keys (a table's `DEDUP_KEY` columns) stored recently by this process.
+    Crawlers drop rows already in it, so overlapping crawls don't send the same rows to
+    ClickHouse again; the ReplacingMergeTree tables still collapse anything that slips through.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.keys: "OrderedDict[Hashable, None]" = OrderedDict()
+        self.skipped = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.keys
+
+    def add_many(self, keys: Iterable[Hashable]):
+        for key in keys:
+            self.keys[key] = None
+            self.keys.move_to_end(key)
+        while len(self.keys) > self.max_size:
+            self.keys.popitem(last=False)
+
+
+# One set of recent keys per table, shared by every crawler in the process
+recent_keys = {
+    repo.TABLE: RecentKeys(settings.crawler.dedup_cache_size)
+    for repo in (FromTransactionRepo, ToTransactionRepo, Trc20TransferRepo)
+}
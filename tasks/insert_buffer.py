@@ -0,0 +1,163 @@
+import asyncio
+import time
+from typing import Optional
+from entities.column_batch import ColumnBatch
+from entities.from_transaction import FromTransactionRepo
+from entities.report_bucket import record_invalidation
+from entities.swap import SwapRepo
+from entities.to_transaction import ToTransactionRepo
+from entities.trc20_transfer import Trc20TransferRepo
+from settings import settings
+from tasks.watermark_store import WatermarkStore
+
+
+class InsertBufferFull(Exception):
+    """Raised by `InsertBuffer.add` while failed batches fill the buffer. The rows are not taken, so they are fetched again later."""
+
+
+class InsertBuffer:
+    """
+    Gathers column batches for one table across accounts and crawlers, and inserts them in one go once the
+    buffer reaches `max_rows`, `max_bytes` or `max_age` seconds. Fewer, larger inserts mean fewer
+    MergeTree parts and less background merging. Watermarks of buffered rows only advance after
+    the flush that stores them succeeds.
+
+    A batch whose insert fails is frozen and retried as is, ahead of rows added since, so the retry
+    carries the same deduplication token and ClickHouse drops it if the first attempt was stored.
+    Once frozen batches hold `max_failed_rows`, no more are frozen and `add` refuses new rows.
+    """
+
+    def __init__(
+        self, repo, max_rows: int, max_bytes: int, max_age: float, max_failed_rows: int, async_insert: bool = False
+    ):
+        self.repo = repo
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.max_failed_rows = max_failed_rows
+        # wait_for_async_insert so a successful insert means the rows are durable before watermarks move
+        self.insert_settings = {"async_insert": 1, "wait_for_async_insert": 1} if async_insert else None
+        self.batch: ColumnBatch = repo.new_batch()
+        self.bytes = 0
+        self.first_added_at: Optional[float] = None
+        self.pending_watermarks: dict[str, tuple[WatermarkStore, dict[str, int]]] = {}
+        # Batches whose insert failed, oldest first, with the watermarks to advance once each is stored
+        self.failed: list[tuple[ColumnBatch, dict[str, tuple[WatermarkStore, dict[str, int]]]]] = []
+        self.failed_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        if self._lock is None or self._loop is not loop:
+            self._lock = asyncio.Lock()
+            self._loop = loop
+        return self._lock
+
+    def failed_rows(self) -> int:
+        return sum(len(batch) for batch, _ in self.failed)
+
+    def is_full(self) -> bool:
+        return self.failed_rows() >= self.max_failed_rows
+
+    async def add(self, batch: ColumnBatch, watermarks: Optional[WatermarkStore] = None, cursors: Optional[dict[str, int]] = None):
+        """
+        Buffers a column batch, and the cursors to advance in `watermarks` once it is stored.
+        Raises `InsertBufferFull`, without taking the rows, while failed batches fill the buffer.
+        A failed flush of rows already taken is only logged; they are retried by later flushes.
+        """
+        if not len(batch):
+            return
+        if self.is_full() and self.is_due():
+            await self._try_flush()
+        if self.is_full():
+            raise InsertBufferFull(f"{self.failed_rows()} rows for {self.repo.TABLE} are waiting for a retry")
+        self.batch.extend(batch)
+        self.bytes += batch.estimated_bytes()
+        if self.first_added_at is None:
+            self.first_added_at = time.monotonic()
+
+        if watermarks is not None and cursors:
+            watermarks.stage(cursors)
+            _, pending = self.pending_watermarks.setdefault(watermarks.namespace, (watermarks, {}))
+            for account, ts in cursors.items():
+                pending[account] = max(ts, pending.get(account, 0))
+
+        if self.is_due():
+            await self._try_flush()
+
+    async def _try_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"Error flushing insert buffer for {self.repo.TABLE}, retrying in {self.max_age}s: {e}")
+
+    def is_due(self) -> bool:
+        if self.failed and time.monotonic() - self.failed_at >= self.max_age:
+            return True
+        if not len(self.batch):
+            return False
+        return (
+            len(self.batch) >= self.max_rows
+            or self.bytes >= self.max_bytes
+            or time.monotonic() - self.first_added_at >= self.max_age
+        )
+
+    async def flush(self):
+        stored = []
+        try:
+            async with self._get_lock():
+                # In order, so a batch's watermarks never advance past rows of an earlier batch still unstored
+                while True:
+                    # While full, the current batch waits for the backlog to drain rather than growing it
+                    if len(self.batch) and not self.is_full():
+                        self.failed.append((self.batch, self.pending_watermarks))
+                        self.batch, self.bytes, self.first_added_at, self.pending_watermarks = self.repo.new_batch(), 0, None, {}
+                    if not self.failed:
+                        break
+                    batch, pending = self.failed[0]
+                    await record_invalidation(batch)
+                    try:
+                        await self.repo.insert_columns(batch, insert_settings=self.insert_settings)
+                    except Exception:
+                        # Kept unchanged for the next flush; their watermarks stay staged, so they aren't refetched meanwhile
+                        self.failed_at = time.monotonic()
+                        raise
+                    self.failed.pop(0)
+                    stored.append(pending)
+                    await record_invalidation(batch)
+        finally:
+            for pending in stored:
+                for store, cursors in pending.values():
+                    await store.advance(cursors)
+
+
+def _create_buffer(repo) -> InsertBuffer:
+    return InsertBuffer(
+        repo,
+        max_rows=settings.insert_buffer.max_rows,
+        max_bytes=settings.insert_buffer.max_bytes,
+        max_age=settings.insert_buffer.max_age,
+        max_failed_rows=settings.insert_buffer.max_failed_rows,
+        async_insert=settings.insert_buffer.async_insert,
+    )
+
+
+# One buffer per target table, shared by every crawler in the process
+insert_buffers = {
+    repo.TABLE: _create_buffer(repo)
+    for repo in (FromTransactionRepo, ToTransactionRepo, Trc20TransferRepo, SwapRepo)
+}
+
+
+async def flush_all():
+    """Flushes every buffer, e.g. at the end of a Celery tick or on shutdown."""
+    results = await asyncio.gather(*[buffer.flush() for buffer in insert_buffers.values()], return_exceptions=True)
+    for table, result in zip(insert_buffers, results):
+        if isinstance(result, Exception):
+            print(f"Error flushing insert buffer for {table}: {result}")
+
+
+async def flush_due():
+    """Flushes buffers that reached their age limit; call periodically from long-running processes."""
+    await asyncio.gather(*[buffer.flush() for buffer in insert_buffers.values() if buffer.is_due()])
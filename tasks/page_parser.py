@@ -0,0 +1,156 @@
+"""
+Page-at-a-time parsers for TronGrid pages. Each walks a page once, building rows in the target
+table's `COLUMNS` order, converts hex counterparties once per distinct address, and fills the
+column batch in one go. Rows that fail to parse are collected as `RowError`s instead of
+being printed, so the crawler can report a page's failures together.
+"""
+from typing import NamedTuple
+from adapter.address_codec import address_codec
+from entities.column_batch import ColumnBatch
+from entities.from_transaction import FromTransactionRepo
+from entities.to_transaction import ToTransactionRepo
+from entities.types import NormalTransactionType
+
+TRANSFER_ASSET = NormalTransactionType.TRANSFER_ASSET_CONTRACT.value
+UNDELEGATE = NormalTransactionType.UNDELEGATE_RESOURCE_CONTRACT.value
+INTERNAL = NormalTransactionType.INTERNAL.value
+NORMAL_TYPES = frozenset(t.value for t in NormalTransactionType)
+
+# Positions in the from/to_transaction `COLUMNS`, which `parse_account_tx_page` builds its rows in
+TX_ID_INDEX = FromTransactionRepo.COLUMNS.index("tx_id")
+FROM_INDEX = ToTransactionRepo.COLUMNS.index("from")
+TO_INDEX = FromTransactionRepo.COLUMNS.index("to")
+
+
+class RowError(NamedTuple):
+    tx_id: str | None
+    error: Exception
+
+
+class ParsedPage(NamedTuple):
+    batch: ColumnBatch
+    errors: list[RowError]
+
+
+def _tx_id(raw_tx) -> str | None:
+    if not isinstance(raw_tx, dict):
+        return None
+    return raw_tx.get("txID") or raw_tx.get("tx_id") or raw_tx.get("transaction_id")
+
+
+def _fill_batch(batch: ColumnBatch, rows: list[tuple], errors: list[RowError]):
+    """Appends `rows` column by column, falling back to row by row to single out bad values."""
+    if not rows:
+        return
+    try:
+        batch.extend_columns(list(zip(*rows)))
+    except Exception:
+        for row in rows:
+            try:
+                batch.append(row)
+            except Exception as e:
+                errors.append(RowError(row[batch.column_names.index("tx_id")], e))
+
+
+def _convert_counterparties(rows: list[tuple], index: int, errors: list[RowError]) -> list[tuple]:
+    """Replaces the hex address at `index` of each row with its base58 form, dropping rows that fail."""
+    converted, failed = {}, {}
+    for address in {row[index] for row in rows}:
+        try:
+            converted[address] = address_codec.from_hex(address)
+        except Exception as e:
+            failed[address] = e
+    result = []
+    for row in rows:
+        address = row[index]
+        if address in failed:
+            errors.append(RowError(row[TX_ID_INDEX], failed[address]))
+            continue
+        result.append((*row[:index], converted[address], *row[index + 1:]))
+    return result
+
+
+def parse_account_tx_page(batch: ColumnBatch, account: str, raw_txs: list, incoming: bool, min_ts: int = 0) -> ParsedPage:
+    """
+    Parses a /v1/accounts/{account}/transactions page into from_transaction rows (`incoming`
+    False) or to_transaction rows (True), skipping TransferAssetContract and rows before
+    `min_ts`. Only the incoming side keeps internal transactions.
+    """
+    rows: list[tuple] = []
+    errors: list[RowError] = []
+    counterparty_index = FROM_INDEX if incoming else TO_INDEX
+    for raw_tx in raw_txs:
+        try:
+            raw_data = raw_tx.get("raw_data")
+            if raw_data:
+                contract = raw_data["contract"][0]
+                tx_type = contract["type"]
+                if tx_type == TRANSFER_ASSET:
+                    continue
+                if tx_type not in NORMAL_TYPES:
+                    raise ValueError(f"'{tx_type}' is not a valid NormalTransactionType")
+                block_timestamp = raw_tx["block_timestamp"]
+                if block_timestamp < min_ts:
+                    continue
+                parameter_value = contract["parameter"]["value"]
+                ret = raw_tx["ret"][0]
+                if incoming:
+                    value = parameter_value["balance"] if tx_type == UNDELEGATE else parameter_value.get("amount", 0)
+                    counterparty = parameter_value.get("owner_address") or parameter_value.get("contract_address")
+                    internal_tx_id = raw_tx.get("internal_tx_id") or ""
+                else:
+                    value = parameter_value.get("amount") or parameter_value.get("call_value") or 0
+                    counterparty = parameter_value.get("to_address") or parameter_value.get("contract_address")
+                    internal_tx_id = ""
+                if not counterparty:
+                    raise ValueError("Missing counterparty address")
+                status, tx_id, fee, block_number = ret["contractRet"], raw_tx["txID"], ret["fee"], raw_tx["blockNumber"]
+            elif incoming:
+                block_timestamp = raw_tx["block_timestamp"]
+                if block_timestamp < min_ts:
+                    continue
+                data = raw_tx["data"]
+                status = "REJECTED" if data.get("rejected") else "SUCCESS"
+                tx_id, internal_tx_id = raw_tx["tx_id"], raw_tx.get("internal_tx_id") or ""
+                fee, value, block_number = 0, data["call_value"]["_"], 0
+                counterparty, tx_type = raw_tx["from_address"], INTERNAL
+            else:
+                # only_from also lists internal transactions; from_transaction keeps normal ones only
+                continue
+        except Exception as e:
+            errors.append(RowError(_tx_id(raw_tx), e))
+            continue
+        if incoming:
+            rows.append((status, tx_id, internal_tx_id, fee, value, block_number, block_timestamp, counterparty, account, tx_type))
+        else:
+            rows.append((status, tx_id, internal_tx_id, fee, value, block_number, block_timestamp, account, counterparty, tx_type))
+
+    _fill_batch(batch, _convert_counterparties(rows, counterparty_index, errors), errors)
+    return ParsedPage(batch, errors)
+
+
+def parse_trc20_page(batch: ColumnBatch, account: str, raw_txs: list, min_ts: int = 0) -> ParsedPage:
+    """Parses a /v1/accounts/{account}/transactions/trc20 page into trc20_transfer rows, keeping transfers only."""
+    rows: list[tuple] = []
+    errors: list[RowError] = []
+    for raw_tx in raw_txs:
+        try:
+            if raw_tx.get("type") != "Transfer":
+                continue
+            block_timestamp = raw_tx["block_timestamp"]
+            if block_timestamp < min_ts:
+                continue
+            rows.append((
+                raw_tx["transaction_id"],
+                raw_tx["token_info"]["address"],
+                block_timestamp,
+                account,  # key
+                raw_tx["from"],
+                raw_tx["to"],
+                raw_tx["value"],
+            ))
+        except Exception as e:
+            errors.append(RowError(_tx_id(raw_tx), e))
+
+    _fill_batch(batch, rows, errors)
+    return ParsedPage(batch, errors)
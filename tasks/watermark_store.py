@@ -0,0 +1,75 @@
+from typing import Awaitable, Callable
+from redis_client import get_async_redis_client
+
+# Sets each key to its new value only if that moves the cursor forward, all in one atomic step
+ADVANCE_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    local current = redis.call('GET', key)
+    if not current or tonumber(ARGV[i]) > tonumber(current) then
+        redis.call('SET', key, ARGV[i])
+    end
+end
+return #KEYS
+"""
+
+
+class WatermarkStore:
+    """
+    Resume points (latest stored block_timestamp per account) for one crawler. All accounts are
+    read in a single Redis MGET, and cursors missing from Redis, e.g. on a cold start, are
+    rebuilt with one grouped ClickHouse query.
+    """
+
+    def __init__(self, namespace: str, load_from_db: Callable[[list[str]], Awaitable[dict[str, int]]]):
+        self.namespace = namespace
+        self.load_from_db = load_from_db
+        # Cursors of rows handed to an insert buffer but not flushed yet; they count for `load` in this process
+        self.staged: dict[str, int] = {}
+
+    def _key(self, account: str) -> str:
+        return f"{self.namespace}:{account}"
+
+    async def load(self, accounts: list[str]) -> dict[str, int]:
+        watermarks = {}
+        try:
+            values = await get_async_redis_client().mget([self._key(account) for account in accounts])
+            watermarks = {account: int(value) for account, value in zip(accounts, values) if value is not None}
+        except Exception as e:
+            print(f"Error reading watermarks for {self.namespace} from Redis, rebuilding from ClickHouse: {e}")
+
+        missing = [account for account in accounts if account not in watermarks]
+        if missing:
+            rebuilt = await self.load_from_db(missing)
+            rebuilt = {account: int(rebuilt.get(account) or 0) for account in missing}
+            watermarks.update(rebuilt)
+            await self.advance(rebuilt)
+
+        for account in accounts:
+            if self.staged.get(account, 0) > watermarks[account]:
+                watermarks[account] = self.staged[account]
+        return watermarks
+
+    def stage(self, watermarks: dict[str, int]):
+        """Records cursors of rows waiting in an insert buffer, so they aren't fetched again before the flush."""
+        for account, ts in watermarks.items():
+            if ts > self.staged.get(account, 0):
+                self.staged[account] = ts
+
+    async def advance(self, watermarks: dict[str, int]):
+        """Moves cursors forward (never back) once the rows up to them are safely stored."""
+        if not watermarks:
+            return
+        accounts = list(watermarks)
+        for account in accounts:
+            if self.staged.get(account, 0) <= watermarks[account]:
+                self.staged.pop(account, None)
+        try:
+            await get_async_redis_client().eval(
+                ADVANCE_SCRIPT,
+                len(accounts),
+                *[self._key(account) for account in accounts],
+                *[int(watermarks[account]) for account in accounts],
+            )
+        except Exception as e:
+            # Not fatal: the next load rebuilds the missing cursors from ClickHouse
+            print(f"Error advancing watermarks for {self.namespace}: {e}")
@@ -0,0 +1,21 @@
+import json
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+# settings.py requires these; the tests never reach ClickHouse, Redis or TronGrid
+for name in ("CLICKHOUSE_USERNAME", "CLICKHOUSE_PASSWORD", "CLICKHOUSE_DB", "REDIS_PASSWORD", "TRONGRID_API_KEY"):
+    os.environ.setdefault(name, "test")
+# Keep the response cache in memory
+os.environ.setdefault("TRONGRID_CACHE_PATH", "")
+# Keep the TronGrid rate limiters local
+os.environ.setdefault("TRONGRID_SHARED_RATE_LIMIT", "false")
+
+
+def load_fixture(name: str):
+    """One of the example TronGrid responses at the repository root."""
+    with open(REPO_ROOT / name) as f:
+        return json.load(f)
@@ -0,0 +1,80 @@
+import asyncio
+from entities.trc20_transfer import Trc20TransferRepo
+from tasks.crawl_trc20_transactions import Trc20TransactionCrawler
+from tasks.dedup import RecentKeys
+
+ACCOUNT = "TNKfn6wmBoX3hq3HDxNDUcWhbkK5ZHJWrP"
+TOKEN = "TR7NHqjeKQxGTCi8q8ZY4pL8otSzgjLj6t"
+WATERMARK = 1_742_700_000_000
+
+
+def transfer(tx_id: str, block_timestamp: int) -> dict:
+    return {
+        "transaction_id": tx_id, "token_info": {"address": TOKEN}, "block_timestamp": block_timestamp,
+        "from": ACCOUNT, "to": "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf", "value": "1", "type": "Transfer",
+    }
+
+
+class PagedCrawler(Trc20TransactionCrawler):
+    """Serves fixed pages instead of TronGrid and keeps its own recent keys."""
+
+    def __init__(self, pages: list[list[dict]]):
+        super().__init__()
+        self.pages = pages
+        self.recent_keys = RecentKeys(1000)
+
+    async def _fetch_transactions(self, account, min_ts):
+        for page in self.pages:
+            yield page
+
+
+def collected_tx_ids(crawler: PagedCrawler) -> list[str]:
+    result = asyncio.run(crawler.collect_transactions(ACCOUNT, WATERMARK))
+    # As the caller does once it stores them
+    crawler.remember(result.batch)
+    return list(result.batch.columns["tx_id"])
+
+
+def stored_keys(*tx_ids: str) -> set[tuple]:
+    batch = Trc20TransferRepo.new_batch()
+    for tx_id in tx_ids:
+        batch.append((tx_id, TOKEN, WATERMARK, ACCOUNT, ACCOUNT, "TXYZopYRdj2D9XRtbG411XZZ3kM5VkAeBf", "1"))
+    return set(batch.keys(Trc20TransferRepo.DEDUP_KEY))
+
+
+def test_rows_at_the_watermark_already_stored_are_dropped_after_a_restart(monkeypatch):
+    lookups = []
+
+    async def get_keys_at(account, block_timestamp):
+        lookups.append((account, block_timestamp))
+        return stored_keys("a", "b")
+
+    monkeypatch.setattr(Trc20TransferRepo, "get_keys_at", get_keys_at)
+    # "c" shares the watermark but wasn't stored, e.g. a page budget stopped inside the run
+    pages = [[transfer("a", WATERMARK), transfer("b", WATERMARK), transfer("c", WATERMARK), transfer("d", WATERMARK + 1)]]
+    crawler = PagedCrawler(pages)
+    assert collected_tx_ids(crawler) == ["c", "d"]
+    assert lookups == [(ACCOUNT, WATERMARK)]
+
+    # Everything at the watermark is known now, so the next tick neither queries nor stores it again
+    assert collected_tx_ids(crawler) == []
+    assert len(lookups) == 1
+
+
+def test_no_lookup_when_the_boundary_rows_are_known(monkeypatch):
+    async def get_keys_at(account, block_timestamp):
+        raise AssertionError("not needed")
+
+    monkeypatch.setattr(Trc20TransferRepo, "get_keys_at", get_keys_at)
+    crawler = PagedCrawler([[transfer("a", WATERMARK), transfer("d", WATERMARK + 1)]])
+    crawler.recent_keys.add_many(stored_keys("a"))
+    assert collected_tx_ids(crawler) == ["d"]
+
+
+def test_lookup_failure_keeps_the_rows(monkeypatch):
+    async def get_keys_at(account, block_timestamp):
+        raise ConnectionError("clickhouse down")
+
+    monkeypatch.setattr(Trc20TransferRepo, "get_keys_at", get_keys_at)
+    crawler = PagedCrawler([[transfer("a", WATERMARK), transfer("d", WATERMARK + 1)]])
+    assert collected_tx_ids(crawler) == ["a", "d"]
@@ -0,0 +1,75 @@
+from array import array
+import pytest
+from entities.column_batch import ColumnBatch
+from entities.trc20_transfer import Trc20TransferRepo
+
+COLUMNS = ["tx_id", "block_timestamp", "value"]
+
+
+def new_batch() -> ColumnBatch:
+    return ColumnBatch(COLUMNS, ("block_timestamp",))
+
+
+def test_append_fills_columns_in_order():
+    batch = new_batch()
+    batch.append(("a", 1, "10"))
+    batch.append(("b", 2, "20"))
+    assert len(batch) == 2
+    assert isinstance(batch.columns["block_timestamp"], array)
+    assert batch.data() == [["a", "b"], array("Q", [1, 2]), ["10", "20"]]
+
+
+def test_bad_append_leaves_batch_unchanged():
+    batch = new_batch()
+    batch.append(("a", 1, "10"))
+    with pytest.raises(OverflowError):
+        batch.append(("b", -1, "20"))
+    with pytest.raises(ValueError):
+        batch.append(("b", 2))
+    assert len(batch) == 1
+    assert [list(column) for column in batch.data()] == [["a"], [1], ["10"]]
+
+
+def test_bad_extend_columns_leaves_batch_unchanged():
+    batch = new_batch()
+    batch.extend_columns([["a"], [1], ["10"]])
+    with pytest.raises(TypeError):
+        batch.extend_columns([["b", "c"], [2, "x"], ["20", "30"]])
+    assert [list(column) for column in batch.data()] == [["a"], [1], ["10"]]
+
+
+def test_filter_keeps_flagged_rows_and_column_types():
+    batch = new_batch()
+    batch.extend_columns([["a", "b", "c"], [1, 2, 3], ["10", "20", "30"]])
+    filtered = batch.filter([True, False, True])
+    assert [list(column) for column in filtered.data()] == [["a", "c"], [1, 3], ["10", "30"]]
+    assert isinstance(filtered.columns["block_timestamp"], array)
+    # The source batch is untouched
+    assert len(batch) == 3
+
+
+def test_extend_and_clear():
+    batch, other = new_batch(), new_batch()
+    batch.append(("a", 1, "10"))
+    other.append(("b", 2, "20"))
+    batch.extend(other)
+    assert list(batch.keys(["tx_id", "block_timestamp"])) == [("a", 1), ("b", 2)]
+    batch.clear()
+    assert len(batch) == 0 and len(other) == 1
+
+
+def test_fingerprint_depends_on_key_columns_only():
+    first, second = Trc20TransferRepo.new_batch(), Trc20TransferRepo.new_batch()
+    first.append(("tx", "T1", 1000, "K", "F", "T", "5"))
+    second.append(("tx", "T1", 1000, "K", "F", "T", "6"))
+    assert first.fingerprint(Trc20TransferRepo.DEDUP_KEY) == second.fingerprint(Trc20TransferRepo.DEDUP_KEY)
+
+    second.append(("tx2", "T1", 1000, "K", "F", "T", "6"))
+    assert first.fingerprint(Trc20TransferRepo.DEDUP_KEY) != second.fingerprint(Trc20TransferRepo.DEDUP_KEY)
+
+
+def test_estimated_bytes():
+    batch = new_batch()
+    batch.append(("abcd", 1, "10"))
+    # 4 + 8 + 2
+    assert batch.estimated_bytes() == 14
@@ -0,0 +1,65 @@
+import json
+import pytest
+from adapter.decoding import ACCOUNT_TX_PAGE, TRC20_TRANSFER_PAGE, decode_json, decode_page
+from conftest import load_fixture
+from entities.from_transaction import FromTransactionRepo
+from entities.to_transaction import ToTransactionRepo
+from entities.trc20_transfer import Trc20TransferRepo
+from tasks.page_parser import parse_account_tx_page, parse_trc20_page
+from test_page_parser import ACCOUNT, internal_tx, normal_page, rows_of
+
+pytest.importorskip("msgspec")
+
+META = {"at": 1742700100000, "page_size": 2, "links": {"next": "https://api.trongrid.io/v1/next?fingerprint=x"}}
+
+
+def encode(data: list) -> bytes:
+    return json.dumps({"data": data, "meta": META}).encode()
+
+
+def test_account_tx_page_parses_like_full_json():
+    content = encode(normal_page() + [internal_tx(100), internal_tx(102, rejected=True)])
+    typed, full = decode_page(content, ACCOUNT_TX_PAGE), json.loads(content)
+    assert typed["meta"] == full["meta"]
+    for repo, incoming in ((FromTransactionRepo, False), (ToTransactionRepo, True)):
+        expected = parse_account_tx_page(repo.new_batch(), ACCOUNT, full["data"], incoming=incoming)
+        parsed = parse_account_tx_page(repo.new_batch(), ACCOUNT, typed["data"], incoming=incoming)
+        assert rows_of(parsed.batch) == rows_of(expected.batch)
+        assert len(parsed.errors) == len(expected.errors)
+
+
+def test_trc20_page_parses_like_full_json():
+    content = encode(load_fixture("example-trc20.json"))
+    typed, full = decode_page(content, TRC20_TRANSFER_PAGE), json.loads(content)
+    expected = parse_trc20_page(Trc20TransferRepo.new_batch(), ACCOUNT, full["data"])
+    parsed = parse_trc20_page(Trc20TransferRepo.new_batch(), ACCOUNT, typed["data"])
+    assert len(parsed.batch) > 0
+    assert rows_of(parsed.batch) == rows_of(expected.batch)
+
+
+def test_unused_and_unknown_fields_are_dropped():
+    raw_tx = normal_page()[0]
+    # A field TronGrid may add later doesn't fail validation
+    raw_tx["new_field"] = {"nested": [1, 2]}
+    typed = decode_page(encode([raw_tx]), ACCOUNT_TX_PAGE)["data"][0]
+    assert "raw_data_hex" in raw_tx and "signature" in raw_tx
+    assert not {"raw_data_hex", "signature", "new_field"} & typed.keys()
+    assert typed["txID"] == raw_tx["txID"]
+
+
+def test_unexpected_shape_falls_back_to_full_decode():
+    raw_tx = normal_page()[0]
+    # A field of the typed shape with another type fails validation
+    raw_tx["block_timestamp"] = str(raw_tx["block_timestamp"])
+    content = encode([raw_tx])
+    assert decode_page(content, ACCOUNT_TX_PAGE) == json.loads(content)
+
+    transfers = load_fixture("example-trc20.json")[:2]
+    transfers[0]["token_info"] = "not an object"
+    content = encode(transfers)
+    assert decode_page(content, TRC20_TRANSFER_PAGE) == json.loads(content)
+
+
+def test_untyped_shapes_decode_in_full():
+    content = encode(normal_page()[:2])
+    assert decode_page(content) == decode_json(content) == json.loads(content)
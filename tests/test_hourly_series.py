@@ -0,0 +1,144 @@
+import time
+import numpy as np
+import pytest
+from hourly_series import HourlySeries, HourlySeriesCache, align_series
+
+HOUR = 1_742_688_000
+
+
+def hours(*offsets: int) -> np.ndarray:
+    return np.array([HOUR + offset * 3600 for offset in offsets], dtype="datetime64[s]")
+
+
+def values(*items: float) -> np.ndarray:
+    return np.array(items, dtype=np.float64)
+
+
+def test_build_accumulates():
+    series = HourlySeries.build(hours(0, 1, 3), values(1, 2, 4))
+    assert series.accumulated.tolist() == [1, 3, 7]
+
+
+def test_merge_replaces_hours_from_since():
+    series = HourlySeries.build(hours(0, 1, 2), values(1, 2, 4))
+    # Hour 2 was still open at the last fetch; the refetch starts there
+    merged = series.merge(hours(2, 3), values(5, 8), np.datetime64(HOUR + 2 * 3600, "s"))
+    assert merged.hours.tolist() == hours(0, 1, 2, 3).tolist()
+    assert merged.values.tolist() == [1, 2, 5, 8]
+    assert merged.accumulated.tolist() == [1, 3, 8, 16]
+
+
+def test_merge_with_nothing_new_keeps_earlier_hours():
+    series = HourlySeries.build(hours(0, 1), values(1, 2))
+    merged = series.merge(hours(), values(), np.datetime64(HOUR + 5 * 3600, "s"))
+    assert merged.values.tolist() == [1, 2]
+
+
+def test_total_before():
+    series = HourlySeries.build(hours(0, 1, 3), values(1, 2, 4))
+    assert series.total_before(np.datetime64(HOUR, "s")) == 0.0
+    assert series.total_before(np.datetime64(HOUR + 2 * 3600, "s")) == 3.0
+    assert series.total_before(np.datetime64(HOUR + 3 * 3600, "s")) == 3.0
+    assert series.total_before(np.datetime64(HOUR + 10 * 3600, "s")) == 7.0
+    assert HourlySeries.build(hours(), values()).total_before(np.datetime64(HOUR, "s")) == 0.0
+
+
+def test_align_series_keeps_common_hours():
+    volume = HourlySeries.build(hours(0, 1, 2, 4), values(1, 2, 4, 8))
+    gas = HourlySeries.build(hours(1, 2, 3, 4), values(10, 20, 40, 80))
+    common, acc_volume, acc_gas = align_series(volume, gas)
+    assert common.tolist() == hours(1, 2, 4).tolist()
+    # Accumulated over each series' own hours, including the ones the other lacks
+    assert acc_volume.tolist() == [3, 7, 15]
+    assert acc_gas.tolist() == [10, 30, 150]
+
+
+class FakeActivity:
+    """hourly_activity as {hour: (volume, gas)}, answering the cache's two queries and counting them."""
+
+    def __init__(self, rows: dict[int, tuple[float, float]]):
+        self.rows = dict(rows)
+        self.series_calls: list[int] = []
+
+    def fetch_series(self, token: str, min_hour: int):
+        self.series_calls.append(min_hour)
+        selected = sorted(hour for hour in self.rows if hour >= min_hour)
+        as_hours = np.array(selected, dtype="datetime64[s]")
+        return (
+            (as_hours, values(*(self.rows[hour][0] for hour in selected))),
+            (as_hours, values(*(self.rows[hour][1] for hour in selected))),
+        )
+
+    def fetch_totals(self, token: str, before_hour: int) -> tuple[float, float]:
+        kept = [self.rows[hour] for hour in self.rows if hour < before_hour]
+        return sum(row[0] for row in kept), sum(row[1] for row in kept)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [HOUR + 5 * 3600 + 120.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def new_cache(activity: FakeActivity, full_refetch_every: int = 10, max_tokens: int = 2) -> HourlySeriesCache:
+    return HourlySeriesCache(
+        activity.fetch_series, activity.fetch_totals,
+        ttl=30, max_tokens=max_tokens, settle=600, full_refetch_every=full_refetch_every,
+    )
+
+
+def test_entries_are_shared_within_the_ttl(clock):
+    activity = FakeActivity({HOUR: (1, 2)})
+    cache = new_cache(activity)
+    volume, _ = cache.get("sunana")
+    clock[0] += 29
+    assert cache.get("sunana")[0] is volume
+    assert activity.series_calls == [0]
+    clock[0] += 1
+    cache.get("sunana")
+    assert len(activity.series_calls) == 2
+
+
+def test_refresh_refetches_only_from_the_unsettled_hour(clock):
+    activity = FakeActivity({HOUR + i * 3600: (i, 1) for i in range(6)})
+    cache = new_cache(activity)
+    cache.get("sunana")
+    activity.rows[HOUR + 5 * 3600] = (50, 1)
+    activity.rows[HOUR + 6 * 3600] = (60, 1)
+    clock[0] += 3600
+
+    volume, gas = cache.get("sunana")
+    # The first fetch was at 05:02; with 10 minutes settle it refetches from 04:00
+    assert activity.series_calls == [0, HOUR + 4 * 3600]
+    assert volume.values.tolist() == [0, 1, 2, 3, 4, 50, 60]
+    assert gas.accumulated[-1] == 7
+
+
+def test_changed_history_triggers_a_full_refetch(clock):
+    activity = FakeActivity({HOUR + i * 3600: (i, 1) for i in range(6)})
+    cache = new_cache(activity)
+    cache.get("sunana")
+    # A late row lands in an hour the cache keeps
+    activity.rows[HOUR + 3600] = (100, 1)
+    clock[0] += 60
+
+    volume, _ = cache.get("sunana")
+    assert activity.series_calls == [0, 0]
+    assert volume.values.tolist() == [0, 100, 2, 3, 4, 5]
+
+
+def test_full_refetch_after_n_refreshes(clock):
+    activity = FakeActivity({HOUR: (1, 1)})
+    cache = new_cache(activity, full_refetch_every=2)
+    for _ in range(4):
+        cache.get("sunana")
+        clock[0] += 60
+    assert [min_hour == 0 for min_hour in activity.series_calls] == [True, False, False, True]
+
+
+def test_least_recently_used_tokens_are_dropped(clock):
+    cache = new_cache(FakeActivity({HOUR: (1, 1)}), max_tokens=2)
+    for token in ("a", "b", "a", "c"):
+        cache.get(token)
+    assert list(cache.entries) == ["a", "c"]
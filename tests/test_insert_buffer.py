@@ -0,0 +1,210 @@
+import asyncio
+import time
+import pytest
+from entities.report_bucket import ReportInvalidationRepo
+from entities.trc20_transfer import Trc20TransferRepo
+from tasks.insert_buffer import InsertBuffer, InsertBufferFull
+
+
+class FakeRepo:
+    """Trc20TransferRepo's batches, with inserts recorded (as row count and dedup token) instead of sent."""
+
+    TABLE = Trc20TransferRepo.TABLE
+    new_batch = Trc20TransferRepo.new_batch
+
+    def __init__(self):
+        self.failing = False
+        self.attempts: list[tuple[int, str]] = []
+
+    async def insert_columns(self, batch, insert_settings=None):
+        self.attempts.append((len(batch), batch.fingerprint(Trc20TransferRepo.DEDUP_KEY)))
+        if self.failing:
+            raise ConnectionError("clickhouse down")
+
+
+class FakeStore:
+    namespace = "wm"
+
+    def __init__(self):
+        self.staged: dict[str, int] = {}
+        self.advanced: list[dict[str, int]] = []
+
+    def stage(self, cursors):
+        self.staged.update(cursors)
+
+    async def advance(self, cursors):
+        self.advanced.append(dict(cursors))
+
+
+def batch_of(*tx_ids: str):
+    # Recent timestamps, so no report bucket invalidation is recorded
+    now_ms = int(time.time() * 1000)
+    batch = Trc20TransferRepo.new_batch()
+    for tx_id in tx_ids:
+        batch.append((tx_id, "T", now_ms, "K", "F", "T", "1"))
+    return batch
+
+
+def new_buffer(repo, max_rows: int = 100, max_age: float = 60.0, max_failed_rows: int = 1000) -> InsertBuffer:
+    return InsertBuffer(repo, max_rows=max_rows, max_bytes=1 << 30, max_age=max_age, max_failed_rows=max_failed_rows)
+
+
+def test_flushes_when_full_and_then_advances_watermarks():
+    async def run():
+        repo, store = FakeRepo(), FakeStore()
+        buffer = new_buffer(repo, max_rows=3)
+        await buffer.add(batch_of("a", "b"), store, {"acct": 1})
+        assert repo.attempts == [] and store.staged == {"acct": 1}
+        await buffer.add(batch_of("c"), store, {"acct": 2})
+        assert [rows for rows, _ in repo.attempts] == [3]
+        assert store.advanced == [{"acct": 2}]
+        assert len(buffer.batch) == 0
+    asyncio.run(run())
+
+
+def test_failed_batch_is_retried_unchanged_before_newer_rows():
+    async def run():
+        repo, store = FakeRepo(), FakeStore()
+        buffer = new_buffer(repo)
+        await buffer.add(batch_of("a", "b"), store, {"acct": 1})
+        repo.failing = True
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert store.advanced == []
+
+        await buffer.add(batch_of("c"), store, {"acct": 2})
+        repo.failing = False
+        await buffer.flush()
+
+        first_attempt, retry, newer = repo.attempts
+        # Same rows and dedup token as the first attempt, so ClickHouse can drop it if that one was stored
+        assert retry == first_attempt
+        assert newer[0] == 1
+        # Each batch's cursors advance once it is stored, oldest first
+        assert store.advanced == [{"acct": 1}, {"acct": 2}]
+        assert buffer.failed == []
+    asyncio.run(run())
+
+
+def test_newer_rows_wait_while_an_older_batch_keeps_failing():
+    async def run():
+        repo, store = FakeRepo(), FakeStore()
+        buffer = new_buffer(repo)
+        await buffer.add(batch_of("a"), store, {"acct": 1})
+        repo.failing = True
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        await buffer.add(batch_of("b"), store, {"acct": 2})
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        # The newer batch is frozen behind the older one, neither advanced
+        assert [len(batch) for batch, _ in buffer.failed] == [1, 1]
+        assert store.advanced == []
+    asyncio.run(run())
+
+
+def test_failed_batches_are_due_after_max_age():
+    async def run():
+        repo = FakeRepo()
+        buffer = new_buffer(repo, max_age=60.0)
+        await buffer.add(batch_of("a"))
+        repo.failing = True
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert not buffer.is_due()
+        buffer.failed_at -= 61
+        assert buffer.is_due()
+    asyncio.run(run())
+
+
+def test_invalidation_failure_does_not_requeue_stored_batches(monkeypatch):
+    calls = []
+
+    async def record_batch(batch):
+        calls.append("record")
+        raise ConnectionError("report_invalidation missing")
+
+    monkeypatch.setattr(ReportInvalidationRepo, "record_batch", record_batch)
+
+    async def run():
+        repo, store = FakeRepo(), FakeStore()
+        original_insert = repo.insert_columns
+
+        async def insert_columns(batch, insert_settings=None):
+            calls.append("insert")
+            await original_insert(batch, insert_settings)
+
+        repo.insert_columns = insert_columns
+        buffer = new_buffer(repo)
+        await buffer.add(batch_of("a"), store, {"acct": 1})
+        await buffer.flush()
+        await buffer.add(batch_of("b"), store, {"acct": 2})
+        await buffer.flush()
+
+        # Recorded before each insert (and again after), and each batch inserted once
+        assert calls == ["record", "insert", "record"] * 2
+        assert len(repo.attempts) == 2
+        assert buffer.failed == []
+        assert store.advanced == [{"acct": 1}, {"acct": 2}]
+    asyncio.run(run())
+
+
+def test_full_buffer_refuses_rows_until_the_backlog_drains():
+    async def run():
+        repo, store = FakeRepo(), FakeStore()
+        buffer = new_buffer(repo, max_failed_rows=2)
+        await buffer.add(batch_of("a", "b"), store, {"acct": 1})
+        repo.failing = True
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+
+        # Refused before anything is taken or staged, so the crawler fetches the rows again later
+        with pytest.raises(InsertBufferFull):
+            await buffer.add(batch_of("c"), store, {"acct": 2})
+        assert len(buffer.batch) == 0 and store.staged == {"acct": 1}
+
+        # Once due, the backlog is retried first; rows are taken again when it drains
+        buffer.failed_at -= 61
+        repo.failing = False
+        await buffer.add(batch_of("c"), store, {"acct": 2})
+        assert buffer.failed == [] and len(buffer.batch) == 1
+        assert store.advanced == [{"acct": 1}]
+    asyncio.run(run())
+
+
+def test_full_buffer_stops_freezing_new_batches():
+    async def run():
+        repo = FakeRepo()
+        buffer = new_buffer(repo, max_failed_rows=2)
+        await buffer.add(batch_of("a"))
+        repo.failing = True
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        await buffer.add(batch_of("b"))
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert buffer.failed_rows() == 2
+
+        # Rows already in the current batch when the backlog filled up stay there
+        buffer.batch.extend(batch_of("c"))
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        assert buffer.failed_rows() == 2 and len(buffer.batch) == 1
+
+        # Draining the backlog stores the waiting batch in the same flush
+        repo.failing = False
+        await buffer.flush()
+        assert buffer.failed == [] and len(buffer.batch) == 0
+        assert [rows for rows, _ in repo.attempts[-3:]] == [1, 1, 1]
+    asyncio.run(run())
+
+
+def test_failed_flush_in_add_keeps_the_rows():
+    async def run():
+        repo, store = FakeRepo(), FakeStore()
+        repo.failing = True
+        buffer = new_buffer(repo, max_rows=1)
+        await buffer.add(batch_of("a"), store, {"acct": 1})
+        assert [len(batch) for batch, _ in buffer.failed] == [1]
+        assert store.staged == {"acct": 1} and store.advanced == []
+    asyncio.run(run())
@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from clickhouse import ClickHouseClientManager
+
+
+class FakeContext:
+    def __init__(self, table):
+        self.table = table
+        self.settings = {}
+        self.data = None
+
+
+class FakeClient:
+    """Prepares insert contexts and fails inserts on demand, like a table rebuilt with new column types."""
+
+    def __init__(self):
+        self.prepared: list[str] = []
+        self.inserted: list[tuple[str, dict]] = []
+        self.failing = False
+
+    async def create_insert_context(self, table, column_names, column_oriented, settings):
+        self.prepared.append(table)
+        return FakeContext(table)
+
+    async def insert(self, context):
+        if self.failing:
+            raise ValueError("column types changed")
+        self.inserted.append((context.table, dict(context.settings)))
+
+
+def test_contexts_are_reused_until_an_insert_fails():
+    async def run():
+        manager, client = ClickHouseClientManager(pool_size=1, health_check_interval=30), FakeClient()
+        await manager.insert_columns(client, "swap", ["a"], [[1]], dedup_token="t1")
+        await manager.insert_columns(client, "swap", ["a"], [[1]])
+        assert client.prepared == ["swap"]
+        assert client.inserted[0][1]["insert_deduplication_token"] == "t1"
+        assert "insert_deduplication_token" not in client.inserted[1][1]
+
+        client.failing = True
+        with pytest.raises(ValueError):
+            await manager.insert_columns(client, "swap", ["a"], [[1]])
+        client.failing = False
+        await manager.insert_columns(client, "swap", ["a"], [[1]])
+        assert client.prepared == ["swap", "swap"]
+    asyncio.run(run())
+
+
+def test_clear_insert_contexts_only_forgets_that_table():
+    async def run():
+        manager, client = ClickHouseClientManager(pool_size=1, health_check_interval=30), FakeClient()
+        await manager.insert_columns(client, "swap", ["a"], [[1]])
+        await manager.insert_columns(client, "from_transaction", ["a"], [[1]])
+        manager.clear_insert_contexts("swap")
+        await manager.insert_columns(client, "swap", ["a"], [[1]])
+        await manager.insert_columns(client, "from_transaction", ["a"], [[1]])
+        assert client.prepared == ["swap", "from_transaction", "swap"]
+    asyncio.run(run())
@@ -0,0 +1,184 @@
+import copy
+from adapter.utils import TronUtils
+from conftest import load_fixture
+from entities.from_transaction import FromTransactionRepo
+from entities.to_transaction import ToTransactionRepo
+from entities.trc20_transfer import Trc20TransferRepo
+from entities.types import NormalTransactionType
+from tasks.page_parser import FROM_INDEX, TO_INDEX, TX_ID_INDEX, parse_account_tx_page, parse_trc20_page
+
+ACCOUNT = "TNKfn6wmBoX3hq3HDxNDUcWhbkK5ZHJWrP"
+
+
+# The per-row parsers the crawlers ran before page parsing, as the reference for the page parsers
+def reference_from_row(account: str, raw_tx) -> tuple | None:
+    contract = raw_tx["raw_data"]["contract"][0]
+    if contract["type"] == NormalTransactionType.TRANSFER_ASSET_CONTRACT:
+        return None
+    value = contract["parameter"]["value"]
+    return (
+        raw_tx["ret"][0]["contractRet"],
+        raw_tx["txID"],
+        "",
+        raw_tx["ret"][0]["fee"],
+        value.get("amount") or value.get("call_value") or 0,
+        raw_tx["blockNumber"],
+        raw_tx["block_timestamp"],
+        account,
+        TronUtils.from_hex_address(value.get("to_address") or value.get("contract_address")),
+        NormalTransactionType(contract["type"]).value,
+    )
+
+
+def reference_to_row(account: str, raw_tx) -> tuple | None:
+    if raw_tx.get("raw_data"):
+        contract = raw_tx["raw_data"]["contract"][0]
+        if contract["type"] == NormalTransactionType.TRANSFER_ASSET_CONTRACT:
+            return None
+        value = contract["parameter"]["value"]
+        return (
+            raw_tx["ret"][0]["contractRet"],
+            raw_tx["txID"],
+            raw_tx.get("internal_tx_id") or "",
+            raw_tx["ret"][0]["fee"],
+            value["balance"] if contract["type"] == NormalTransactionType.UNDELEGATE_RESOURCE_CONTRACT else value.get("amount", 0),
+            raw_tx["blockNumber"],
+            raw_tx["block_timestamp"],
+            TronUtils.from_hex_address(value.get("owner_address") or value.get("contract_address")),
+            account,
+            NormalTransactionType(contract["type"]).value,
+        )
+    data = raw_tx["data"]
+    return (
+        "REJECTED" if data.get("rejected") else "SUCCESS",
+        raw_tx["tx_id"],
+        raw_tx.get("internal_tx_id") or "",
+        0,
+        data["call_value"]["_"],
+        0,
+        raw_tx["block_timestamp"],
+        TronUtils.from_hex_address(raw_tx["from_address"]),
+        account,
+        NormalTransactionType.INTERNAL.value,
+    )
+
+
+def reference_trc20_row(account: str, raw_tx) -> tuple | None:
+    if raw_tx.get("type") != "Transfer":
+        return None
+    return (
+        raw_tx["transaction_id"], raw_tx["token_info"]["address"], raw_tx["block_timestamp"],
+        account, raw_tx["from"], raw_tx["to"], raw_tx["value"],
+    )
+
+
+def reference_page(parse_row, repo, account: str, raw_txs: list, min_ts: int) -> tuple[list[tuple], int]:
+    timestamp_index = repo.COLUMNS.index("block_timestamp")
+    rows, errors = [], 0
+    for raw_tx in raw_txs:
+        try:
+            row = parse_row(account, raw_tx)
+        except Exception:
+            errors += 1
+            continue
+        if row is not None and row[timestamp_index] >= min_ts:
+            rows.append(row)
+    return rows, errors
+
+
+def rows_of(batch) -> list[tuple]:
+    return list(zip(*batch.data()))
+
+
+def normal_page() -> list:
+    """The example transactions with distinct ids and timestamps, several times over."""
+    fixtures = [load_fixture(name) for name in ("example-1.json", "example-odd.json", "example-transfer-to.json")]
+    page = []
+    for i in range(30):
+        raw_tx = copy.deepcopy(fixtures[i % len(fixtures)])
+        raw_tx["txID"] = f"{i:064x}"
+        raw_tx["block_timestamp"] = 1_742_700_000_000 + i * 3000
+        page.append(raw_tx)
+    return page
+
+
+def internal_tx(i: int, rejected: bool = False) -> dict:
+    return {
+        "tx_id": f"{i:064x}",
+        "internal_tx_id": f"{i + 1:064x}",
+        "block_timestamp": 1_742_700_000_000 + i * 3000,
+        "from_address": "4158611af616412a105158432a8a05aa3933ec4a17",
+        "to_address": "41c72b130458ff32725ca48a5caa843abf1c3155cb",
+        "data": {"call_value": {"_": 1_000_000 + i}, "rejected": rejected},
+    }
+
+
+def test_from_page_matches_per_row_parser():
+    page = normal_page()
+    parsed = parse_account_tx_page(FromTransactionRepo.new_batch(), ACCOUNT, page, incoming=False)
+    expected, _ = reference_page(reference_from_row, FromTransactionRepo, ACCOUNT, page, 0)
+    assert rows_of(parsed.batch) == expected
+    assert parsed.errors == []
+
+
+def test_to_page_matches_per_row_parser_with_internal_transactions():
+    page = normal_page() + [internal_tx(100), internal_tx(102, rejected=True)]
+    parsed = parse_account_tx_page(ToTransactionRepo.new_batch(), ACCOUNT, page, incoming=True)
+    expected, _ = reference_page(reference_to_row, ToTransactionRepo, ACCOUNT, page, 0)
+    assert rows_of(parsed.batch) == expected
+    assert [row[0] for row in rows_of(parsed.batch)[-2:]] == ["SUCCESS", "REJECTED"]
+
+
+def test_trc20_page_matches_per_row_parser():
+    page = load_fixture("example-trc20.json")
+    parsed = parse_trc20_page(Trc20TransferRepo.new_batch(), ACCOUNT, page)
+    expected, _ = reference_page(reference_trc20_row, Trc20TransferRepo, ACCOUNT, page, 0)
+    assert rows_of(parsed.batch) == expected
+    # Approvals are skipped, not errors
+    assert len(parsed.batch) == sum(raw_tx["type"] == "Transfer" for raw_tx in page)
+    assert parsed.errors == []
+
+
+def test_min_ts_is_inclusive():
+    page = normal_page()
+    min_ts = page[10]["block_timestamp"]
+    parsed = parse_account_tx_page(FromTransactionRepo.new_batch(), ACCOUNT, page, incoming=False, min_ts=min_ts)
+    expected, _ = reference_page(reference_from_row, FromTransactionRepo, ACCOUNT, page, min_ts)
+    assert rows_of(parsed.batch) == expected
+    assert rows_of(parsed.batch)[0][TX_ID_INDEX] == page[10]["txID"]
+
+    trc20 = load_fixture("example-trc20.json")
+    min_ts = sorted(raw_tx["block_timestamp"] for raw_tx in trc20)[100]
+    parsed = parse_trc20_page(Trc20TransferRepo.new_batch(), ACCOUNT, trc20, min_ts=min_ts)
+    assert rows_of(parsed.batch) == reference_page(reference_trc20_row, Trc20TransferRepo, ACCOUNT, trc20, min_ts)[0]
+
+
+def test_bad_rows_are_collected_and_the_rest_kept():
+    page = normal_page()
+    # Lacks the fee and block fields of a crawled transaction
+    page.insert(3, load_fixture("example.json"))
+    bad_address = copy.deepcopy(page[0])
+    bad_address["txID"] = "bad-address"
+    bad_address["raw_data"]["contract"][0]["parameter"]["value"]["to_address"] = "41zz"
+    page.append(bad_address)
+
+    parsed = parse_account_tx_page(FromTransactionRepo.new_batch(), ACCOUNT, page, incoming=False)
+    expected, errors = reference_page(reference_from_row, FromTransactionRepo, ACCOUNT, page, 0)
+    assert rows_of(parsed.batch) == expected
+    assert len(parsed.errors) == errors == 2
+    assert {error.tx_id for error in parsed.errors} == {load_fixture("example.json")["txID"], "bad-address"}
+
+
+def test_transfer_asset_is_skipped():
+    page = normal_page()[:2]
+    page[0]["raw_data"]["contract"][0]["type"] = NormalTransactionType.TRANSFER_ASSET_CONTRACT.value
+    parsed = parse_account_tx_page(FromTransactionRepo.new_batch(), ACCOUNT, page, incoming=False)
+    assert [row[TX_ID_INDEX] for row in rows_of(parsed.batch)] == [page[1]["txID"]]
+    assert parsed.errors == []
+
+
+def test_counterparty_indices_follow_columns():
+    for repo in (FromTransactionRepo, ToTransactionRepo):
+        assert repo.COLUMNS[FROM_INDEX] == "from"
+        assert repo.COLUMNS[TO_INDEX] == "to"
+        assert repo.COLUMNS[TX_ID_INDEX] == "tx_id"
@@ -0,0 +1,85 @@
+import re
+import pytest
+from entities.report_bucket import valid_prefix
+from report_engine import DAY_MS, HOUR_MS, TABLE_PASSES, cumulative_series, series_bucket_ms
+
+DAY = 1_742_688_000_000  # A UTC midnight
+
+
+def bucket_of(ts: int, bucket_ms: int) -> int:
+    """The bucket key of a row at `ts`, by evaluating the expression the compiled query groups by."""
+    query = TABLE_PASSES[0].compile(bucket_ms)
+    expression = re.search(r"^\s*(.+) AS bucket,$", query, re.MULTILINE).group(1)
+    # intDiv is integer division; the operands are non-negative
+    python = re.sub(r"intDiv\(([^,]+), ([^)]+)\)", r"((\1) // (\2))", expression)
+    return eval(python, {"block_timestamp": ts})
+
+
+def test_bucket_size_follows_the_cutoffs():
+    assert series_bucket_ms(DAY, DAY + 7 * DAY_MS, DAY_MS) == DAY_MS
+    # Daily steps starting mid-day still need hourly buckets
+    assert series_bucket_ms(DAY + HOUR_MS, DAY + HOUR_MS + 2 * DAY_MS, DAY_MS) == HOUR_MS
+    assert series_bucket_ms(DAY, DAY + 6 * HOUR_MS, 3 * HOUR_MS) == HOUR_MS
+
+
+@pytest.mark.parametrize("start, end, step", [
+    (DAY, DAY + DAY_MS, 0),
+    (DAY, DAY + DAY_MS, HOUR_MS // 2),
+    (DAY + 1, DAY + 1 + DAY_MS, DAY_MS),
+    (DAY, DAY + DAY_MS + HOUR_MS, DAY_MS),
+])
+def test_misaligned_series_are_rejected(start, end, step):
+    with pytest.raises(ValueError):
+        series_bucket_ms(start, end, step)
+
+
+def test_bucketed_query_keys_rows_by_bucket_end():
+    for table_pass in TABLE_PASSES:
+        query = table_pass.compile(HOUR_MS)
+        assert f"intDiv(block_timestamp + {HOUR_MS - 1}, {HOUR_MS}) * {HOUR_MS} AS bucket" in query
+        assert "block_timestamp > %(min_timestamp)s" in query
+        assert "GROUP BY bucket" in query
+        assert "bucket" not in table_pass.compile()
+
+
+def test_bucket_ends_are_inclusive():
+    # A row exactly on a cutoff counts towards it, one ms later towards the next
+    for start, end, step in [(DAY, DAY + 6 * HOUR_MS, HOUR_MS), (DAY, DAY + 7 * DAY_MS, DAY_MS)]:
+        bucket_ms = series_bucket_ms(start, end, step)
+        assert bucket_of(DAY, bucket_ms) == DAY
+        assert bucket_of(DAY + 1, bucket_ms) == DAY + bucket_ms
+        assert bucket_of(DAY + bucket_ms - 1, bucket_ms) == DAY + bucket_ms
+        assert bucket_of(DAY + bucket_ms, bucket_ms) == DAY + bucket_ms
+        assert bucket_of(DAY - 1, bucket_ms) == DAY
+
+
+def test_cumulative_series_matches_per_cutoff_sums():
+    rows = [(DAY - 5, 1), (DAY, 2), (DAY + 1, 4), (DAY + 3 * HOUR_MS, 8), (DAY + 3 * HOUR_MS + 1, 16)]
+    buckets: dict[int, dict] = {}
+    for ts, value in rows:
+        metrics = buckets.setdefault(bucket_of(ts, HOUR_MS), {"total": 0})
+        metrics["total"] += value
+
+    cutoffs = list(range(DAY, DAY + 4 * HOUR_MS + 1, 2 * HOUR_MS))
+    series = cumulative_series(buckets, cutoffs, ["total", "other"])
+    # The same as running the unbucketed report at every cutoff
+    assert series["total"] == [sum(value for ts, value in rows if ts <= cutoff) for cutoff in cutoffs] == [3, 7, 31]
+    assert series["other"] == [0, 0, 0]
+
+
+def test_valid_prefix_stops_at_the_first_invalidated_bucket():
+    buckets = {DAY + i * HOUR_MS: {"total": i} for i in range(4)}
+    computed_at = dict.fromkeys(buckets, 1_000)
+    # A late row at DAY + 90 minutes falls in the bucket ending DAY + 2h
+    assert valid_prefix(buckets, computed_at, [(DAY + 90 * 60_000, 1_000)]) == {
+        DAY: {"total": 0}, DAY + HOUR_MS: {"total": 1},
+    }
+
+
+def test_invalidations_before_the_scan_are_ignored():
+    buckets = {DAY: {"total": 1}, DAY + HOUR_MS: {"total": 2}}
+    computed_at = {DAY: 5_000, DAY + HOUR_MS: 9_000}
+    # Recorded after the first bucket's scan but before the second's, which already counted the row
+    assert valid_prefix(buckets, computed_at, [(DAY, 7_000)]) == {}
+    assert valid_prefix(buckets, computed_at, [(DAY + 1, 7_000)]) == buckets
+    assert valid_prefix(buckets, computed_at, []) == buckets
@@ -0,0 +1,166 @@
+import asyncio
+import time
+from email.utils import format_datetime
+from datetime import datetime, timezone
+import httpx
+import pytest
+from pydantic import ValidationError
+from adapter.resilience import CircuitBreaker, CircuitOpenError, RetryPolicy, TronGridHTTPError
+from adapter.tron_grid_client import TronGridClient
+from settings import TronGridConfig
+
+
+def test_backoff_stays_within_the_jittered_bound():
+    policy = RetryPolicy(base_delay=0.5, max_delay=3.0)
+    for attempt, bound in [(0, 0.5), (1, 1.0), (2, 2.0), (3, 3.0), (10, 3.0)]:
+        delays = [policy.backoff(attempt) for _ in range(200)]
+        assert all(0 <= delay <= bound for delay in delays)
+
+
+def test_backoff_honors_retry_after_seconds_and_dates(monkeypatch):
+    policy = RetryPolicy(max_delay=10.0)
+    assert policy.backoff(0, "2") == 2.0
+    assert policy.backoff(0, "60") == 10.0
+    assert policy.backoff(0, "-5") == 0.0
+
+    now = 1_700_000_000.0
+    monkeypatch.setattr(time, "time", lambda: now)
+    in_three_seconds = format_datetime(datetime.fromtimestamp(now + 3, timezone.utc), usegmt=True)
+    assert policy.backoff(0, in_three_seconds) == pytest.approx(3.0)
+    in_the_past = format_datetime(datetime.fromtimestamp(now - 30, timezone.utc), usegmt=True)
+    assert policy.backoff(0, in_the_past) == 0.0
+
+    # Unparseable values fall back to jittered backoff
+    assert 0 <= policy.backoff(0, "soon") <= policy.base_delay
+
+
+def test_retry_policy_needs_an_attempt(monkeypatch):
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=0)
+    monkeypatch.setenv("TRONGRID_MAX_ATTEMPTS", "0")
+    with pytest.raises(ValidationError):
+        TronGridConfig()
+
+
+def test_retry_statuses():
+    policy = RetryPolicy()
+    assert all(policy.should_retry(status) for status in (429, 500, 502, 503, 504))
+    assert not any(policy.should_retry(status) for status in (400, 404, 501))
+
+
+@pytest.fixture
+def monotonic(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_breaker_opens_after_consecutive_failures(monotonic):
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30.0)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_opens_for_one_probe(monotonic):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30.0)
+    breaker.record_failure()
+    monotonic[0] += 29
+    assert not breaker.allow()
+    monotonic[0] += 1
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    # The probe is in flight, everyone else still fails fast
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+
+def test_failed_probe_reopens_the_breaker(monotonic):
+    breaker = CircuitBreaker(failure_threshold=5, reset_timeout=30.0)
+    for _ in range(5):
+        breaker.record_failure()
+    monotonic[0] += 30
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    monotonic[0] += 30
+    assert breaker.allow()
+
+
+def client_with_responses(monkeypatch, responses: list) -> tuple[TronGridClient, list]:
+    """A TronGridClient whose only member answers from `responses` in order, recording each request."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    async def no_sleep(delay):
+        pass
+
+    monkeypatch.setattr("adapter.tron_grid_client.asyncio.sleep", no_sleep)
+    client = TronGridClient()
+    client.pool.members = client.pool.members[:1]
+    member = client.pool.members[0]
+    mock_client = httpx.AsyncClient(base_url=member.base_url, transport=httpx.MockTransport(handler))
+
+    async def get_client():
+        return mock_client
+
+    member._get_client = get_client
+    return client, requests
+
+
+def test_request_retries_throttled_and_failed_responses(monkeypatch):
+    client, requests = client_with_responses(monkeypatch, [
+        httpx.Response(429, headers={"Retry-After": "1"}),
+        httpx.ConnectError("reset"),
+        httpx.Response(503),
+        httpx.Response(200, json={"data": [{"balance": 5}]}),
+    ])
+    assert asyncio.run(client.account_info("TAddress")) == [{"balance": 5}]
+    assert len(requests) == 4
+    assert client.pool.members[0].circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_request_does_not_retry_client_errors(monkeypatch):
+    client, requests = client_with_responses(monkeypatch, [httpx.Response(404)])
+    with pytest.raises(TronGridHTTPError) as error:
+        asyncio.run(client.account_info("TAddress"))
+    assert error.value.status_code == 404
+    assert len(requests) == 1
+
+
+def test_request_fails_fast_once_the_breaker_opens(monkeypatch):
+    client, requests = client_with_responses(monkeypatch, [httpx.Response(500)] * 4)
+    breaker = client.pool.members[0].circuit_breaker
+    breaker.failure_threshold = 2
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.account_info("TAddress"))
+    assert len(requests) == 2
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_collect_pages_stops_at_max_rows(monkeypatch):
+    page = lambda first, next_link: httpx.Response(200, json={
+        "data": [{"n": n} for n in range(first, first + 3)],
+        "meta": {"links": {"next": next_link}} if next_link else {},
+    })
+    client, requests = client_with_responses(monkeypatch, [
+        page(0, "https://api.trongrid.io/v1/page?fingerprint=2"), page(3, "https://api.trongrid.io/v1/page?fingerprint=3"),
+    ])
+    rows = asyncio.run(client.collect_pages("/v1/page", max_rows=5))
+    assert [row["n"] for row in rows] == [0, 1, 2, 3, 4]
+    assert str(requests[1].url).endswith("/v1/page?fingerprint=2")
@@ -0,0 +1,116 @@
+import asyncio
+import threading
+import time
+import pytest
+from adapter.response_cache import ResponseCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable time.time() for the cache's expiry checks."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_memory_hit_and_miss_counters():
+    async def run():
+        cache = ResponseCache({"tx": None})
+        assert await cache.get("tx", "a") is None
+        await cache.set("tx", "a", {"fee": 1})
+        assert await cache.get("tx", "a") == {"fee": 1}
+        assert cache.stats() == {"tx": {"memory_hits": 1, "disk_hits": 0, "misses": 1, "hit_ratio": 0.5}}
+    asyncio.run(run())
+
+
+def test_entries_expire_after_their_namespace_ttl(clock):
+    async def run():
+        cache = ResponseCache({"short": 10, "forever": None})
+        await cache.set("short", "a", 1)
+        await cache.set("forever", "a", 2)
+        clock[0] += 9
+        assert await cache.get("short", "a") == 1
+        clock[0] += 1
+        assert await cache.get("short", "a") is None
+        assert ("short", "a") not in cache.memory
+        clock[0] += 10 ** 9
+        assert await cache.get("forever", "a") == 2
+    asyncio.run(run())
+
+
+def test_memory_tier_evicts_least_recently_used():
+    async def run():
+        cache = ResponseCache({"tx": None}, max_entries=2)
+        await cache.set("tx", "a", 1)
+        await cache.set("tx", "b", 2)
+        # Reading "a" makes "b" the oldest
+        await cache.get("tx", "a")
+        await cache.set("tx", "c", 3)
+        assert list(cache.memory) == [("tx", "a"), ("tx", "c")]
+        assert await cache.get("tx", "b") is None
+    asyncio.run(run())
+
+
+def test_disk_tier_survives_restart_and_refills_memory(tmp_path):
+    path = tmp_path / "cache" / "responses.sqlite"
+
+    async def run():
+        cache = ResponseCache({"tx": None}, path=path)
+        await cache.set("tx", "a", {"fee": 1})
+        cache.close()
+
+        reopened = ResponseCache({"tx": None}, path=path)
+        assert await reopened.get("tx", "a") == {"fee": 1}
+        assert await reopened.get("tx", "a") == {"fee": 1}
+        counters = reopened.stats()["tx"]
+        assert (counters["disk_hits"], counters["memory_hits"]) == (1, 1)
+        reopened.close()
+    asyncio.run(run())
+
+
+def test_evicted_entries_are_still_found_on_disk(tmp_path):
+    async def run():
+        cache = ResponseCache({"tx": None}, path=tmp_path / "responses.sqlite", max_entries=1)
+        await cache.set("tx", "a", 1)
+        await cache.set("tx", "b", 2)
+        assert ("tx", "a") not in cache.memory
+        assert await cache.get("tx", "a") == 1
+        assert cache.stats()["tx"]["disk_hits"] == 1
+        cache.close()
+    asyncio.run(run())
+
+
+def test_expired_disk_entries_are_dropped(tmp_path, clock):
+    async def run():
+        cache = ResponseCache({"tx": 10}, path=tmp_path / "responses.sqlite")
+        await cache.set("tx", "a", 1)
+        await cache.set("tx", "b", 2)
+        cache.memory.clear()
+        clock[0] += 10
+        assert await cache.get("tx", "a") is None
+        cache.prune()
+        assert cache.db.execute("SELECT COUNT(*) FROM response_cache").fetchone() == (0,)
+        cache.close()
+    asyncio.run(run())
+
+
+def test_disk_tier_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = ResponseCache({"tx": None}, path=tmp_path / "responses.sqlite")
+    threads = []
+    for name in ("_read", "_write"):
+        method = getattr(cache, name)
+
+        def record(*args, method=method):
+            threads.append(threading.current_thread())
+            return method(*args)
+
+        monkeypatch.setattr(cache, name, record)
+
+    async def run():
+        await cache.set("tx", "a", 1)
+        cache.memory.clear()
+        assert await cache.get("tx", "a") == 1
+    asyncio.run(run())
+    assert len(threads) == 2
+    assert threading.main_thread() not in threads
+    cache.close()
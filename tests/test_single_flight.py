@@ -0,0 +1,96 @@
+import asyncio
+from adapter.single_flight import SingleFlight, coalesced
+
+
+def test_concurrent_calls_share_one_result():
+    async def run():
+        flight, calls = SingleFlight(), []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return "value"
+
+        waiters = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        assert await asyncio.gather(*waiters) == ["value"] * 3
+        assert len(calls) == 1
+        assert flight.deduplicated == 2
+        assert flight.in_flight == {}
+    asyncio.run(run())
+
+
+def test_different_keys_and_later_calls_run_separately():
+    async def run():
+        flight, calls = SingleFlight(), []
+
+        async def fetch(key):
+            calls.append(key)
+            return key
+
+        assert await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b"))) == ["a", "b"]
+        # Nothing is cached once the call completes
+        await flight.do("a", lambda: fetch("a"))
+        assert calls == ["a", "b", "a"]
+        assert flight.deduplicated == 0
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "value"
+
+        first = asyncio.ensure_future(flight.do("key", fetch))
+        second = asyncio.ensure_future(flight.do("key", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await second == "value"
+        assert first.cancelled()
+    asyncio.run(run())
+
+
+def test_exception_reaches_every_waiter():
+    async def run():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise ValueError("bad response")
+
+        waiters = [asyncio.ensure_future(flight.do("key", fetch)) for _ in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.in_flight == {}
+    asyncio.run(run())
+
+
+def test_coalesced_keys_by_method_and_arguments():
+    class Client:
+        def __init__(self):
+            self.single_flight = SingleFlight()
+            self.calls = []
+
+        @coalesced
+        async def get(self, address):
+            self.calls.append(address)
+            await asyncio.sleep(0)
+            return address.upper()
+
+    async def run():
+        client = Client()
+        assert await asyncio.gather(client.get("a"), client.get("a"), client.get("b")) == ["A", "A", "B"]
+        assert client.calls == ["a", "b"]
+        assert client.single_flight.deduplicated == 1
+    asyncio.run(run())
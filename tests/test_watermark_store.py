@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+import tasks.watermark_store
+from tasks.watermark_store import WatermarkStore
+
+
+class FakeRedis:
+    """The two commands WatermarkStore sends, with ADVANCE_SCRIPT's semantics."""
+
+    def __init__(self, values: dict | None = None, fail: bool = False):
+        self.values = dict(values or {})
+        self.fail = fail
+
+    async def mget(self, keys):
+        if self.fail:
+            raise ConnectionError("redis down")
+        return [self.values.get(key) for key in keys]
+
+    async def eval(self, script, key_count, *args):
+        if self.fail:
+            raise ConnectionError("redis down")
+        assert script == tasks.watermark_store.ADVANCE_SCRIPT
+        keys, values = args[:key_count], args[key_count:]
+        for key, value in zip(keys, values):
+            if key not in self.values or int(value) > int(self.values[key]):
+                self.values[key] = str(value)
+        return key_count
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(tasks.watermark_store, "get_async_redis_client", lambda: fake)
+    return fake
+
+
+def store_with_db(db: dict[str, int], calls: list) -> WatermarkStore:
+    async def load_from_db(accounts):
+        calls.append(list(accounts))
+        return {account: db[account] for account in accounts if account in db}
+
+    return WatermarkStore("wm", load_from_db)
+
+
+def test_load_reads_redis_and_rebuilds_missing_from_db(redis):
+    redis.values = {"wm:a": "100"}
+    calls = []
+    store = store_with_db({"b": 200}, calls)
+
+    assert asyncio.run(store.load(["a", "b", "c"])) == {"a": 100, "b": 200, "c": 0}
+    # One grouped query for the accounts Redis didn't have, written back for next time
+    assert calls == [["b", "c"]]
+    assert redis.values == {"wm:a": "100", "wm:b": "200", "wm:c": "0"}
+
+
+def test_load_falls_back_to_db_when_redis_is_down(redis):
+    redis.fail = True
+    calls = []
+    store = store_with_db({"a": 5}, calls)
+    assert asyncio.run(store.load(["a", "b"])) == {"a": 5, "b": 0}
+    assert calls == [["a", "b"]]
+
+
+def test_advance_never_moves_back(redis):
+    store = store_with_db({}, [])
+    asyncio.run(store.advance({"a": 10}))
+    asyncio.run(store.advance({"a": 5}))
+    assert redis.values == {"wm:a": "10"}
+
+
+def test_staged_cursors_count_until_advanced(redis):
+    redis.values = {"wm:a": "100", "wm:b": "100"}
+    store = store_with_db({}, [])
+    store.stage({"a": 150})
+    assert asyncio.run(store.load(["a", "b"])) == {"a": 150, "b": 100}
+
+    # Advancing to or past the staged cursor clears it; Redis then has the value
+    asyncio.run(store.advance({"a": 150}))
+    assert store.staged == {}
+    assert asyncio.run(store.load(["a"])) == {"a": 150}
+
+
+def test_advance_keeps_later_staged_cursors(redis):
+    store = store_with_db({}, [])
+    store.stage({"a": 200})
+    asyncio.run(store.advance({"a": 150}))
+    assert store.staged == {"a": 200}
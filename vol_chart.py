@@ -1,10 +1,13 @@
-import datetime
 import dash
+import numpy as np
 from dash import dcc, html
 from dash.dependencies import Input, Output
 import plotly.graph_objs as go
 from clickhouse import get_sync_ch_client
 from consts import token_configs, ROUTER_ADDRESS
+from entities.address_columns import address_param, address_set_param, bind_address, bind_addresses
+from hourly_series import HourlySeries, HourlySeriesCache, align_series
+from settings import settings
 from tracked_accounts import tracked_accounts
 from plotly.subplots import make_subplots
 
@@ -13,85 +16,77 @@ app = dash.Dash(__name__)
 
 accounts = tracked_accounts
 
-# Function to fetch hourly data from ClickHouse
+# Function to fetch hourly data from ClickHouse as NumPy arrays of (hours, values)
 def fetch_hourly_data(query, params=None):
     client = get_sync_ch_client()
-    result = client.query(query, parameters=params or {})
-    return result.result_rows  # Returns list of (hour, value)
+    rows = client.query_np(query, parameters=params or {})
+    if len(rows) == 0:
+        return np.empty(0, dtype="datetime64[s]"), np.empty(0, dtype=np.float64)
+    return rows["hour"].astype("datetime64[s]"), rows["value"].astype(np.float64)
 
-# Main function that handles data processing
-def get_data(token: str, max_timestamp: int):
+# Fetches hourly volume and gas (scaled by 1e6) from `min_hour` (unix seconds) onwards
+def fetch_hourly_series(token: str, min_hour: int):
     token_config = token_configs[token]
 
-    # Fetch hourly volume data
+    # Fetch hourly volume data: TRX sent to and received from the router, from the hourly aggregates
     hourly_volume = fetch_hourly_data(
-        """
-        SELECT toStartOfHour(toDateTime64(block_timestamp / 1000, 3)) AS hour, SUM(value) AS volume
-        FROM (
-            SELECT block_timestamp, MAX(value) as value
-            FROM from_transaction
-            WHERE `from` IN %(addresses)s AND `to` = %(router_address)s
-            AND block_timestamp <= %(max_timestamp)s
-            AND status = 'SUCCESS'
-            GROUP BY block_timestamp
-            UNION ALL
-            SELECT block_timestamp, MAX(value) as value
-            FROM to_transaction
-            WHERE `from` = %(router_address)s AND `to` IN %(addresses)s
-            AND block_timestamp <= %(max_timestamp)s
-            AND status = 'SUCCESS'
-            GROUP BY block_timestamp
-        )
+        f"""
+        SELECT hour, SUM(volume) / 1e6 AS value
+        FROM hourly_activity
+        WHERE counterparty = {address_param('router_address')} AND account IN {address_set_param('addresses')}
+        AND hour >= toDateTime(%(min_hour)s)
         GROUP BY hour
         ORDER BY hour
-        """, {"addresses": accounts, "router_address": ROUTER_ADDRESS, "max_timestamp": max_timestamp}
+        """, {"addresses": bind_addresses(accounts), "router_address": bind_address(ROUTER_ADDRESS), "min_hour": min_hour}
     )
 
-    # Scale and accumulate volume data (scaled by 1e6 for each record)
-    hourly_volume = [(hour, volume / 1e6) for hour, volume in hourly_volume]
-    accumulated_volume = []
-    total_volume = 0
-    for hour, volume in hourly_volume:
-        total_volume += volume
-        accumulated_volume.append((hour, total_volume))
-
-    # Fetch hourly gas data
+    # Fetch hourly gas data: fees paid by the tracked accounts
     hourly_gas = fetch_hourly_data(
-        """
-        SELECT toStartOfHour(toDateTime64(block_timestamp / 1000, 3)) AS hour, SUM(total_fee) AS gas_used
-        FROM (
-            SELECT block_timestamp, MAX(total_fee) as total_fee
-            FROM from_transaction
-            WHERE `from` IN %(addresses)s
-            AND block_timestamp <= %(max_timestamp)s
-            GROUP BY block_timestamp
-        )
+        f"""
+        SELECT hour, SUM(fee) / 1e6 AS value
+        FROM hourly_activity
+        WHERE account IN {address_set_param('addresses')} AND direction = 'out'
+        AND hour >= toDateTime(%(min_hour)s)
         GROUP BY hour
         ORDER BY hour
-        """, {"addresses": accounts, "max_timestamp": max_timestamp}
+        """, {"addresses": bind_addresses(accounts), "min_hour": min_hour}
     )
 
-    # Scale and accumulate gas data (scaled by 1e6 for each record)
-    hourly_gas = [(hour, gas / 1e6) for hour, gas in hourly_gas]
-    accumulated_gas = []
-    total_gas = 0
-    for hour, gas in hourly_gas:
-        total_gas += gas
-        accumulated_gas.append((hour, total_gas))
+    return hourly_volume, hourly_gas
 
-    return hourly_volume, accumulated_volume, hourly_gas, accumulated_gas
-
-
-# Cache to store previously fetched data
-cache = {}
+# Volume and gas summed over the hours before `before_hour` (unix seconds), to check that cached hours still hold
+def fetch_hourly_totals(token: str, before_hour: int) -> tuple[float, float]:
+    client = get_sync_ch_client()
+    result = client.query(
+        f"""
+        SELECT
+            sumIf(volume, counterparty = {address_param('router_address')}) / 1e6,
+            sumIf(fee, direction = 'out') / 1e6
+        FROM hourly_activity
+        WHERE account IN {address_set_param('addresses')} AND hour < toDateTime(%(before_hour)s)
+        """, parameters={"addresses": bind_addresses(accounts), "router_address": bind_address(ROUTER_ADDRESS), "before_hour": before_hour}
+    )
+    volume, gas = result.result_rows[0]
+    return float(volume), float(gas)
+
+
+# 1 minute update interval (adjust as needed)
+UPDATE_INTERVAL_SECONDS = 60
+# Shared by both graph callbacks; entries expire before the next interval tick
+series_cache = HourlySeriesCache(
+    fetch_hourly_series,
+    fetch_hourly_totals,
+    ttl=UPDATE_INTERVAL_SECONDS / 2,
+    max_tokens=len(token_configs),
+    # Rows reach hourly_activity once the crawlers get to them and the insert buffer flushes them
+    settle=settings.insert_buffer.max_age + 2 * settings.crawler.interval_seconds,
+    # Backstop for changes that leave the kept hours' totals as they were, about once per hourly_activity refresh
+    full_refetch_every=max(1, int(settings.hourly_activity.refresh_interval // UPDATE_INTERVAL_SECONDS)),
+)
 
-# Function to check if data is cached
-def get_cached_data(token, max_timestamp):
-    cache_key = f"{token}_{max_timestamp}"
-    if cache_key in cache:
-        return cache[cache_key]
-    else:
-        return None
+# Returns the volume and gas series
+def get_data(token: str) -> tuple[HourlySeries, HourlySeries]:
+    return series_cache.get(token)
 
 # Define the layout with three graphs and separate controls for each
 app.layout = html.Div([
@@ -109,7 +104,7 @@ app.layout = html.Div([
 
     dcc.Interval(
         id='graph-update',
-        interval=1000 * 60,  # 1 minute update interval (adjust as needed)
+        interval=1000 * UPDATE_INTERVAL_SECONDS,
         n_intervals=0
     )
 ], style={'display': 'flex', 'flexDirection': 'column'})
@@ -121,19 +116,8 @@ app.layout = html.Div([
 )
 def update_hourly_volume_graph(n_intervals):
     token = 'sunana'  # Change this if needed
-    max_timestamp = int(datetime.datetime.now().timestamp() * 1000)
-    cached_data = get_cached_data(token, max_timestamp)
-    
-    if cached_data is None:
-        # Fetch the data asynchronously
-        hourly_volume, accumulated_volume, hourly_gas, accumulated_gas = get_data(token, max_timestamp)
-        # Store the result in the cache
-        cache[f"{token}_{max_timestamp}"] = (hourly_volume, accumulated_volume, hourly_gas, accumulated_gas)
-    else:
-        hourly_volume, accumulated_volume, _, _ = cached_data
-
-    hours_v, volumes = zip(*hourly_volume)
-    _, acc_volumes = zip(*accumulated_volume)
+    volume, _ = get_data(token)
+    hours_v, volumes, acc_volumes = volume
 
     # Create figure with secondary y-axis
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -170,18 +154,8 @@ def update_hourly_volume_graph(n_intervals):
 )
 def update_hourly_gas_graph(n_intervals):
     token = 'sunana'  # Change this if needed
-    max_timestamp = int(datetime.datetime.now().timestamp() * 1000)
-    cached_data = get_cached_data(token, max_timestamp)
-    if cached_data is None:
-        # Fetch the data asynchronously
-        hourly_volume, accumulated_volume, hourly_gas, accumulated_gas = get_data(token, max_timestamp)
-        # Store the result in the cache
-        cache[f"{token}_{max_timestamp}"] = (hourly_volume, accumulated_volume, hourly_gas, accumulated_gas)
-    else:
-        _, _, hourly_gas, accumulated_gas = cached_data
-
-    hours_g, gas = zip(*hourly_gas)
-    _, acc_gas = zip(*accumulated_gas)
+    _, gas_series = get_data(token)
+    hours_g, gas, acc_gas = gas_series
 
     # Create figure with secondary y-axis
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -212,25 +186,10 @@ def update_hourly_gas_graph(n_intervals):
 
 def update_accumulated_graph(n_intervals):
     token = 'sunana'  # Change this if needed
-    max_timestamp = int(datetime.datetime.now().timestamp() * 1000)
-    cached_data = get_cached_data(token, max_timestamp)
-    if cached_data is None:
-        # Fetch the data asynchronously
-        hourly_volume, accumulated_volume, hourly_gas, accumulated_gas = get_data(token, max_timestamp)
-        # Store the result in the cache
-        cache[f"{token}_{max_timestamp}"] = (hourly_volume, accumulated_volume, hourly_gas, accumulated_gas)
-    else:
-        _, accumulated_volume, _, accumulated_gas = cached_data
-
-    # Find common timestamps
-    hours_vol, acc_volumes = zip(*accumulated_volume)
-    hours_gas, acc_gas = zip(*accumulated_gas)
-
-    common_hours = sorted(set(hours_vol) & set(hours_gas))  # Intersection of timestamps
-
-    # Filter accumulated data to include only common timestamps
-    acc_volumes = [v for h, v in accumulated_volume if h in common_hours]
-    acc_gas = [g for h, g in accumulated_gas if h in common_hours]
+    volume, gas = get_data(token)
+
+    # Accumulated values at the hours present in both series
+    common_hours, acc_volumes, acc_gas = align_series(volume, gas)
 
     figure = {
         'data': [